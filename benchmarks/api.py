@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from typing import AsyncIterator
+
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from azure_sql import models
+from azure_sql.application import app
+from azure_sql.bulk_import import SubscriptionRecord
+from azure_sql.database import engine, read_engine, session_provider
+from azure_sql.handlers import GetSubscriptionsRequest, ImportSubscriptionsRequest, mediator
+from azure_sql.pagination import encode_cursor
+from benchmarks.harness import BenchmarkResult, add_output_arguments, report, run_concurrently
+
+# Seeded rows are recognized by their display name, so rows that were already in the table are left alone.
+DISPLAY_NAME_PREFIX = "Benchmark_"
+
+
+async def seed_subscriptions(rows: int) -> list[uuid.UUID]:
+    subscription_ids = sorted(uuid.uuid4() for _ in range(rows))
+
+    async def records() -> AsyncIterator[SubscriptionRecord]:
+        for i, subscription_id in enumerate(subscription_ids):
+            yield subscription_id, f"{DISPLAY_NAME_PREFIX}{i}", i % 10 != 0
+
+    await delete_subscriptions()
+    # Copied in bulk, the same path as POST /subscriptions/import
+    await mediator.send(ImportSubscriptionsRequest(records()))
+    return subscription_ids
+
+
+async def delete_subscriptions() -> None:
+    async with session_provider() as session:
+        await session.execute(
+            delete(models.Subscription).where(models.Subscription.display_name.startswith(DISPLAY_NAME_PREFIX))
+        )
+
+
+async def run(args: argparse.Namespace) -> list[BenchmarkResult]:
+    started_at = time.perf_counter()
+    subscription_ids = await seed_subscriptions(args.rows)
+    print(f"seeded {args.rows} subscriptions in {time.perf_counter() - started_at:.1f} s")
+    random_ = random.Random(args.seed)
+    results = []
+    try:
+        # https://www.python-httpx.org/advanced/#calling-into-python-web-apps
+        async with AsyncClient(app=app, base_url="http://benchmark") as client:
+
+            async def get_subscription(i: int) -> None:
+                response = await client.get(f"/subscriptions/{random_.choice(subscription_ids)}")
+                response.raise_for_status()
+
+            async def get_subscriptions_page(i: int) -> None:
+                # Pages start at random rows, so most of them are not served from the query cache
+                cursor = encode_cursor([random_.choice(subscription_ids)])
+                response = await client.get("/subscriptions/", params={"limit": args.page_size, "cursor": cursor})
+                response.raise_for_status()
+
+            async def send_get_subscriptions_request(i: int) -> None:
+                # The data layer alone, without HTTP and serialization
+                cursor = encode_cursor([random_.choice(subscription_ids)])
+                await mediator.send(GetSubscriptionsRequest(limit=args.page_size, cursor=cursor))
+
+            async def stream_subscriptions(i: int) -> None:
+                async with client.stream(
+                    "GET", "/subscriptions/", headers={"Accept": "application/x-ndjson"}
+                ) as response:
+                    response.raise_for_status()
+                    async for _ in response.aiter_raw():
+                        pass
+
+            parameters = {"rows": args.rows}
+            results.append(
+                await run_concurrently(
+                    "get_subscription",
+                    get_subscription,
+                    args.requests,
+                    args.concurrency,
+                    args.warmup,
+                    **parameters,
+                )
+            )
+            results.append(
+                await run_concurrently(
+                    "get_subscriptions_page",
+                    get_subscriptions_page,
+                    args.requests,
+                    args.concurrency,
+                    args.warmup,
+                    page_size=args.page_size,
+                    **parameters,
+                )
+            )
+            results.append(
+                await run_concurrently(
+                    "send_get_subscriptions_request",
+                    send_get_subscriptions_request,
+                    args.requests,
+                    args.concurrency,
+                    args.warmup,
+                    page_size=args.page_size,
+                    **parameters,
+                )
+            )
+            if not args.skip_stream:
+                # Every request reads the whole table
+                results.append(
+                    await run_concurrently(
+                        "stream_subscriptions",
+                        stream_subscriptions,
+                        args.stream_requests,
+                        min(args.concurrency, args.stream_requests),
+                        **parameters,
+                    )
+                )
+    finally:
+        if not args.keep:
+            await delete_subscriptions()
+        await app.container.query_cache().close()  # type: ignore[attr-defined]
+        await engine.dispose()
+        if read_engine is not engine:
+            await read_engine.dispose()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the subscriptions API through the ASGI app.")
+    parser.add_argument("--rows", type=int, default=10_000, help="subscriptions to seed")
+    parser.add_argument("--requests", type=int, default=2_000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=50, help="requests per scenario not measured")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--stream-requests", type=int, default=5)
+    parser.add_argument("--skip-stream", action="store_true", help="skip the NDJSON full table scenario")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random ids requested")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    return report(args, asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import sys
+
+from azure_sql.azure_sql_manager import AzureSqlManager, SweepState
+from azure_sql.cache import AsyncTTLCache
+from azure_sql.fake_arm import FakeArmInventory, FakeArmServer, FakeArmSettings
+from azure_sql.throttling import ThrottlingPolicy
+from benchmarks.harness import BenchmarkResult, add_output_arguments, report, run_concurrently
+
+
+async def run(args: argparse.Namespace) -> list[BenchmarkResult]:
+    inventory = FakeArmInventory.generate(args.subscriptions, args.servers, args.databases, args.elastic_pools)
+    settings = FakeArmSettings(args.latency, args.throttle_probability, retry_after=args.latency or 0.01)
+    parameters = {
+        "subscriptions": args.subscriptions,
+        "servers": args.servers,
+        "databases": args.databases,
+        "latency": args.latency,
+        "throttle_probability": args.throttle_probability,
+    }
+    results = []
+    async with FakeArmServer(inventory, settings) as fake_arm_server:
+        for max_concurrency in args.max_concurrency:
+            async with AzureSqlManager(
+                throttling=ThrottlingPolicy(requests_per_second=args.requests_per_second, burst=args.burst),
+                **fake_arm_server.manager_kwargs(),
+            ) as azure_sql_manager:
+
+                async def sweep(i: int) -> None:
+                    async for _ in azure_sql_manager.sweep(max_concurrency, args.max_concurrency_per_subscription):
+                        pass
+
+                results.append(
+                    await run_concurrently(
+                        f"sweep[max_concurrency={max_concurrency}]",
+                        sweep,
+                        args.sweeps,
+                        1,
+                        max_concurrency_per_subscription=args.max_concurrency_per_subscription,
+                        **parameters,
+                    )
+                )
+
+                # Incremental, nothing changes between sweeps so only the listings are requested after the first one
+                state = SweepState()
+
+                async def incremental_sweep(i: int) -> None:
+                    async for _ in azure_sql_manager.sweep(
+                        max_concurrency, args.max_concurrency_per_subscription, state=state
+                    ):
+                        pass
+
+                results.append(
+                    await run_concurrently(
+                        f"incremental_sweep[max_concurrency={max_concurrency}]",
+                        incremental_sweep,
+                        args.sweeps,
+                        1,
+                        warmup=1,
+                        max_concurrency_per_subscription=args.max_concurrency_per_subscription,
+                        **parameters,
+                    )
+                )
+
+        subscription = next(iter(inventory.subscriptions.values()))
+        server = next(iter(subscription.servers.values()))
+        for cached in (False, True):
+            cache = AsyncTTLCache() if cached else None
+            async with AzureSqlManager(cache=cache, **fake_arm_server.manager_kwargs()) as azure_sql_manager:
+
+                async def get_database(i: int) -> None:
+                    await azure_sql_manager.get_database(
+                        subscription.subscription_id,
+                        server.resource_group_name,
+                        server.name,
+                        f"db-{i % args.databases}",
+                    )
+
+                results.append(
+                    await run_concurrently(
+                        f"get_database[cached={cached}]",
+                        get_database,
+                        args.requests,
+                        args.concurrency,
+                        **parameters,
+                    )
+                )
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark AzureSqlManager against the local fake ARM server.")
+    parser.add_argument("--subscriptions", type=int, default=4)
+    parser.add_argument("--servers", type=int, default=4, help="servers per subscription")
+    parser.add_argument("--databases", type=int, default=25, help="databases per server")
+    parser.add_argument("--elastic-pools", type=int, default=1, help="elastic pools per server")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every ARM response")
+    parser.add_argument("--throttle-probability", type=float, default=0)
+    parser.add_argument("--sweeps", type=int, default=3, help="sweeps per max concurrency")
+    parser.add_argument("--max-concurrency", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--max-concurrency-per-subscription", type=int, default=8)
+    parser.add_argument("--requests-per-second", type=float, default=1000, help="per subscription token bucket")
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500, help="get_database calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    return report(args, asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
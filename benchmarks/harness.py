@@ -0,0 +1,149 @@
+import asyncio
+import json
+import math
+import platform
+import resource
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    operations: int
+    errors: int
+    duration_seconds: float
+    throughput: float
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+    max_rss_mb: float
+    parameters: dict = field(default_factory=dict)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    # Nearest rank, https://en.wikipedia.org/wiki/Percentile#The_nearest-rank_method
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def _get_max_rss_mb() -> float:
+    # https://docs.python.org/3/library/resource.html#resource.getrusage (kilobytes on Linux, bytes on macOS)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 1024 / 1024 if sys.platform == "darwin" else max_rss / 1024
+
+
+async def run_concurrently(
+    name: str,
+    operation: Callable[[int], Awaitable[object]],
+    operations: int,
+    concurrency: int,
+    warmup: int = 0,
+    **parameters,
+) -> BenchmarkResult:
+    # operation receives the number of the operation, a failed operation is counted as an error, not measured.
+    for i in range(warmup):
+        await operation(i)
+    latencies: list[float] = []
+    errors = 0
+    next_operation = 0
+
+    async def worker() -> None:
+        nonlocal errors, next_operation
+        while next_operation < operations:
+            i = next_operation
+            next_operation += 1
+            started_at = time.perf_counter()
+            try:
+                await operation(i)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    duration = time.perf_counter() - started_at
+    latencies.sort()
+    return BenchmarkResult(
+        name=name,
+        operations=operations,
+        errors=errors,
+        duration_seconds=duration,
+        throughput=len(latencies) / duration if duration > 0 else 0.0,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+        max_ms=(latencies[-1] if latencies else 0.0) * 1000,
+        max_rss_mb=_get_max_rss_mb(),
+        parameters={"concurrency": concurrency, **parameters},
+    )
+
+
+def _get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: list[BenchmarkResult]) -> None:
+    print(f"{'name':<40} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10} {'errors':>8} {'rss MB':>8}")
+    for result in results:
+        print(
+            f"{result.name:<40} {result.throughput:>10.1f} {result.p50_ms:>10.2f} {result.p99_ms:>10.2f} "
+            f"{result.max_ms:>10.2f} {result.errors:>8} {result.max_rss_mb:>8.1f}"
+        )
+
+
+def save_results(path: Path, results: list[BenchmarkResult]) -> None:
+    # The commit and the environment are saved with the results, so runs of different commits can be compared.
+    document = {
+        "commit": _get_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [asdict(result) for result in results],
+    }
+    path.write_text(json.dumps(document, indent=2))
+
+
+def compare_results(baseline_path: Path, results: list[BenchmarkResult], tolerance: float) -> list[str]:
+    # Regressions are results whose throughput dropped or p99 latency grew by more than tolerance (e.g. 0.1 is 10%).
+    baseline = {result["name"]: result for result in json.loads(baseline_path.read_text())["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None or previous["parameters"] != result.parameters:
+            continue
+        if result.throughput < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{result.name}: throughput {previous['throughput']:.1f} -> {result.throughput:.1f}")
+        if result.p99_ms > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{result.name}: p99 {previous['p99_ms']:.2f} ms -> {result.p99_ms:.2f} ms")
+    return regressions
+
+
+def add_output_arguments(parser) -> None:
+    parser.add_argument("--output", type=Path, help="save the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed regression, 0.1 is 10%%")
+
+
+def report(args, results: list[BenchmarkResult]) -> int:
+    print_results(results)
+    if args.output is not None:
+        save_results(args.output, results)
+    if args.baseline is not None:
+        regressions = compare_results(args.baseline, results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
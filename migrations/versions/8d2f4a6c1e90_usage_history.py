@@ -0,0 +1,101 @@
+"""usage history
+
+Revision ID: 8d2f4a6c1e90
+Revises: 5b1e9c3d7a42
+Create Date: 2026-10-18 11:40:07.530991
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8d2f4a6c1e90'
+down_revision = '5b1e9c3d7a42'
+branch_labels = None
+depends_on = None
+
+
+def _create_rollup_table(name: str) -> None:
+    op.create_table(name,
+                    sa.Column('subscription_id', postgresql.UUID(as_uuid=True), nullable=False),
+                    sa.Column('resource_group_name', sa.String(), nullable=False),
+                    sa.Column('server_name', sa.String(), nullable=False),
+                    sa.Column('database_name', sa.String(), nullable=False),
+                    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+                    sa.Column('space_used_bytes_max', sa.BigInteger(), nullable=False),
+                    sa.Column('space_used_bytes_sum', sa.BigInteger(), nullable=False),
+                    sa.Column('space_allocated_bytes_max', sa.BigInteger(), nullable=False),
+                    sa.Column('space_allocated_bytes_sum', sa.BigInteger(), nullable=False),
+                    sa.Column('samples', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('subscription_id', 'resource_group_name', 'server_name', 'database_name',
+                                            'bucket')
+                    )
+
+
+def upgrade() -> None:
+    # Raw samples become a table partitioned by month, so retention drops whole partitions instead of deleting rows.
+    op.rename_table('DatabaseUsageSamples', 'DatabaseUsageSamples_legacy')
+    op.execute('ALTER TABLE "DatabaseUsageSamples_legacy" RENAME CONSTRAINT "DatabaseUsageSamples_pkey" '
+               'TO "DatabaseUsageSamples_legacy_pkey"')
+    op.create_table('DatabaseUsageSamples',
+                    sa.Column('subscription_id', postgresql.UUID(as_uuid=True), nullable=False),
+                    sa.Column('resource_group_name', sa.String(), nullable=False),
+                    sa.Column('server_name', sa.String(), nullable=False),
+                    sa.Column('database_name', sa.String(), nullable=False),
+                    sa.Column('sampled_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.Column('space_used_bytes', sa.BigInteger(), nullable=False),
+                    sa.Column('space_allocated_bytes', sa.BigInteger(), nullable=False),
+                    sa.PrimaryKeyConstraint('subscription_id', 'resource_group_name', 'server_name', 'database_name',
+                                            'sampled_at'),
+                    postgresql_partition_by='RANGE (sampled_at)'
+                    )
+    op.execute('CREATE TABLE "DatabaseUsageSamples_default" PARTITION OF "DatabaseUsageSamples" DEFAULT')
+    op.execute("""
+        DO $$
+        DECLARE
+            month timestamptz;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', coalesce(legacy.first_sampled_at, now()), 'UTC'),
+                    date_trunc('month', now(), 'UTC') + interval '2 months',
+                    interval '1 month'
+                )
+                FROM (SELECT min(sampled_at) AS first_sampled_at FROM "DatabaseUsageSamples_legacy") AS legacy
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF "DatabaseUsageSamples" FOR VALUES FROM (%L) TO (%L)',
+                    'DatabaseUsageSamples_' || to_char(month AT TIME ZONE 'UTC', 'YYYY_MM'),
+                    month,
+                    month + interval '1 month'
+                );
+            END LOOP;
+        END
+        $$
+    """)
+    op.execute('INSERT INTO "DatabaseUsageSamples" SELECT * FROM "DatabaseUsageSamples_legacy"')
+    op.drop_table('DatabaseUsageSamples_legacy')
+    _create_rollup_table('DatabaseUsageHourly')
+    _create_rollup_table('DatabaseUsageDaily')
+
+
+def downgrade() -> None:
+    op.drop_table('DatabaseUsageDaily')
+    op.drop_table('DatabaseUsageHourly')
+    op.execute('ALTER TABLE "DatabaseUsageSamples" RENAME TO "DatabaseUsageSamples_partitioned"')
+    op.create_table('DatabaseUsageSamples',
+                    sa.Column('subscription_id', postgresql.UUID(as_uuid=True), nullable=False),
+                    sa.Column('resource_group_name', sa.String(), nullable=False),
+                    sa.Column('server_name', sa.String(), nullable=False),
+                    sa.Column('database_name', sa.String(), nullable=False),
+                    sa.Column('sampled_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.Column('space_used_bytes', sa.BigInteger(), nullable=False),
+                    sa.Column('space_allocated_bytes', sa.BigInteger(), nullable=False),
+                    sa.PrimaryKeyConstraint('subscription_id', 'resource_group_name', 'server_name', 'database_name',
+                                            'sampled_at', name='DatabaseUsageSamples_unpartitioned_pkey')
+                    )
+    op.execute('INSERT INTO "DatabaseUsageSamples" SELECT * FROM "DatabaseUsageSamples_partitioned"')
+    op.execute('DROP TABLE "DatabaseUsageSamples_partitioned" CASCADE')
+    op.execute('ALTER TABLE "DatabaseUsageSamples" RENAME CONSTRAINT "DatabaseUsageSamples_unpartitioned_pkey" '
+               'TO "DatabaseUsageSamples_pkey"')
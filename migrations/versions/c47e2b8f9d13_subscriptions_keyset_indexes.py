@@ -0,0 +1,31 @@
+"""subscriptions keyset indexes
+
+Revision ID: c47e2b8f9d13
+Revises: 8d2f4a6c1e90
+Create Date: 2026-10-18 14:05:51.274310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c47e2b8f9d13'
+down_revision = '8d2f4a6c1e90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keyset pagination keys, see handlers._get_subscription_sort_keys
+    op.create_index('ix_Subscriptions_display_name_subscription_id', 'Subscriptions',
+                    [sa.text("coalesce(display_name, '')"), 'subscription_id'])
+    op.create_index('ix_Subscriptions_enabled_subscription_id', 'Subscriptions',
+                    ['enabled', 'subscription_id'])
+    op.create_index('ix_Subscriptions_enabled_display_name_subscription_id', 'Subscriptions',
+                    ['enabled', sa.text("coalesce(display_name, '')"), 'subscription_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_Subscriptions_enabled_display_name_subscription_id', table_name='Subscriptions')
+    op.drop_index('ix_Subscriptions_enabled_subscription_id', table_name='Subscriptions')
+    op.drop_index('ix_Subscriptions_display_name_subscription_id', table_name='Subscriptions')
@@ -0,0 +1,84 @@
+"""table versions changed rows
+
+Revision ID: f3b81d6e4a05
+Revises: e5a93b0c2d71
+Create Date: 2026-10-18 18:32:07.146952
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f3b81d6e4a05'
+down_revision = 'e5a93b0c2d71'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ['Subscriptions', 'Servers', 'ElasticPools', 'Databases']
+
+
+def upgrade() -> None:
+    # Statement triggers fire even when no row changed, e.g. an upsert whose rows are all unchanged, so the
+    # version is only bumped when the transition tables show a change. Writes that change nothing then leave
+    # the ETag alone and do not lock the row of the table in TableVersions.
+    # https://www.postgresql.org/docs/current/sql-createtrigger.html
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            -- One branch per event, a trigger only has the transition tables of its own event
+            IF TG_OP = 'INSERT' THEN
+                IF NOT EXISTS (SELECT FROM new_rows) THEN
+                    RETURN NULL;
+                END IF;
+            ELSIF TG_OP = 'UPDATE' THEN
+                IF NOT EXISTS (SELECT * FROM new_rows EXCEPT SELECT * FROM old_rows) THEN
+                    RETURN NULL;
+                END IF;
+            ELSIF TG_OP = 'DELETE' THEN
+                IF NOT EXISTS (SELECT FROM old_rows) THEN
+                    RETURN NULL;
+                END IF;
+            END IF;
+            INSERT INTO "TableVersions" (table_name, version) VALUES (TG_TABLE_NAME, 1)
+            ON CONFLICT (table_name) DO UPDATE SET version = "TableVersions".version + 1;
+            RETURN NULL;
+        END;
+        $$
+    """)
+    # Transition tables need a trigger per event, TRUNCATE has none and always bumps.
+    for table_name in VERSIONED_TABLES:
+        op.execute(f'DROP TRIGGER "{table_name}_bump_table_version" ON "{table_name}"')
+        for event, referencing in [
+            ('INSERT', 'NEW TABLE AS new_rows'),
+            ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('DELETE', 'OLD TABLE AS old_rows'),
+        ]:
+            op.execute(f"""
+                CREATE TRIGGER "{table_name}_bump_table_version_{event.lower()}"
+                AFTER {event} ON "{table_name}" REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+            """)
+        op.execute(f"""
+            CREATE TRIGGER "{table_name}_bump_table_version_truncate"
+            AFTER TRUNCATE ON "{table_name}"
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """)
+
+
+def downgrade() -> None:
+    for table_name in VERSIONED_TABLES:
+        for event in ['insert', 'update', 'delete', 'truncate']:
+            op.execute(f'DROP TRIGGER "{table_name}_bump_table_version_{event}" ON "{table_name}"')
+        op.execute(f"""
+            CREATE TRIGGER "{table_name}_bump_table_version"
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{table_name}"
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO "TableVersions" (table_name, version) VALUES (TG_TABLE_NAME, 1)
+            ON CONFLICT (table_name) DO UPDATE SET version = "TableVersions".version + 1;
+            RETURN NULL;
+        END;
+        $$
+    """)
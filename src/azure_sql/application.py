@@ -1,19 +1,33 @@
 from fastapi import FastAPI
 
+import azure_sql.routers.databases
 import azure_sql.routers.debug
+import azure_sql.routers.inventory
+import azure_sql.routers.metrics
+import azure_sql.routers.servers
 import azure_sql.routers.subscriptions
+from azure_sql.compression import CompressionMiddleware
 from azure_sql.containers import Container
 from azure_sql.handlers import mediator
+from azure_sql.metrics import MetricsMiddleware
+from azure_sql.responses import ModelJSONResponse
 
 
 def create_app() -> FastAPI:
     container = Container()
     container.override_providers(mediator=mediator)
-    container.wire(modules=[".handlers"], packages=[".routers"])
-    app_ = FastAPI()
+    container.wire(modules=[".handlers", ".ingest", ".usage_history", ".export"], packages=[".routers"])
+    app_ = FastAPI(default_response_class=ModelJSONResponse)
+    app_.add_middleware(CompressionMiddleware)
+    # Added last so it is the outermost middleware, the latency includes compressing the response
+    app_.add_middleware(MetricsMiddleware)
     app_.container = container  # type: ignore[attr-defined]
     app_.include_router(azure_sql.routers.subscriptions.router)
+    app_.include_router(azure_sql.routers.servers.router)
+    app_.include_router(azure_sql.routers.databases.router)
+    app_.include_router(azure_sql.routers.inventory.router)
     app_.include_router(azure_sql.routers.debug.router)
+    app_.include_router(azure_sql.routers.metrics.router)
     return app_
 
 
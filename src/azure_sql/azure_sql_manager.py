@@ -1,22 +1,37 @@
+import asyncio
+import contextlib
+import dataclasses
 import re
+import time
+from collections import defaultdict
 from dataclasses import dataclass
-from typing import AsyncIterator, cast
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, Mapping, TypeVar, cast
 
-from azure.identity.aio import DefaultAzureCredential
+from azure.core.credentials_async import AsyncTokenCredential
 from azure.mgmt.sql.aio import SqlManagementClient
 from azure.mgmt.sql.models import Database, DatabaseUsage, ElasticPool, Server
 from azure.mgmt.subscription.aio import SubscriptionClient
 from azure.mgmt.subscription.models import Subscription, SubscriptionState
 
+from azure_sql.cache import AsyncTTLCache, CachePolicy
+from azure_sql.client_pool import ClientPool
+from azure_sql.concurrency import ConcurrencyBudget, gather_or_cancel, iterate, map_concurrently
+from azure_sql.credentials import create_credential
+from azure_sql.metrics import AsyncArmMetricsPolicy
+from azure_sql.throttling import AsyncArmThrottlingPolicy, ThrottlingPolicy
 
-@dataclass
+T = TypeVar("T")
+
+
+# Records are slotted and frozen, a sweep holds many of them and cached ones are shared between callers.
+@dataclass(frozen=True, slots=True)
 class AzureSubscription:
     subscription_id: str
     display_name: str
     enabled: bool
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AzureSqlServer:
     resource_group_name: str
     name: str
@@ -24,7 +39,7 @@ class AzureSqlServer:
     state: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Size:
     bytes: float
 
@@ -44,41 +59,178 @@ class Size:
         return f"{self.__class__.__name__}({self.bytes=},{self.kilobytes=},{self.megabytes=},{self.gigabytes=})"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AzureSqlDatabaseUsage:
-    space_used: Size
-    space_allocated: Size
-    space_allocated_unused: Size
+    # Bytes are stored, Size wrappers are only created when they are asked for.
+    space_used_bytes: float
+    space_allocated_bytes: float
+
+    @property
+    def space_allocated_unused_bytes(self) -> float:
+        return self.space_allocated_bytes - self.space_used_bytes
+
+    @property
+    def space_used(self) -> Size:
+        return Size(self.space_used_bytes)
+
+    @property
+    def space_allocated(self) -> Size:
+        return Size(self.space_allocated_bytes)
+
+    @property
+    def space_allocated_unused(self) -> Size:
+        return Size(self.space_allocated_unused_bytes)
+
+
+@dataclass(slots=True)
+class AzureSqlDatabaseUsageTotal:
+    # Usages are added as they arrive, instead of being collected in lists and summed afterwards.
+    space_used_bytes: float = 0.0
+    space_allocated_bytes: float = 0.0
+
+    def add(self, usage: AzureSqlDatabaseUsage) -> None:
+        self.space_used_bytes += usage.space_used_bytes
+        self.space_allocated_bytes += usage.space_allocated_bytes
+
+    def to_usage(self) -> AzureSqlDatabaseUsage:
+        return AzureSqlDatabaseUsage(self.space_used_bytes, self.space_allocated_bytes)
 
 
-@dataclass
+_EMPTY_USAGE = AzureSqlDatabaseUsage(0.0, 0.0)
+
+
+@dataclass(frozen=True, slots=True)
 class AzureSqlElasticPool:
     resource_group_name: str
     name: str
     server_name: str
-    max_size: Size
+    max_size_bytes: float
     usage: AzureSqlDatabaseUsage | None = None
 
+    @property
+    def max_size(self) -> Size:
+        return Size(self.max_size_bytes)
+
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AzureSqlDatabase:
     resource_group_name: str
     server_name: str
     name: str
     status: str
     current_service_objective_name: str
-    max_size: Size
+    max_size_bytes: float
     usage: AzureSqlDatabaseUsage
     elastic_pool_name: str | None = None
 
+    @property
+    def max_size(self) -> Size:
+        return Size(self.max_size_bytes)
+
     @property
     def is_elastic_pool(self):
         return self.elastic_pool_name is not None
 
 
+@dataclass(frozen=True, slots=True)
+class AzureSqlInventoryRecord:
+    subscription_id: str
+    resource: AzureSubscription | AzureSqlServer | AzureSqlElasticPool | AzureSqlDatabase
+    # False when the resource is the same as in the previous sweep of the SweepState, it does not need to be stored.
+    changed: bool = True
+
+
+class SweepState:
+    # Kept by the caller between sweeps, like the cache. Resources are compared with the previous sweep, and the
+    # usage of a database whose properties did not change is reused until it is older than max_usage_age seconds,
+    # so static resources cost one listing call and no usage calls or writes.
+    def __init__(self, max_usage_age: float = 3600) -> None:
+        self.max_usage_age = max_usage_age
+        self._resources: dict[tuple, Any] = {}
+        self._usages_sampled_at: dict[tuple, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._resources)
+
+    @staticmethod
+    def _key(subscription_id: str, resource: Any) -> tuple:
+        if isinstance(resource, AzureSubscription):
+            return AzureSubscription, subscription_id
+        if isinstance(resource, AzureSqlServer):
+            return AzureSqlServer, subscription_id, resource.resource_group_name, resource.name
+        return type(resource), subscription_id, resource.resource_group_name, resource.server_name, resource.name
+
+    def get_usage(self, subscription_id: str, database: AzureSqlDatabase) -> AzureSqlDatabaseUsage | None:
+        # The usage of the previous sweep, if it is recent enough and the database did not change (usage aside).
+        key = self._key(subscription_id, database)
+        previous: AzureSqlDatabase | None = self._resources.get(key)
+        sampled_at = self._usages_sampled_at.get(key)
+        if previous is None or sampled_at is None or time.monotonic() - sampled_at >= self.max_usage_age:
+            return None
+        if dataclasses.replace(database, usage=previous.usage) != previous:
+            return None
+        return previous.usage
+
+    def update(self, subscription_id: str, resource: Any, usage_sampled: bool = False) -> bool:
+        # Returns whether the resource changed, a new usage sample is a change even if its values are the same.
+        key = self._key(subscription_id, resource)
+        changed = usage_sampled or self._resources.get(key) != resource
+        self._resources[key] = resource
+        if usage_sampled:
+            self._usages_sampled_at[key] = time.monotonic()
+        return changed
+
+    def forget(self, subscription_id: str) -> None:
+        # E.g. when the records of a sweep could not be stored, so the next sweep reports all of them as changed.
+        for key in [key for key in self._resources if key[1] == subscription_id]:
+            del self._resources[key]
+            self._usages_sampled_at.pop(key, None)
+
+
+@dataclass(frozen=True)
+class AzureSqlCachePolicies:
+    subscription: CachePolicy = CachePolicy(ttl=3600, stale_while_revalidate=3600)
+    server: CachePolicy = CachePolicy(ttl=900, stale_while_revalidate=3600)
+    database: CachePolicy = CachePolicy(ttl=60, stale_while_revalidate=300)
+    elastic_pool: CachePolicy = CachePolicy(ttl=300, stale_while_revalidate=900)
+
+
 class AzureSqlManager:
-    def __init__(self):
-        self._credential = DefaultAzureCredential()
+    def __init__(
+        self,
+        client_idle_timeout: float = 300,
+        cache: AsyncTTLCache | None = None,
+        cache_policies: AzureSqlCachePolicies = AzureSqlCachePolicies(),
+        throttling: ThrottlingPolicy | None = None,
+        credential: AsyncTokenCredential | None = None,
+        client_kwargs: Mapping[str, Any] | None = None,
+    ):
+        # client_kwargs are passed to every management client (e.g. base_url to use the fake ARM server of fake_arm)
+        # A credential passed in is owned by the caller, so it can be shared (and kept warm) between managers.
+        self._owns_credential = credential is None
+        self._credential = credential if credential is not None else create_credential()
+        # The cache is opt-in and owned by the caller, so it can be shared between managers.
+        self._cache = cache
+        self._cache_policies = cache_policies
+        # One throttling policy is shared by every client, so its token buckets are per subscription, not per client.
+        self.throttling_policy = AsyncArmThrottlingPolicy(throttling) if throttling is not None else None
+        kwargs: dict[str, Any] = {
+            **(
+                {"per_call_policies": [self.throttling_policy], "retry_total": 0}
+                if self.throttling_policy is not None
+                else {}
+            ),
+            # Per retry, it measures every attempt, also those retried by the throttling policy.
+            "per_retry_policies": [AsyncArmMetricsPolicy()],
+            **(client_kwargs or {}),
+        }
+        self._sql_clients: ClientPool[str, SqlManagementClient] = ClientPool(
+            lambda subscription_id: SqlManagementClient(self._credential, subscription_id, **kwargs),
+            client_idle_timeout,
+        )
+        self._subscription_clients: ClientPool[None, SubscriptionClient] = ClientPool(
+            lambda _: SubscriptionClient(self._credential, **kwargs), client_idle_timeout
+        )
 
     async def __aenter__(self):
         return self
@@ -87,7 +239,15 @@ class AzureSqlManager:
         await self.close()
 
     async def close(self):
-        await self._credential.close()
+        await self._sql_clients.close()
+        await self._subscription_clients.close()
+        if self._owns_credential:
+            await self._credential.close()
+
+    async def _cached(self, key: tuple, policy: CachePolicy, loader: Callable[[], Awaitable[T]]) -> T:
+        if self._cache is None:
+            return await loader()
+        return await self._cache.get_or_load(key, loader, policy)
 
     @staticmethod
     def _get_resource_group_name_from_id(id_: str) -> str:
@@ -116,8 +276,7 @@ class AzureSqlManager:
                 space_used = database_usage.current_value
             elif database_usage.name == "database_allocated_size":
                 space_allocated = database_usage.current_value
-        space_allocated_unused = space_allocated - space_used
-        return AzureSqlDatabaseUsage(Size(space_used), Size(space_allocated), Size(space_allocated_unused))
+        return AzureSqlDatabaseUsage(space_used, space_allocated)
 
     @staticmethod
     def _create_subscription(subscription: Subscription) -> AzureSubscription:
@@ -138,7 +297,7 @@ class AzureSqlManager:
             database.name,
             database.status,
             database.current_service_objective_name,
-            Size(database.max_size_bytes),
+            database.max_size_bytes,
             usage,
             cls._get_elastic_pool_name_from_id(database.elastic_pool_id),
         )
@@ -152,93 +311,185 @@ class AzureSqlManager:
         )
 
     async def get_subscription(self, subscription_id: str) -> AzureSubscription:
-        async with SubscriptionClient(self._credential) as client:
-            subscription = await client.subscriptions.get(subscription_id)
-            return self._create_subscription(subscription)
+        async def load() -> AzureSubscription:
+            async with self._subscription_clients.acquire(None) as client:
+                subscription = await client.subscriptions.get(subscription_id)
+                return self._create_subscription(subscription)
+
+        return await self._cached(("subscription", subscription_id), self._cache_policies.subscription, load)
 
     async def get_subscriptions(self) -> AsyncIterator[AzureSubscription]:
-        async with SubscriptionClient(self._credential) as client:
+        async with self._subscription_clients.acquire(None) as client:
             subscription: Subscription
             async for subscription in client.subscriptions.list():
                 yield self._create_subscription(subscription)
 
     async def get_server(self, subscription_id: str, resource_group_name: str, server_name: str) -> AzureSqlServer:
-        async with SqlManagementClient(self._credential, subscription_id) as sql_client:
-            server = await sql_client.servers.get(resource_group_name, server_name)
-            return self._create_server(server)
+        async def load() -> AzureSqlServer:
+            async with self._sql_clients.acquire(subscription_id) as sql_client:
+                server = await sql_client.servers.get(resource_group_name, server_name)
+                return self._create_server(server)
+
+        return await self._cached(
+            ("server", subscription_id, resource_group_name, server_name), self._cache_policies.server, load
+        )
 
     async def get_servers(self, subscription_id: str) -> AsyncIterator[AzureSqlServer]:
-        async with SqlManagementClient(self._credential, subscription_id) as sql_client:
+        async with self._sql_clients.acquire(subscription_id) as sql_client:
             server: Server
             async for server in sql_client.servers.list():
                 yield self._create_server(server)
 
+    @staticmethod
+    async def _list_user_databases(
+        sql_client: SqlManagementClient, resource_group_name: str, server_name: str
+    ) -> AsyncIterator[Database]:
+        database: Database
+        async for database in sql_client.databases.list_by_server(resource_group_name, server_name):
+            if database.name == "master":
+                continue
+            yield database
+
     async def get_databases(
-        self, subscription_id: str, resource_group_name: str, server_name: str
+        self,
+        subscription_id: str,
+        resource_group_name: str,
+        server_name: str,
+        max_concurrency: int = 1,
+        ordered: bool = True,
+        state: SweepState | None = None,
     ) -> AsyncIterator[AzureSqlDatabase]:
-        async with SqlManagementClient(self._credential, subscription_id) as sql_client:
-            database: Database
-            async for database in sql_client.databases.list_by_server(resource_group_name, server_name):
-                if database.name == "master":
-                    continue
-                usage = await self._get_database_usage(sql_client, resource_group_name, server_name, database.name)
-                yield self._create_database(
-                    resource_group_name,
-                    server_name,
-                    database,
-                    usage,
+        # With a state, the usages of databases that did not change since the previous call are reused.
+        async with self._sql_clients.acquire(subscription_id) as sql_client:
+
+            async def create_database(database: Database) -> AzureSqlDatabase:
+                record = await self._create_database_record(
+                    sql_client, subscription_id, resource_group_name, server_name, database, state
                 )
+                return cast(AzureSqlDatabase, record.resource)
+
+            async for azure_sql_database in map_concurrently(
+                create_database,
+                self._list_user_databases(sql_client, resource_group_name, server_name),
+                max_concurrency,
+                ordered,
+            ):
+                yield azure_sql_database
+
+    async def _create_database_record(
+        self,
+        sql_client: SqlManagementClient,
+        subscription_id: str,
+        resource_group_name: str,
+        server_name: str,
+        database: Database,
+        state: SweepState | None,
+        budget: ConcurrencyBudget | None = None,
+    ) -> AzureSqlInventoryRecord:
+        azure_sql_database = self._create_database(resource_group_name, server_name, database, _EMPTY_USAGE)
+        usage = state.get_usage(subscription_id, azure_sql_database) if state is not None else None
+        usage_sampled = usage is None
+        if usage is None:
+            async with budget.acquire(subscription_id) if budget is not None else contextlib.nullcontext():
+                usage = await self._get_database_usage(sql_client, resource_group_name, server_name, database.name)
+        azure_sql_database = dataclasses.replace(azure_sql_database, usage=usage)
+        return self._record(subscription_id, azure_sql_database, state, usage_sampled)
 
     async def get_database(
         self, subscription_id: str, resource_group_name: str, server_name: str, database_name: str
     ) -> AzureSqlDatabase:
-        async with SqlManagementClient(self._credential, subscription_id) as sql_client:
-            database = await sql_client.databases.get(resource_group_name, server_name, database_name)
-            usage = await self._get_database_usage(sql_client, resource_group_name, server_name, database.name)
-            return self._create_database(resource_group_name, server_name, database, usage)
+        async def load() -> AzureSqlDatabase:
+            async with self._sql_clients.acquire(subscription_id) as sql_client:
+                database = await sql_client.databases.get(resource_group_name, server_name, database_name)
+                usage = await self._get_database_usage(sql_client, resource_group_name, server_name, database.name)
+                return self._create_database(resource_group_name, server_name, database, usage)
 
-    async def _calculate_elastic_pool_database_usage(
-        self, sql_client: SqlManagementClient, resource_group_name: str, server_name: str, elastic_pool_name: str
-    ) -> AzureSqlDatabaseUsage:
-        usages: list[AzureSqlDatabaseUsage] = []
-        async for database in sql_client.databases.list_by_elastic_pool(
-            resource_group_name, server_name, elastic_pool_name
-        ):
-            usages.append(await self._get_database_usage(sql_client, resource_group_name, server_name, database.name))
-        return AzureSqlDatabaseUsage(
-            Size(sum([usage.space_used.bytes for usage in usages])),
-            Size(sum([usage.space_allocated.bytes for usage in usages])),
-            Size(sum([usage.space_allocated_unused.bytes for usage in usages])),
+        return await self._cached(
+            ("database", subscription_id, resource_group_name, server_name, database_name),
+            self._cache_policies.database,
+            load,
         )
 
-    async def _create_elastic_pool(
+    async def _calculate_elastic_pool_database_usage(
         self,
         sql_client: SqlManagementClient,
+        resource_group_name: str,
+        server_name: str,
+        elastic_pool_name: str,
+        max_concurrency: int = 1,
+    ) -> AzureSqlDatabaseUsage:
+        async def get_usage(database: Database) -> AzureSqlDatabaseUsage:
+            return await self._get_database_usage(sql_client, resource_group_name, server_name, database.name)
+
+        total = AzureSqlDatabaseUsageTotal()
+        async for usage in map_concurrently(
+            get_usage,
+            sql_client.databases.list_by_elastic_pool(resource_group_name, server_name, elastic_pool_name),
+            max_concurrency,
+            ordered=False,
+        ):
+            total.add(usage)
+        return total.to_usage()
+
+    async def _calculate_elastic_pools_database_usage(
+        self, sql_client: SqlManagementClient, resource_group_name: str, server_name: str, max_concurrency: int = 1
+    ) -> dict[str, AzureSqlDatabaseUsage]:
+        # One server-wide pass: list every database once and group their usages by elastic pool,
+        # instead of listing the databases of each elastic pool separately.
+        async def get_usage(database: Database) -> tuple[str, AzureSqlDatabaseUsage]:
+            usage = await self._get_database_usage(sql_client, resource_group_name, server_name, database.name)
+            return cast(str, self._get_elastic_pool_name_from_id(database.elastic_pool_id)), usage
+
+        async def list_elastic_pool_databases() -> AsyncIterator[Database]:
+            async for database in self._list_user_databases(sql_client, resource_group_name, server_name):
+                if database.elastic_pool_id is not None:
+                    yield database
+
+        totals: defaultdict[str, AzureSqlDatabaseUsageTotal] = defaultdict(AzureSqlDatabaseUsageTotal)
+        async for elastic_pool_name, usage in map_concurrently(
+            get_usage, list_elastic_pool_databases(), max_concurrency, ordered=False
+        ):
+            totals[elastic_pool_name].add(usage)
+        return {elastic_pool_name: total.to_usage() for elastic_pool_name, total in totals.items()}
+
+    @staticmethod
+    def _create_elastic_pool(
         resource_group_name: str,
         server_name: str,
         elastic_pool: ElasticPool,
-        calculate_usage: bool,
+        usage: AzureSqlDatabaseUsage | None,
     ) -> AzureSqlElasticPool:
         return AzureSqlElasticPool(
             resource_group_name,
             elastic_pool.name,
             server_name,
-            Size(elastic_pool.max_size_bytes),
-            await self._calculate_elastic_pool_database_usage(
-                sql_client, resource_group_name, server_name, elastic_pool.name
-            )
-            if calculate_usage
-            else None,
+            elastic_pool.max_size_bytes,
+            usage,
         )
 
     async def get_elastic_pools(
-        self, subscription_id: str, resource_group_name: str, server_name: str, calculate_usage=False
+        self,
+        subscription_id: str,
+        resource_group_name: str,
+        server_name: str,
+        calculate_usage=False,
+        max_concurrency: int = 1,
     ) -> AsyncIterator[AzureSqlElasticPool]:
-        async with SqlManagementClient(self._credential, subscription_id) as sql_client:
+        async with self._sql_clients.acquire(subscription_id) as sql_client:
+            usages: dict[str, AzureSqlDatabaseUsage] = (
+                await self._calculate_elastic_pools_database_usage(
+                    sql_client, resource_group_name, server_name, max_concurrency
+                )
+                if calculate_usage
+                else {}
+            )
             elastic_pool: ElasticPool
             async for elastic_pool in sql_client.elastic_pools.list_by_server(resource_group_name, server_name):
-                yield await self._create_elastic_pool(
-                    sql_client, resource_group_name, server_name, elastic_pool, calculate_usage
+                yield self._create_elastic_pool(
+                    resource_group_name,
+                    server_name,
+                    elastic_pool,
+                    usages.get(elastic_pool.name, _EMPTY_USAGE) if calculate_usage else None,
                 )
 
     async def get_elastic_pool(
@@ -248,9 +499,156 @@ class AzureSqlManager:
         server_name: str,
         elastic_pool_name: str,
         calculate_usage=False,
+        max_concurrency: int = 1,
     ) -> AzureSqlElasticPool:
-        async with SqlManagementClient(self._credential, subscription_id) as sql_client:
-            elastic_pool = await sql_client.elastic_pools.get(resource_group_name, server_name, elastic_pool_name)
-            return await self._create_elastic_pool(
-                sql_client, resource_group_name, server_name, elastic_pool, calculate_usage
-            )
+        async def load() -> AzureSqlElasticPool:
+            async with self._sql_clients.acquire(subscription_id) as sql_client:
+                elastic_pool = await sql_client.elastic_pools.get(resource_group_name, server_name, elastic_pool_name)
+                return self._create_elastic_pool(
+                    resource_group_name,
+                    server_name,
+                    elastic_pool,
+                    await self._calculate_elastic_pool_database_usage(
+                        sql_client, resource_group_name, server_name, elastic_pool_name, max_concurrency
+                    )
+                    if calculate_usage
+                    else None,
+                )
+
+        return await self._cached(
+            ("elastic_pool", subscription_id, resource_group_name, server_name, elastic_pool_name, calculate_usage),
+            self._cache_policies.elastic_pool,
+            load,
+        )
+
+    async def sweep(
+        self,
+        max_concurrency: int = 32,
+        max_concurrency_per_subscription: int = 8,
+        include_elastic_pools: bool = True,
+        subscription_ids: Collection[str] | None = None,
+        state: SweepState | None = None,
+        budget: ConcurrencyBudget | None = None,
+    ) -> AsyncIterator[AzureSqlInventoryRecord]:
+        # Walks subscriptions -> servers -> elastic pools and databases concurrently. Every ARM call is bounded by
+        # a global budget and a per-subscription budget, and records are streamed as soon as they are available.
+        # Concurrent sweeps share a budget by passing it, the concurrency limits then come from the budget.
+        if budget is None:
+            budget = ConcurrencyBudget(max_concurrency, max_concurrency_per_subscription)
+        records: asyncio.Queue[AzureSqlInventoryRecord] = asyncio.Queue(maxsize=max_concurrency * 4)
+        producer = asyncio.create_task(
+            self._sweep_subscriptions(budget, records, include_elastic_pools, subscription_ids, state)
+        )
+        try:
+            while not (producer.done() and records.empty()):
+                record = asyncio.ensure_future(records.get())
+                await asyncio.wait({record, producer}, return_when=asyncio.FIRST_COMPLETED)
+                if record.done():
+                    yield record.result()
+                else:
+                    record.cancel()
+            producer.result()
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    @staticmethod
+    def _record(
+        subscription_id: str, resource: Any, state: SweepState | None, usage_sampled: bool = False
+    ) -> AzureSqlInventoryRecord:
+        changed = state.update(subscription_id, resource, usage_sampled) if state is not None else True
+        return AzureSqlInventoryRecord(subscription_id, resource, changed)
+
+    async def _sweep_subscriptions(
+        self,
+        budget: ConcurrencyBudget,
+        records: asyncio.Queue[AzureSqlInventoryRecord],
+        include_elastic_pools: bool,
+        subscription_ids: Collection[str] | None,
+        state: SweepState | None,
+    ) -> None:
+        subscriptions: list[AzureSubscription] = (
+            [subscription async for subscription in self.get_subscriptions()]
+            if subscription_ids is None
+            else list(await asyncio.gather(*[self.get_subscription(id_) for id_ in subscription_ids]))
+        )
+        for subscription in subscriptions:
+            await records.put(self._record(subscription.subscription_id, subscription, state))
+        await gather_or_cancel(
+            *[
+                self._sweep_subscription(subscription.subscription_id, budget, records, include_elastic_pools, state)
+                for subscription in subscriptions
+                # Resources of disabled subscriptions cannot be read.
+                if subscription.enabled
+            ]
+        )
+
+    async def _sweep_subscription(
+        self,
+        subscription_id: str,
+        budget: ConcurrencyBudget,
+        records: asyncio.Queue[AzureSqlInventoryRecord],
+        include_elastic_pools: bool,
+        state: SweepState | None,
+    ) -> None:
+        async with budget.acquire(subscription_id):
+            servers = [server async for server in self.get_servers(subscription_id)]
+        for server in servers:
+            await records.put(self._record(subscription_id, server, state))
+        await gather_or_cancel(
+            *[
+                self._sweep_server(subscription_id, server, budget, records, include_elastic_pools, state)
+                for server in servers
+            ]
+        )
+
+    async def _sweep_server(
+        self,
+        subscription_id: str,
+        server: AzureSqlServer,
+        budget: ConcurrencyBudget,
+        records: asyncio.Queue[AzureSqlInventoryRecord],
+        include_elastic_pools: bool,
+        state: SweepState | None,
+    ) -> None:
+        resource_group_name = server.resource_group_name
+        server_name = server.name
+        async with self._sql_clients.acquire(subscription_id) as sql_client:
+            # Listings are fully read before fanning out, so they never hold a budget slot that a usage call needs.
+            async with budget.acquire(subscription_id):
+                databases = [
+                    database
+                    async for database in self._list_user_databases(sql_client, resource_group_name, server_name)
+                ]
+
+            async def create_record(database: Database) -> AzureSqlInventoryRecord:
+                return await self._create_database_record(
+                    sql_client, subscription_id, resource_group_name, server_name, database, state, budget
+                )
+
+            elastic_pool_totals: defaultdict[str, AzureSqlDatabaseUsageTotal] = defaultdict(AzureSqlDatabaseUsageTotal)
+            async for record in map_concurrently(
+                create_record, iterate(databases), budget.max_concurrency_per_key, ordered=False
+            ):
+                azure_sql_database = cast(AzureSqlDatabase, record.resource)
+                if azure_sql_database.elastic_pool_name is not None:
+                    elastic_pool_totals[azure_sql_database.elastic_pool_name].add(azure_sql_database.usage)
+                await records.put(record)
+
+            if not include_elastic_pools:
+                return
+            async with budget.acquire(subscription_id):
+                elastic_pools = [
+                    elastic_pool
+                    async for elastic_pool in sql_client.elastic_pools.list_by_server(resource_group_name, server_name)
+                ]
+            for elastic_pool in elastic_pools:
+                total = elastic_pool_totals.get(elastic_pool.name)
+                usage = total.to_usage() if total is not None else _EMPTY_USAGE
+                await records.put(
+                    self._record(
+                        subscription_id,
+                        self._create_elastic_pool(resource_group_name, server_name, elastic_pool, usage),
+                        state,
+                    )
+                )
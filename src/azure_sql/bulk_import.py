@@ -0,0 +1,95 @@
+import csv
+import uuid
+from typing import AsyncIterable, AsyncIterator
+
+import orjson
+
+from azure_sql.responses import NDJSON_MEDIA_TYPE
+
+CSV_MEDIA_TYPE = "text/csv"
+SUPPORTED_MEDIA_TYPES = (NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE)
+SUBSCRIPTION_COLUMNS = ("subscription_id", "display_name", "enabled")
+
+SubscriptionRecord = tuple[uuid.UUID, str | None, bool | None]
+
+_BOOLEANS = {"true": True, "1": True, "false": False, "0": False, "": None}
+
+
+async def iterate_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    # Chunks of a streamed body are cut anywhere, the incomplete last line is kept for the next chunk.
+    pending = b""
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r").decode()
+    if pending:
+        yield pending.rstrip(b"\r").decode()
+
+
+def _parse_subscription(line_number: int, subscription_id, display_name, enabled) -> SubscriptionRecord:
+    try:
+        if isinstance(enabled, str):
+            enabled = _BOOLEANS[enabled.strip().lower()]
+        if enabled is not None and not isinstance(enabled, bool):
+            raise ValueError()
+        if display_name is not None and not isinstance(display_name, str):
+            raise ValueError()
+        return uuid.UUID(subscription_id), display_name, enabled
+    except (AttributeError, KeyError, TypeError, ValueError):
+        raise ValueError(f"invalid subscription at line {line_number}.")
+
+
+async def parse_ndjson_subscriptions(lines: AsyncIterable[str]) -> AsyncIterator[SubscriptionRecord]:
+    # https://github.com/ndjson/ndjson-spec
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            item = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            raise ValueError(f"invalid JSON at line {line_number}.")
+        if not isinstance(item, dict):
+            raise ValueError(f"invalid subscription at line {line_number}.")
+        # Every column is written, a missing one would clear the stored value. null clears it explicitly.
+        missing = [column for column in SUBSCRIPTION_COLUMNS if column not in item]
+        if missing:
+            raise ValueError(f"missing {', '.join(missing)} at line {line_number}.")
+        yield _parse_subscription(line_number, *(item[column] for column in SUBSCRIPTION_COLUMNS))
+
+
+async def parse_csv_subscriptions(lines: AsyncIterable[str]) -> AsyncIterator[SubscriptionRecord]:
+    # https://www.rfc-editor.org/rfc/rfc4180, with a header row naming the columns.
+    # Records are parsed line by line, quoted values cannot contain line breaks.
+    columns: list[str] | None = None
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if columns is None:
+            columns = [value.strip() for value in values]
+            # Every column is written, a missing one would clear the stored value. An empty value clears it.
+            missing = [column for column in SUBSCRIPTION_COLUMNS if column not in columns]
+            if missing:
+                raise ValueError(f"the header must name the {', '.join(missing)} column(s).")
+            continue
+        if len(values) != len(columns):
+            raise ValueError(f"expected {len(columns)} values at line {line_number}.")
+        item = dict(zip(columns, values))
+        yield _parse_subscription(line_number, *(item[column] for column in SUBSCRIPTION_COLUMNS))
+
+
+def get_media_type(content_type: str | None) -> str:
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def parse_subscriptions(media_type: str, chunks: AsyncIterable[bytes]) -> AsyncIterator[SubscriptionRecord]:
+    if media_type == NDJSON_MEDIA_TYPE:
+        return parse_ndjson_subscriptions(iterate_lines(chunks))
+    if media_type == CSV_MEDIA_TYPE:
+        return parse_csv_subscriptions(iterate_lines(chunks))
+    raise ValueError(f"unsupported media type {media_type!r}.")
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from azure_sql.concurrency import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: float
+    # Once ttl has elapsed, the stale value is still served for this many seconds while it is refreshed in background.
+    stale_while_revalidate: float = 0
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    expires_at: float
+    stale_until: float
+
+
+class AsyncTTLCache:
+    # Bounded LRU cache for coroutine results. Concurrent loads of the same key share a single in-flight call.
+    def __init__(self, max_size: int = 1024) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be greater than 0.")
+        self._max_size = max_size
+        self._entries: OrderedDict[Hashable, _CacheEntry] = OrderedDict()
+        self._loads = SingleFlight()
+        self._refreshes: set[asyncio.Future[Any]] = set()
+        # Incremented on every invalidation, loads started before it do not store their (maybe stale) result.
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() < entry.stale_until
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[T]], policy: CachePolicy) -> T:
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = time.monotonic()
+            if now < entry.expires_at:
+                self._entries.move_to_end(key)
+                return entry.value
+            if now < entry.stale_until:
+                self._entries.move_to_end(key)
+                if key not in self._loads:
+                    refresh = self._start_load(key, loader, policy)
+                    self._refreshes.add(refresh)
+                    refresh.add_done_callback(self._on_refresh_done)
+                return entry.value
+        # https://docs.python.org/3/library/asyncio-task.html#asyncio.shield
+        return await asyncio.shield(self._start_load(key, loader, policy))
+
+    def set(self, key: Hashable, value: Any, policy: CachePolicy) -> None:
+        now = time.monotonic()
+        self._entries[key] = _CacheEntry(value, now + policy.ttl, now + policy.ttl + policy.stale_while_revalidate)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._generation += 1
+        self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        self._generation += 1
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    async def close(self) -> None:
+        # Cancels the loads in flight, background refreshes included
+        await self._loads.close()
+        self._refreshes.clear()
+        self.clear()
+
+    def _start_load(self, key: Hashable, loader: Callable[[], Awaitable[T]], policy: CachePolicy) -> asyncio.Future[T]:
+        # Concurrent loads of the key share one task, callers are shielded from it so cancelling one of them does not
+        # cancel the others. The value is stored by the task, even when every caller was cancelled meanwhile.
+        generation = self._generation
+
+        async def load() -> T:
+            value = await loader()
+            if generation == self._generation:
+                self.set(key, value, policy)
+            return value
+
+        return self._loads.start(key, load)
+
+    def _on_refresh_done(self, refresh: asyncio.Future[Any]) -> None:
+        self._refreshes.discard(refresh)
+        if not refresh.cancelled() and refresh.exception() is not None:
+            logger.warning("Background cache refresh failed, serving stale value.", exc_info=refresh.exception())
@@ -0,0 +1,70 @@
+import asyncio
+import contextlib
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Generic, Hashable, Protocol, TypeVar
+
+
+class AsyncClient(Protocol):
+    async def __aenter__(self) -> Any:
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+K = TypeVar("K", bound=Hashable)
+C = TypeVar("C", bound=AsyncClient)
+
+
+@dataclass
+class _PooledClient(Generic[C]):
+    client: C
+    leases: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ClientPool(Generic[K, C]):
+    # Long-lived clients keyed by K (e.g. subscription id) so their HTTP sessions and connections are reused.
+    # Clients idle for more than idle_timeout seconds and not currently leased are closed on the next acquire.
+    def __init__(self, factory: Callable[[K], C], idle_timeout: float = 300) -> None:
+        self._factory = factory
+        self._idle_timeout = idle_timeout
+        self._clients: dict[K, _PooledClient[C]] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, key: K) -> AsyncIterator[C]:
+        pooled_client = await self._lease(key)
+        try:
+            yield pooled_client.client
+        finally:
+            pooled_client.leases -= 1
+            pooled_client.last_used = time.monotonic()
+
+    async def _lease(self, key: K) -> _PooledClient[C]:
+        async with self._lock:
+            await self._evict_idle()
+            pooled_client = self._clients.get(key)
+            if pooled_client is None:
+                client = self._factory(key)
+                await client.__aenter__()
+                pooled_client = self._clients[key] = _PooledClient(client)
+            pooled_client.leases += 1
+            return pooled_client
+
+    async def _evict_idle(self) -> None:
+        now = time.monotonic()
+        for key, pooled_client in list(self._clients.items()):
+            if pooled_client.leases == 0 and now - pooled_client.last_used > self._idle_timeout:
+                del self._clients[key]
+                await pooled_client.client.close()
+
+    async def close(self) -> None:
+        async with self._lock:
+            clients = [pooled_client.client for pooled_client in self._clients.values()]
+            self._clients.clear()
+            await asyncio.gather(*[client.close() for client in clients])
@@ -0,0 +1,145 @@
+import zlib
+from typing import Callable, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses are compressed with gzip only without it
+    brotli = None
+
+
+class _Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    def flush(self) -> bytes:
+        ...
+
+    def finish(self) -> bytes:
+        ...
+
+
+class _GZipEncoder:
+    def __init__(self, level: int) -> None:
+        # https://docs.python.org/3/library/zlib.html#zlib.compressobj (wbits 16 + MAX_WBITS writes a gzip container)
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    # https://www.rfc-editor.org/rfc/rfc9110#name-accept-encoding
+    encodings: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, parameters = item.partition(";")
+        quality = 1.0
+        name, _, value = parameters.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if coding.strip():
+            encodings[coding.strip().lower()] = quality
+    return encodings
+
+
+class CompressionMiddleware:
+    # Negotiates brotli (when installed) or gzip, like starlette's GZipMiddleware but with a faster default level
+    # and flushing every chunk of streaming responses, so NDJSON lines are not held back by the compressor.
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _negotiate(self, accept_encoding: str) -> tuple[str, Callable[[], _Encoder]] | None:
+        encodings = _parse_accept_encoding(accept_encoding)
+        if brotli is not None and encodings.get("br", 0) > 0:
+            return "br", lambda: _BrotliEncoder(self.brotli_quality)
+        if encodings.get("gzip", 0) > 0:
+            return "gzip", lambda: _GZipEncoder(self.gzip_level)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            negotiated = self._negotiate(Headers(scope=scope).get("Accept-Encoding", ""))
+            if negotiated is not None:
+                encoding, encoder_factory = negotiated
+                responder = _CompressionResponder(self.app, self.minimum_size, encoding, encoder_factory)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, minimum_size: int, encoding: str, encoder_factory: Callable[[], _Encoder]) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoding = encoding
+        self.encoder_factory = encoder_factory
+        self.encoder: _Encoder | None = None
+        self.initial_message: Message = {}
+        self.started = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Held back until the first body message tells whether the response is compressed.
+            self.initial_message = message
+            return
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if "Content-Encoding" in headers or (len(body) < self.minimum_size and not more_body):
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+            self.encoder = self.encoder_factory()
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                del headers["Content-Length"]
+                message["body"] = self.encoder.compress(body) + self.encoder.flush()
+            else:
+                message["body"] = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+        if self.encoder is not None:
+            compressed = self.encoder.compress(body)
+            message["body"] = compressed + (self.encoder.flush() if more_body else self.encoder.finish())
+        await self.send(message)
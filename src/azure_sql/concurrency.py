@@ -0,0 +1,116 @@
+import asyncio
+import contextlib
+from collections import deque
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Hashable, Iterable, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def map_concurrently(
+    func: Callable[[T], Awaitable[R]], items: AsyncIterable[T], max_concurrency: int = 1, ordered: bool = True
+) -> AsyncIterator[R]:
+    # Results are streamed in source order when ordered, otherwise in completion order.
+    # The source is consumed lazily, so no more than max_concurrency items are pulled ahead of the consumer.
+    # https://docs.python.org/3/library/asyncio-task.html#asyncio.wait
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be greater than 0.")
+    pending: deque[asyncio.Future[R]] = deque()
+    try:
+        async for item in items:
+            if len(pending) >= max_concurrency:
+                async for result in _next_results(pending, ordered):
+                    yield result
+            pending.append(asyncio.ensure_future(func(item)))
+        while pending:
+            async for result in _next_results(pending, ordered):
+                yield result
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _next_results(pending: deque[asyncio.Future[R]], ordered: bool) -> AsyncIterator[R]:
+    if ordered:
+        yield await pending.popleft()
+        return
+    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    for task in done:
+        pending.remove(task)
+    for task in done:
+        yield task.result()
+
+
+async def iterate(items: Iterable[T]) -> AsyncIterator[T]:
+    for item in items:
+        yield item
+
+
+async def gather_or_cancel(*aws: Awaitable[Any]) -> list[Any]:
+    # Like asyncio.gather, but the remaining awaitables are cancelled as soon as one of them fails.
+    futures = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*futures)
+    finally:
+        for future in futures:
+            future.cancel()
+        await asyncio.gather(*futures, return_exceptions=True)
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share a single call of their function. The call runs in its own task and
+    # callers only wait for it, so a cancelled caller cancels neither the call nor the other callers waiting for it.
+    # https://docs.python.org/3/library/asyncio-task.html#asyncio.shield
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future[Any]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def start(self, key: Hashable, func: Callable[[], Awaitable[R]]) -> asyncio.Future[R]:
+        # The call in flight for key, or a new one. Cancelling the returned future cancels the call of every caller.
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = asyncio.ensure_future(func())
+            call.add_done_callback(lambda done: self._forget(key, done))
+        return call
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[R]]) -> R:
+        return await asyncio.shield(self.start(key, func))
+
+    def _forget(self, key: Hashable, call: asyncio.Future[Any]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            # Mark the exception as retrieved, every caller may have been cancelled.
+            call.exception()
+
+    async def close(self) -> None:
+        calls = list(self._calls.values())
+        for call in calls:
+            call.cancel()
+        await asyncio.gather(*calls, return_exceptions=True)
+
+
+class ConcurrencyBudget:
+    # A global limit shared by every key plus an independent limit per key (e.g. per subscription).
+    def __init__(self, max_concurrency: int, max_concurrency_per_key: int) -> None:
+        if max_concurrency < 1 or max_concurrency_per_key < 1:
+            raise ValueError("max_concurrency and max_concurrency_per_key must be greater than 0.")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_concurrency_per_key = max_concurrency_per_key
+        self._key_semaphores: dict[Hashable, asyncio.Semaphore] = {}
+
+    @property
+    def max_concurrency_per_key(self) -> int:
+        return self._max_concurrency_per_key
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, key: Hashable) -> AsyncIterator[None]:
+        key_semaphore = self._key_semaphores.get(key)
+        if key_semaphore is None:
+            key_semaphore = self._key_semaphores[key] = asyncio.Semaphore(self._max_concurrency_per_key)
+        # The key slot is taken first, so a busy key does not hold global slots while it waits.
+        async with key_semaphore, self._semaphore:
+            yield
@@ -1,7 +1,8 @@
 from dependency_injector import providers
 from dependency_injector.containers import DeclarativeContainer
 
-from azure_sql.database import session_provider
+from azure_sql.database import read_session_provider, routed_session_provider
+from azure_sql.query_cache import QueryCache
 
 
 def _noop():
@@ -16,6 +17,10 @@ class Container(DeclarativeContainer):
     # https://fastapi.tiangolo.com/async/#sub-dependencies
     # https://python-dependency-injector.ets-labs.org/providers/resource.html#resources-wiring-and-per-function-execution-scope
     # https://github.com/ets-labs/python-dependency-injector/issues/595#issuecomment-1225677845
-    session_provider = providers.Object(session_provider)
+    # Primary database, or the read replica inside the query requests of the mediator
+    session_provider = providers.Object(routed_session_provider)
+    read_session_provider = providers.Object(read_session_provider)
+
+    query_cache = providers.Singleton(QueryCache)
 
     mediator = _noop()
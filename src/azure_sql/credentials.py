@@ -0,0 +1,207 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, cast
+
+import orjson
+from azure.core.credentials import AccessToken
+from azure.core.credentials_async import AsyncTokenCredential
+from azure.identity.aio import DefaultAzureCredential
+from cryptography.fernet import Fernet, InvalidToken
+
+from azure_sql.concurrency import SingleFlight
+
+try:
+    import fcntl
+except ImportError:  # Windows, processes sharing the file are not serialized
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+ARM_SCOPE = "https://management.azure.com/.default"
+
+# The tenant and the scopes of a token
+TokenKey = tuple[str | None, tuple[str, ...]]
+
+
+class TokenFileCache:
+    # Tokens shared by the processes of a host (uvicorn workers, restarts), encrypted with Fernet.
+    # https://cryptography.io/en/latest/fernet/
+    def __init__(self, path: str | Path, key: bytes | str, namespace: str = "default") -> None:
+        self.path = Path(path)
+        self._fernet = Fernet(key)
+        # Tokens of different identities may share the file
+        self._namespace = namespace
+
+    @classmethod
+    def from_environ(cls) -> "TokenFileCache | None":
+        path = os.environ.get("AZURE_TOKEN_CACHE_PATH")
+        key = os.environ.get("AZURE_TOKEN_CACHE_KEY")
+        if not path or not key:
+            return None
+        return cls(path, key, os.environ.get("AZURE_CLIENT_ID") or "default")
+
+    def _name(self, key: TokenKey) -> str:
+        tenant_id, scopes = key
+        return "|".join([self._namespace, tenant_id or "", *scopes])
+
+    def _read(self) -> dict[str, list[Any]]:
+        try:
+            return orjson.loads(self._fernet.decrypt(self.path.read_bytes()))
+        except FileNotFoundError:
+            return {}
+        except (InvalidToken, orjson.JSONDecodeError):
+            # Written with another key or corrupted, it is overwritten by the next save
+            logger.warning("Token cache %s cannot be read, ignoring it.", self.path)
+            return {}
+
+    def _write(self, tokens: dict[str, list[Any]]) -> None:
+        # Written to a temporary file and renamed, readers never see a partial file.
+        temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as file:
+            file.write(self._fernet.encrypt(orjson.dumps(tokens)))
+        os.replace(temporary_path, self.path)
+
+    def _get(self, key: TokenKey) -> AccessToken | None:
+        token = self._read().get(self._name(key))
+        return AccessToken(*token) if token is not None else None
+
+    def _set(self, key: TokenKey, token: AccessToken) -> None:
+        now = time.time()
+        tokens = {name: value for name, value in self._read().items() if value[1] > now}
+        tokens[self._name(key)] = [token.token, token.expires_on]
+        self._write(tokens)
+
+    async def get(self, key: TokenKey) -> AccessToken | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: TokenKey, token: AccessToken) -> None:
+        await asyncio.to_thread(self._set, key, token)
+
+    @contextlib.asynccontextmanager
+    async def lock(self) -> AsyncIterator[None]:
+        # Held while a process authenticates, the others wait and read its token instead of authenticating too.
+        if fcntl is None:
+            yield
+            return
+        file = await asyncio.to_thread(open, self.path.with_name(f"{self.path.name}.lock"), "a")
+        try:
+            await asyncio.to_thread(fcntl.flock, file.fileno(), fcntl.LOCK_EX)
+            yield
+        finally:
+            # Closing the file releases the lock
+            file.close()
+
+
+class CachedTokenCredential(AsyncTokenCredential):
+    # Wraps a credential (e.g. DefaultAzureCredential, whose first token walks its whole chain) so tokens are
+    # cached until refresh_before seconds before they expire and concurrent requests share a single call.
+    # warm() fetches a token and keeps it refreshed in background, so callers do not wait for it to be renewed.
+    def __init__(
+        self,
+        credential: AsyncTokenCredential,
+        refresh_before: float = 300,
+        retry_interval: float = 30,
+        token_cache: TokenFileCache | None = None,
+    ) -> None:
+        self._credential = credential
+        self._refresh_before = refresh_before
+        self._retry_interval = retry_interval
+        self._token_cache = token_cache
+        self._tokens: dict[TokenKey, AccessToken] = {}
+        self._loads = SingleFlight()
+        self._refreshers: dict[TokenKey, asyncio.Task[None]] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _is_fresh(self, token: AccessToken | None) -> bool:
+        return token is not None and time.time() < token.expires_on - self._refresh_before
+
+    async def get_token(
+        self, *scopes: str, claims: str | None = None, tenant_id: str | None = None, **kwargs: Any
+    ) -> AccessToken:
+        if claims is not None or kwargs:
+            # Claims challenges need a new token
+            return await self._credential.get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+        key = (tenant_id, scopes)
+        token = self._tokens.get(key)
+        if self._is_fresh(token):
+            return cast(AccessToken, token)
+        return await self._load(key)
+
+    def warm(self, *scopes: str, tenant_id: str | None = None) -> None:
+        # The first token is requested in background, callers of get_token wait for that same request.
+        key = (tenant_id, scopes)
+        if key not in self._refreshers:
+            refresher = self._refreshers[key] = asyncio.create_task(self._keep_fresh(key))
+            # A refresher that stopped is started again by the next call
+            refresher.add_done_callback(lambda done: self._forget_refresher(key, done))
+
+    def _forget_refresher(self, key: TokenKey, refresher: asyncio.Task[None]) -> None:
+        if self._refreshers.get(key) is refresher:
+            del self._refreshers[key]
+
+    async def _load(self, key: TokenKey) -> AccessToken:
+        # The token is stored by the shared call, a caller cancelled while waiting for it does not lose it.
+        async def load() -> AccessToken:
+            token = await self._request_token(key)
+            self._tokens[key] = token
+            return token
+
+        return await self._loads.run(key, load)
+
+    async def _request_token(self, key: TokenKey) -> AccessToken:
+        tenant_id, scopes = key
+        kwargs = {"tenant_id": tenant_id} if tenant_id is not None else {}
+        if self._token_cache is None:
+            return await self._credential.get_token(*scopes, **kwargs)
+        async with self._token_cache.lock():
+            token = await self._token_cache.get(key)
+            if self._is_fresh(token):
+                return cast(AccessToken, token)
+            token = await self._credential.get_token(*scopes, **kwargs)
+            await self._token_cache.set(key, token)
+            return token
+
+    async def _keep_fresh(self, key: TokenKey) -> None:
+        tenant_id, scopes = key
+        delay = 0.0
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                token = await self.get_token(*scopes, tenant_id=tenant_id)
+            except asyncio.CancelledError:
+                # close() unregisters the refreshers it cancels, any other cancellation is the one of the request
+                if self._refreshers.get(key) is not asyncio.current_task():
+                    raise
+                logger.warning("Background token refresh was cancelled, retrying in %s seconds.", self._retry_interval)
+                delay = self._retry_interval
+            except Exception:
+                logger.warning(
+                    "Background token refresh failed, retrying in %s seconds.", self._retry_interval, exc_info=True
+                )
+                delay = self._retry_interval
+            else:
+                delay = max(token.expires_on - self._refresh_before - time.time(), self._retry_interval)
+
+    async def close(self) -> None:
+        refreshers = list(self._refreshers.values())
+        self._refreshers.clear()
+        for refresher in refreshers:
+            refresher.cancel()
+        await asyncio.gather(*refreshers, return_exceptions=True)
+        await self._loads.close()
+        self._tokens.clear()
+        await self._credential.close()
+
+
+def create_credential() -> CachedTokenCredential:
+    # DefaultAzureCredential with its tokens cached, in the file of AZURE_TOKEN_CACHE_PATH when it is configured.
+    return CachedTokenCredential(DefaultAzureCredential(), token_cache=TokenFileCache.from_environ())
@@ -1,27 +1,91 @@
 import contextlib
 import os
 from asyncio import current_task
-from typing import AsyncIterator
+from contextvars import ContextVar
+from typing import AsyncContextManager, AsyncIterator, Iterator
 from urllib.parse import quote_plus
 
 from dotenv import find_dotenv, load_dotenv
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_scoped_session, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from azure_sql.metrics import InstrumentedAsyncAdaptedQueuePool, instrument_engine
 
 load_dotenv(dotenv_path=(find_dotenv(usecwd=True)))
 
-# https://docs.sqlalchemy.org/en/14/dialects/postgresql.html#module-sqlalchemy.dialects.postgresql.asyncpg
-# https://docs.sqlalchemy.org/en/14/core/engines.html#escaping-special-characters-such-as-signs-in-passwords
-SQLALCHEMY_DATABASE_URL = (
-    "postgresql+asyncpg://"
-    f"{os.environ['SQLALCHEMY_URL_USER']}:"
-    f"{quote_plus(os.environ['SQLALCHEMY_URL_PASSWORD'])}@"
-    f"{os.environ['SQLALCHEMY_URL_HOST']}:"
-    f"{os.environ['SQLALCHEMY_URL_PORT']}/"
-    f"{os.environ['SQLALCHEMY_URL_DBNAME']}"
+
+def _get_database_url(host: str, port: str) -> str:
+    # https://docs.sqlalchemy.org/en/14/dialects/postgresql.html#module-sqlalchemy.dialects.postgresql.asyncpg
+    # https://docs.sqlalchemy.org/en/14/core/engines.html#escaping-special-characters-such-as-signs-in-passwords
+    return (
+        "postgresql+asyncpg://"
+        f"{os.environ['SQLALCHEMY_URL_USER']}:"
+        f"{quote_plus(os.environ['SQLALCHEMY_URL_PASSWORD'])}@"
+        f"{host}:"
+        f"{port}/"
+        f"{os.environ['SQLALCHEMY_URL_DBNAME']}"
+    )
+
+
+def _get_env(name: str, default: str) -> str:
+    # Variables left empty in .env fall back to the default.
+    return os.environ.get(name) or default
+
+
+SQLALCHEMY_DATABASE_URL = _get_database_url(os.environ["SQLALCHEMY_URL_HOST"], os.environ["SQLALCHEMY_URL_PORT"])
+# Read replica (or a load balanced endpoint in front of several), the primary is used when it is not configured.
+# https://learn.microsoft.com/en-us/azure/postgresql/flexible-server/concepts-read-replicas
+SQLALCHEMY_READ_DATABASE_URL = (
+    _get_database_url(
+        os.environ["SQLALCHEMY_READ_URL_HOST"], _get_env("SQLALCHEMY_READ_URL_PORT", os.environ["SQLALCHEMY_URL_PORT"])
+    )
+    if os.environ.get("SQLALCHEMY_READ_URL_HOST")
+    else None
+)
+
+
+# https://docs.sqlalchemy.org/en/14/core/pooling.html
+# https://docs.sqlalchemy.org/en/14/dialects/postgresql.html#prepared-statement-cache
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "echo": _get_env("SQLALCHEMY_ECHO", "false").lower() == "true",
+    "pool_size": int(_get_env("SQLALCHEMY_POOL_SIZE", "10")),
+    "max_overflow": int(_get_env("SQLALCHEMY_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(_get_env("SQLALCHEMY_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(_get_env("SQLALCHEMY_POOL_RECYCLE", "1800")),
+    # Off by default, it costs a round trip per checkout. pool_recycle already discards old connections.
+    "pool_pre_ping": _get_env("SQLALCHEMY_POOL_PRE_PING", "false").lower() == "true",
+    "poolclass": InstrumentedAsyncAdaptedQueuePool,
+    "connect_args": {
+        "prepared_statement_cache_size": int(_get_env("SQLALCHEMY_PREPARED_STATEMENT_CACHE_SIZE", "500")),
+    },
+}
+
+engine: AsyncEngine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL, future=True, pool_logging_name="primary", **SQLALCHEMY_ENGINE_OPTIONS
+)
+read_engine: AsyncEngine = (
+    create_async_engine(
+        SQLALCHEMY_READ_DATABASE_URL, future=True, pool_logging_name="read", **SQLALCHEMY_ENGINE_OPTIONS
+    )
+    if SQLALCHEMY_READ_DATABASE_URL is not None
+    else engine
 )
+instrument_engine(engine, "primary")
+if read_engine is not engine:
+    instrument_engine(read_engine, "read")
+
+
+def get_pool_status(engine_: AsyncEngine = engine) -> dict[str, int]:
+    pool = engine_.sync_engine.pool
+    return {
+        "size": pool.size(),  # type: ignore[attr-defined]
+        "checked_in": pool.checkedin(),  # type: ignore[attr-defined]
+        "checked_out": pool.checkedout(),  # type: ignore[attr-defined]
+        "overflow": pool.overflow(),  # type: ignore[attr-defined]
+    }
 
-engine: AsyncEngine = create_async_engine(SQLALCHEMY_DATABASE_URL, future=True, echo=True)
 
 # https://docs.sqlalchemy.org/en/14/orm/session_basics.html#session-faq-whentocreate
 # https://docs.sqlalchemy.org/en/14/orm/extensions/asyncio.html#using-asyncio-scoped-session
@@ -29,6 +93,28 @@ async_session_factory = sessionmaker(bind=engine, expire_on_commit=False, class_
 scoped_session = async_scoped_session(async_session_factory, scopefunc=current_task)
 
 
+class ReadOnlySession(Session):
+    pass
+
+
+@event.listens_for(ReadOnlySession, "before_flush")
+def _before_read_only_session_flush(session, flush_context, instances):
+    # Read sessions are in autocommit, a flush would be written immediately.
+    raise InvalidRequestError("read only sessions cannot be flushed.")
+
+
+# https://docs.sqlalchemy.org/en/14/orm/session_transaction.html#setting-isolation-for-a-sessionmaker-engine-wide
+# Statements run in autocommit, so no BEGIN and COMMIT round trips are sent for reads.
+read_session_factory = sessionmaker(
+    bind=read_engine.execution_options(isolation_level="AUTOCOMMIT"),
+    expire_on_commit=False,
+    autoflush=False,
+    class_=AsyncSession,
+    sync_session_class=ReadOnlySession,
+)
+read_scoped_session = async_scoped_session(read_session_factory, scopefunc=current_task)
+
+
 @contextlib.asynccontextmanager
 async def session_provider() -> AsyncIterator[AsyncSession]:
     # https://stackoverflow.com/questions/63125259/what-is-the-proper-way-to-type-hint-the-return-value-of-an-asynccontextmanager
@@ -42,3 +128,32 @@ async def session_provider() -> AsyncIterator[AsyncSession]:
     finally:
         # https://docs.sqlalchemy.org/en/14/orm/extensions/asyncio.html#using-asyncio-scoped-session
         await scoped_session.remove()
+
+
+@contextlib.asynccontextmanager
+async def read_session_provider() -> AsyncIterator[AsyncSession]:
+    # Never committed, the connection goes back to the pool when the session is closed.
+    try:
+        session: AsyncSession
+        async with read_scoped_session() as session:
+            yield session
+    finally:
+        await read_scoped_session.remove()
+
+
+_use_read_session: ContextVar[bool] = ContextVar("use_read_session", default=False)
+
+
+@contextlib.contextmanager
+def use_read_session() -> Iterator[None]:
+    # Sessions provided by routed_session_provider inside this block come from the read replica.
+    token = _use_read_session.set(True)
+    try:
+        yield
+    finally:
+        _use_read_session.reset(token)
+
+
+def routed_session_provider() -> AsyncContextManager[AsyncSession]:
+    # The engine is chosen when the provider is called, not when its result is entered.
+    return read_session_provider() if _use_read_session.get() else session_provider()
@@ -2,10 +2,15 @@ from typing import AsyncGenerator
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from azure_sql.database import session_provider
+from azure_sql.database import read_session_provider, session_provider
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     # https://docs.python.org/3/library/typing.html#typing.AsyncGenerator
     async with session_provider() as session:
         yield session
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    async with read_session_provider() as session:
+        yield session
@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterable, Callable, Iterable, Sequence
+
+from dependency_injector.wiring import Provide, inject
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Integer, String, Table, select
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from azure_sql import models
+from azure_sql.azure_sql_manager import AzureSqlInventoryRecord
+from azure_sql.containers import Container
+from azure_sql.ingest import InventoryBatch
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional, it is only needed to export
+    pyarrow = None
+
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+EXPORTED_TABLES = (
+    models.Subscription.__table__,
+    models.Server.__table__,
+    models.ElasticPool.__table__,
+    models.Database.__table__,
+    models.DatabaseUsageSample.__table__,
+    models.DatabaseUsageHourly.__table__,
+    models.DatabaseUsageDaily.__table__,
+)
+
+
+def _require_pyarrow() -> None:
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is required to export, install the export extra with `poetry install -E export`.")
+
+
+def _arrow_field(column) -> tuple["pyarrow.Field", Callable[[Any], Any] | None]:
+    # The same columns as the tables, so files exported from a sweep and from the database are read the same way.
+    # UUIDs are written as their canonical string, readers without an extension type for them can still filter.
+    column_type = column.type
+    if isinstance(column_type, UUID):
+        return pyarrow.field(column.name, pyarrow.string(), column.nullable), str
+    if isinstance(column_type, BigInteger):
+        arrow_type = pyarrow.int64()
+    elif isinstance(column_type, Integer):
+        arrow_type = pyarrow.int32()
+    elif isinstance(column_type, Boolean):
+        arrow_type = pyarrow.bool_()
+    elif isinstance(column_type, Float):
+        arrow_type = pyarrow.float64()
+    elif isinstance(column_type, DateTime):
+        arrow_type = pyarrow.timestamp("us", tz="UTC" if column_type.timezone else None)
+    elif isinstance(column_type, String):
+        arrow_type = pyarrow.string()
+    else:
+        raise TypeError(f"unsupported column type {column_type!r} of {column.name}.")
+    return pyarrow.field(column.name, arrow_type, column.nullable), None
+
+
+class ParquetTableWriter:
+    # https://arrow.apache.org/docs/python/parquet.html#writing-to-partitioned-datasets
+    # Rows are buffered up to a row group and written as one, memory is bounded by the row group size
+    # and not by the number of rows exported.
+    def __init__(
+        self,
+        where: str | Path,
+        table: Table,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        compression: str = "zstd",
+    ) -> None:
+        _require_pyarrow()
+        self.table = table
+        self.column_names = [column.name for column in table.columns]
+        fields, self._converters = zip(*(_arrow_field(column) for column in table.columns))
+        self.schema = pyarrow.schema(fields)
+        self.rows_written = 0
+        self._row_group_size = row_group_size
+        self._rows: list[Sequence[Any]] = []
+        self._writer = pyarrow.parquet.ParquetWriter(str(where), self.schema, compression=compression)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, rows: Iterable[Sequence[Any]]) -> None:
+        # Values in the order of the table columns
+        for row in rows:
+            self._rows.append(row)
+            if len(self._rows) >= self._row_group_size:
+                self.flush()
+
+    def write_mappings(self, rows: Iterable[dict[str, Any]]) -> None:
+        self.write(tuple(row.get(name) for name in self.column_names) for row in rows)
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        arrays = []
+        for field, converter, values in zip(self.schema, self._converters, zip(*self._rows)):
+            if converter is not None:
+                values = [converter(value) if value is not None else None for value in values]
+            arrays.append(pyarrow.array(values, type=field.type))
+        self._writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows_written += len(self._rows)
+        self._rows.clear()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+
+
+def _path(directory: Path, table: Table) -> Path:
+    return directory / f"{table.name}.parquet"
+
+
+class ParquetExporter:
+    # Writes one Parquet file per table, named after it, from a sweep or from the persisted tables.
+    @inject
+    def __init__(
+        self,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        compression: str = "zstd",
+        session_provider=Provide[Container.read_session_provider],
+    ) -> None:
+        self._row_group_size = row_group_size
+        self._compression = compression
+        self._session_provider = session_provider
+
+    def _open(self, directory: Path, table: Table) -> ParquetTableWriter:
+        return ParquetTableWriter(_path(directory, table), table, self._row_group_size, self._compression)
+
+    async def export_sweep(
+        self, records: AsyncIterable[AzureSqlInventoryRecord], directory: str | Path, batch_size: int = 1000
+    ) -> dict[str, int]:
+        # Records go through the same batch as the ingest, so the columns (and updated_at/sampled_at) match the
+        # tables. A batch is moved to the writers every batch_size records, only the row groups are kept in memory.
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        sampled_at = datetime.now(timezone.utc)
+        batch = InventoryBatch()
+        writers = {table: self._open(directory, table) for table, _ in batch.tables()}
+        try:
+            async for record in records:
+                batch.add(record, sampled_at)
+                if len(batch) >= batch_size:
+                    self._write_batch(batch, writers)
+            self._write_batch(batch, writers)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        return {table.name: writer.rows_written for table, writer in writers.items()}
+
+    @staticmethod
+    def _write_batch(batch: InventoryBatch, writers: dict[Table, ParquetTableWriter]) -> None:
+        for table, rows in batch.tables():
+            writers[table].write_mappings(rows.values())
+        batch.clear()
+
+    async def export_tables(
+        self, directory: str | Path, exported_tables: Sequence[Table] = EXPORTED_TABLES
+    ) -> dict[str, int]:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        rows_written = {}
+        session: AsyncSession
+        async with self._session_provider() as session:
+            # Server side cursors need a transaction, read sessions are in autocommit otherwise.
+            # REPEATABLE READ, so every table is exported from the same snapshot.
+            await session.connection(
+                execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+            )
+            for table in exported_tables:
+                # https://docs.sqlalchemy.org/en/14/orm/extensions/asyncio.html#using-streaming-results
+                # Core rows, the ORM entities are not needed to write columns.
+                result = await session.stream(select(table).execution_options(yield_per=self._row_group_size))
+                with self._open(directory, table) as writer:
+                    # partitions is an async generator, the sqlalchemy stubs declare it as a coroutine.
+                    async for rows in result.partitions():  # type: ignore[attr-defined]
+                        writer.write(rows)
+                rows_written[table.name] = writer.rows_written
+        return rows_written
+
+
+async def _export(args: argparse.Namespace) -> None:
+    # Imported here, the app wires the container and the manager is only needed to sweep.
+    from azure_sql.application import app
+    from azure_sql.azure_sql_manager import AzureSqlManager
+    from azure_sql.database import engine, read_engine
+    from azure_sql.throttling import ThrottlingPolicy
+
+    exporter = ParquetExporter(args.row_group_size, args.compression)
+    try:
+        if args.source == "sweep":
+            async with AzureSqlManager(throttling=ThrottlingPolicy()) as azure_sql_manager:
+                rows_written = await exporter.export_sweep(
+                    azure_sql_manager.sweep(args.max_concurrency, subscription_ids=args.subscription_id),
+                    args.output,
+                )
+        else:
+            rows_written = await exporter.export_tables(args.output)
+    finally:
+        await app.container.query_cache().close()  # type: ignore[attr-defined]
+        await engine.dispose()
+        if read_engine is not engine:
+            await read_engine.dispose()
+    for table_name, rows in rows_written.items():
+        print(f"{table_name}: {rows} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the inventory to one Parquet file per table.")
+    parser.add_argument("source", choices=("sweep", "tables"), help="sweep Azure or read the persisted tables")
+    parser.add_argument("--output", required=True, help="directory of the Parquet files")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--compression", default="zstd")
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--subscription-id", action="append", help="sweep only these subscriptions")
+    asyncio.run(_export(parser.parse_args()))
@@ -0,0 +1,383 @@
+import argparse
+import asyncio
+import random
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from aiohttp import web
+from azure.core.credentials import AccessToken
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+
+# Local stand-in for the Azure Resource Manager endpoints used by AzureSqlManager, for tests and benchmarks.
+# https://learn.microsoft.com/en-us/rest/api/sql/
+# https://learn.microsoft.com/en-us/rest/api/resources/subscriptions
+
+_SQL = "providers/Microsoft.Sql"
+_GIGABYTE = 1024**3
+
+
+@dataclass
+class FakeDatabase:
+    name: str
+    space_used_bytes: float
+    space_allocated_bytes: float
+    max_size_bytes: int = 32 * _GIGABYTE
+    status: str = "Online"
+    current_service_objective_name: str = "S0"
+    elastic_pool_name: str | None = None
+
+
+@dataclass
+class FakeElasticPool:
+    name: str
+    max_size_bytes: int = 100 * _GIGABYTE
+
+
+@dataclass
+class FakeServer:
+    resource_group_name: str
+    name: str
+    databases: dict[str, FakeDatabase] = field(default_factory=dict)
+    elastic_pools: dict[str, FakeElasticPool] = field(default_factory=dict)
+
+
+@dataclass
+class FakeSubscription:
+    subscription_id: str
+    display_name: str
+    enabled: bool = True
+    servers: dict[tuple[str, str], FakeServer] = field(default_factory=dict)
+
+
+@dataclass
+class FakeArmInventory:
+    subscriptions: dict[str, FakeSubscription] = field(default_factory=dict)
+
+    @classmethod
+    def generate(
+        cls,
+        subscriptions: int = 2,
+        servers_per_subscription: int = 2,
+        databases_per_server: int = 10,
+        elastic_pools_per_server: int = 1,
+        databases_per_elastic_pool: int = 4,
+        seed: int = 0,
+    ) -> "FakeArmInventory":
+        random_ = random.Random(seed)
+        inventory = cls()
+        for i in range(subscriptions):
+            subscription_id = str(uuid.UUID(int=random_.getrandbits(128), version=4))
+            subscription = inventory.subscriptions[subscription_id] = FakeSubscription(
+                subscription_id, f"Subscription_{i}"
+            )
+            for j in range(servers_per_subscription):
+                server = FakeServer(f"rg-{i}", f"server-{i}-{j}")
+                subscription.servers[(server.resource_group_name, server.name)] = server
+                for k in range(elastic_pools_per_server):
+                    elastic_pool = FakeElasticPool(f"pool-{k}")
+                    server.elastic_pools[elastic_pool.name] = elastic_pool
+                for k in range(databases_per_server):
+                    space_allocated = random_.randint(1, 32) * _GIGABYTE
+                    pooled = k < elastic_pools_per_server * databases_per_elastic_pool
+                    server.databases[f"db-{k}"] = FakeDatabase(
+                        f"db-{k}",
+                        space_used_bytes=float(random_.randint(0, space_allocated)),
+                        space_allocated_bytes=float(space_allocated),
+                        elastic_pool_name=f"pool-{k // databases_per_elastic_pool}" if pooled else None,
+                    )
+        return inventory
+
+
+@dataclass
+class FakeArmSettings:
+    # Seconds added to every response
+    latency: float = 0
+    # Probability of answering 429, with a Retry-After header of retry_after seconds
+    throttle_probability: float = 0
+    retry_after: float = 0.1
+    page_size: int = 100
+    seed: int = 0
+
+
+class FakeCredential:
+    # The fake server does not check tokens, it avoids DefaultAzureCredential looking for a real identity.
+    async def get_token(self, *scopes: str, **kwargs: Any) -> AccessToken:
+        return AccessToken("fake", 2**31 - 1)
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "FakeCredential":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        pass
+
+
+class FakeArmServer:
+    def __init__(
+        self, inventory: FakeArmInventory, settings: FakeArmSettings = FakeArmSettings(), port: int = 0
+    ) -> None:
+        self.inventory = inventory
+        self.settings = settings
+        self.requests = 0
+        self.throttled = 0
+        self._port = port
+        self._random = random.Random(settings.seed)
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def __aenter__(self) -> "FakeArmServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        sql = "/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}/" + _SQL + "/servers/{server_name}"
+        app.add_routes(
+            [
+                web.get("/subscriptions", self._list_subscriptions),
+                web.get("/subscriptions/{subscription_id}", self._get_subscription),
+                web.get("/subscriptions/{subscription_id}/" + _SQL + "/servers", self._list_servers),
+                web.get(sql, self._get_server),
+                web.get(sql + "/databases", self._list_databases),
+                web.get(sql + "/databases/{database_name}", self._get_database),
+                web.get(sql + "/databases/{database_name}/usages", self._list_database_usages),
+                web.get(sql + "/elasticPools", self._list_elastic_pools),
+                web.get(sql + "/elasticPools/{elastic_pool_name}", self._get_elastic_pool),
+                web.get(sql + "/elasticPools/{elastic_pool_name}/databases", self._list_elastic_pool_databases),
+            ]
+        )
+        return app
+
+    async def start(self) -> None:
+        # https://docs.aiohttp.org/en/stable/web_advanced.html#application-runners
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self._port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def manager_kwargs(self) -> dict[str, Any]:
+        # AzureSqlManager(**server.manager_kwargs()), bearer tokens cannot be sent over http.
+        return {
+            "credential": FakeCredential(),
+            "client_kwargs": {"base_url": self.url, "authentication_policy": SansIOHTTPPolicy()},
+        }
+
+    @web.middleware
+    async def _middleware(
+        self, request: web.Request, handler: Callable[[web.Request], Awaitable[web.StreamResponse]]
+    ) -> web.StreamResponse:
+        self.requests += 1
+        if self.settings.latency > 0:
+            await asyncio.sleep(self.settings.latency)
+        if self._random.random() < self.settings.throttle_probability:
+            self.throttled += 1
+            # https://learn.microsoft.com/en-us/azure/azure-resource-manager/management/request-limits-and-throttling
+            return web.json_response(
+                {"error": {"code": "TooManyRequests", "message": "Too many requests."}},
+                status=429,
+                headers={"Retry-After": str(self.settings.retry_after)},
+            )
+        return await handler(request)
+
+    def _page(self, request: web.Request, items: list[dict[str, Any]]) -> web.Response:
+        # https://github.com/microsoft/api-guidelines/blob/vNext/azure/Guidelines.md#collections
+        # Pages are linked with nextLink, an absolute url that clients request as is. It is built from the server url,
+        # request.url rebuilds it from the Host header, which newer yarl releases reject when it contains the port.
+        skip = int(request.query.get("$skiptoken", "0"))
+        body: dict[str, Any] = {"value": items[skip : skip + self.settings.page_size]}
+        if skip + self.settings.page_size < len(items):
+            next_url = request.rel_url.update_query({"$skiptoken": str(skip + self.settings.page_size)})
+            body["nextLink"] = f"{self.url}{next_url}"
+        return web.json_response(body)
+
+    @staticmethod
+    def _not_found() -> web.HTTPNotFound:
+        return web.HTTPNotFound(
+            text='{"error": {"code": "ResourceNotFound", "message": "Not found."}}', content_type="application/json"
+        )
+
+    def _find_subscription(self, request: web.Request) -> FakeSubscription:
+        subscription = self.inventory.subscriptions.get(request.match_info["subscription_id"])
+        if subscription is None:
+            raise self._not_found()
+        return subscription
+
+    def _find_server(self, request: web.Request) -> tuple[FakeSubscription, FakeServer]:
+        subscription = self._find_subscription(request)
+        key = (request.match_info["resource_group_name"], request.match_info["server_name"])
+        server = subscription.servers.get(key)
+        if server is None:
+            raise self._not_found()
+        return subscription, server
+
+    @staticmethod
+    def _subscription_json(subscription: FakeSubscription) -> dict[str, Any]:
+        return {
+            "id": f"/subscriptions/{subscription.subscription_id}",
+            "subscriptionId": subscription.subscription_id,
+            "displayName": subscription.display_name,
+            "state": "Enabled" if subscription.enabled else "Disabled",
+        }
+
+    @staticmethod
+    def _server_id(subscription: FakeSubscription, server: FakeServer) -> str:
+        return (
+            f"/subscriptions/{subscription.subscription_id}/resourceGroups/{server.resource_group_name}"
+            f"/{_SQL}/servers/{server.name}"
+        )
+
+    def _server_json(self, subscription: FakeSubscription, server: FakeServer) -> dict[str, Any]:
+        return {
+            "id": self._server_id(subscription, server),
+            "name": server.name,
+            "type": "Microsoft.Sql/servers",
+            "location": "westeurope",
+            "properties": {"fullyQualifiedDomainName": f"{server.name}.database.windows.net", "state": "Ready"},
+        }
+
+    def _database_json(self, subscription: FakeSubscription, server: FakeServer, database: FakeDatabase):
+        server_id = self._server_id(subscription, server)
+        return {
+            "id": f"{server_id}/databases/{database.name}",
+            "name": database.name,
+            "type": "Microsoft.Sql/servers/databases",
+            "location": "westeurope",
+            "properties": {
+                "status": database.status,
+                "currentServiceObjectiveName": database.current_service_objective_name,
+                "maxSizeBytes": database.max_size_bytes,
+                "elasticPoolId": f"{server_id}/elasticPools/{database.elastic_pool_name}"
+                if database.elastic_pool_name is not None
+                else None,
+            },
+        }
+
+    def _elastic_pool_json(self, subscription: FakeSubscription, server: FakeServer, elastic_pool: FakeElasticPool):
+        return {
+            "id": f"{self._server_id(subscription, server)}/elasticPools/{elastic_pool.name}",
+            "name": elastic_pool.name,
+            "type": "Microsoft.Sql/servers/elasticPools",
+            "location": "westeurope",
+            "properties": {"state": "Ready", "maxSizeBytes": elastic_pool.max_size_bytes},
+        }
+
+    async def _list_subscriptions(self, request: web.Request) -> web.Response:
+        return self._page(
+            request, [self._subscription_json(subscription) for subscription in self.inventory.subscriptions.values()]
+        )
+
+    async def _get_subscription(self, request: web.Request) -> web.Response:
+        return web.json_response(self._subscription_json(self._find_subscription(request)))
+
+    async def _list_servers(self, request: web.Request) -> web.Response:
+        subscription = self._find_subscription(request)
+        servers = subscription.servers.values()
+        return self._page(request, [self._server_json(subscription, server) for server in servers])
+
+    async def _get_server(self, request: web.Request) -> web.Response:
+        return web.json_response(self._server_json(*self._find_server(request)))
+
+    async def _list_databases(self, request: web.Request) -> web.Response:
+        subscription, server = self._find_server(request)
+        # Every server has a master database, AzureSqlManager skips it.
+        master = FakeDatabase("master", 0, 0, current_service_objective_name="System")
+        databases = [master, *server.databases.values()]
+        return self._page(request, [self._database_json(subscription, server, database) for database in databases])
+
+    async def _get_database(self, request: web.Request) -> web.Response:
+        subscription, server = self._find_server(request)
+        database = server.databases.get(request.match_info["database_name"])
+        if database is None:
+            raise self._not_found()
+        return web.json_response(self._database_json(subscription, server, database))
+
+    async def _list_database_usages(self, request: web.Request) -> web.Response:
+        subscription, server = self._find_server(request)
+        database = server.databases.get(request.match_info["database_name"])
+        if database is None:
+            raise self._not_found()
+        database_id = self._database_json(subscription, server, database)["id"]
+        usages = [
+            ("database_size", "Database Size", database.space_used_bytes),
+            ("database_allocated_size", "Database Allocated Size", database.space_allocated_bytes),
+        ]
+        return self._page(
+            request,
+            [
+                {
+                    "id": f"{database_id}/usages/{name}",
+                    "name": name,
+                    "type": "Microsoft.Sql/servers/databases/usages",
+                    "properties": {
+                        "displayName": display_name,
+                        "currentValue": value,
+                        "limit": database.max_size_bytes,
+                        "unit": "Bytes",
+                    },
+                }
+                for name, display_name, value in usages
+            ],
+        )
+
+    async def _list_elastic_pools(self, request: web.Request) -> web.Response:
+        subscription, server = self._find_server(request)
+        return self._page(
+            request,
+            [
+                self._elastic_pool_json(subscription, server, elastic_pool)
+                for elastic_pool in server.elastic_pools.values()
+            ],
+        )
+
+    async def _get_elastic_pool(self, request: web.Request) -> web.Response:
+        subscription, server = self._find_server(request)
+        elastic_pool = server.elastic_pools.get(request.match_info["elastic_pool_name"])
+        if elastic_pool is None:
+            raise self._not_found()
+        return web.json_response(self._elastic_pool_json(subscription, server, elastic_pool))
+
+    async def _list_elastic_pool_databases(self, request: web.Request) -> web.Response:
+        subscription, server = self._find_server(request)
+        elastic_pool_name = request.match_info["elastic_pool_name"]
+        return self._page(
+            request,
+            [
+                self._database_json(subscription, server, database)
+                for database in server.databases.values()
+                if database.elastic_pool_name == elastic_pool_name
+            ],
+        )
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    inventory = FakeArmInventory.generate(args.subscriptions, args.servers, args.databases, args.elastic_pools)
+    settings = FakeArmSettings(args.latency, args.throttle_probability, page_size=args.page_size)
+    async with FakeArmServer(inventory, settings, args.port) as server:
+        print(f"Fake ARM server listening on {server.url}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Azure Resource Manager server.")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--subscriptions", type=int, default=2)
+    parser.add_argument("--servers", type=int, default=2, help="servers per subscription")
+    parser.add_argument("--databases", type=int, default=10, help="databases per server")
+    parser.add_argument("--elastic-pools", type=int, default=1, help="elastic pools per server")
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every response")
+    parser.add_argument("--throttle-probability", type=float, default=0)
+    parser.add_argument("--page-size", type=int, default=100)
+    asyncio.run(_serve(parser.parse_args()))
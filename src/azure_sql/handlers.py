@@ -1,28 +1,472 @@
+import time
+import typing
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    ClassVar,
+    Hashable,
+    TypeVar,
+    get_args,
+    get_origin,
+)
+
 from dependency_injector.wiring import Provide, inject
-from mediatpy import Mediator, Request, RequestHandler
-from sqlalchemy import select
+from mediatpy import Mediator, PipelineBehavior, Request, RequestHandler
+from sqlalchemy import Float, cast, column, func, or_, select, table, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import CursorResult
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from azure_sql import models, schemas
+from azure_sql import metrics, models, schemas
+from azure_sql.bulk_import import SUBSCRIPTION_COLUMNS, SubscriptionRecord
+from azure_sql.cache import CachePolicy
 from azure_sql.containers import Container
+from azure_sql.database import use_read_session
+from azure_sql.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from azure_sql.query_cache import QueryCache
+
+TResponse = TypeVar("TResponse")
+
+
+class _Mediator(Mediator):
+    # mediatpy caches the pipeline behaviors of every request instance, which requires hashable requests and grows
+    # with each distinct request. They only depend on the request type.
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._request_type_pipeline_behaviors: dict[type, list] = {}
+
+    def _resolve_pipeline_behaviors(self, request: Request) -> list:  # type: ignore[override]
+        request_type = type(request)
+        pipeline_behaviors = self._request_type_pipeline_behaviors.get(request_type)
+        if pipeline_behaviors is None:
+            matching = [value for key, value in self._pipeline_behaviors.items() if issubclass(request_type, key)]
+            pipeline_behaviors = sorted(
+                [pipeline_behavior for sublist in matching for pipeline_behavior in sublist],
+                key=lambda pipeline_behavior: pipeline_behavior.position,
+            )
+            self._request_type_pipeline_behaviors[request_type] = pipeline_behaviors
+        return pipeline_behaviors
 
-mediator = Mediator()
 
+mediator = _Mediator()
 
-class GetSubscriptionsRequest(Request[list[schemas.Subscription]]):
+
+class Query(Request[TResponse]):
+    # Read only requests, handled with sessions from the read replica
     pass
 
 
+class CachedQuery(Query[TResponse]):
+    # Results are cached under the namespace (the table they are read from), the request type and its fields
+    cache_namespace: ClassVar[str]
+    cache_policy: ClassVar[CachePolicy] = CachePolicy(ttl=30, stale_while_revalidate=30)
+
+    def cache_key(self) -> tuple[Hashable, ...]:
+        # The namespace comes first, QueryCache.invalidate matches it
+        return (self.cache_namespace, type(self).__qualname__, *vars(self).values())
+
+
+class Command(Request[TResponse]):
+    # Requests that write, handled with sessions from the primary database
+    # Cached queries of these namespaces are invalidated once the command has been handled
+    invalidates: ClassVar[tuple[str, ...]] = ()
+
+
+class MetricsPipelineBehavior(PipelineBehavior[Request, Any]):
+    async def handle(self, request: Request, next_behavior: Callable[..., Awaitable[Any]]) -> Any:
+        started_at = time.perf_counter()
+        try:
+            return await next_behavior()
+        finally:
+            metrics.mediator_request_duration.observe(time.perf_counter() - started_at, type(request).__name__)
+
+
+class QueryPipelineBehavior(PipelineBehavior[Query, Any]):
+    async def handle(self, request: Query, next_behavior: Callable[..., Awaitable[Any]]) -> Any:
+        with use_read_session():
+            return await next_behavior()
+
+
+_response_types: dict[type, Any] = {}
+
+
+def _get_response_type(request_type: type) -> Any:
+    if request_type not in _response_types:
+        _response_types[request_type] = Any
+        for base in getattr(request_type, "__orig_bases__", ()):
+            origin = get_origin(base)
+            if isinstance(origin, type) and issubclass(origin, Request):
+                _response_types[request_type] = get_args(base)[0]
+                break
+    return _response_types[request_type]
+
+
+@inject
+class CachedQueryPipelineBehavior(PipelineBehavior[CachedQuery, Any]):
+    def __init__(self, query_cache: QueryCache = Provide[Container.query_cache]) -> None:
+        self._query_cache = query_cache
+
+    async def handle(self, request: CachedQuery, next_behavior: Callable[..., Awaitable[Any]]) -> Any:
+        return await self._query_cache.get_or_load(
+            request.cache_key(), next_behavior, request.cache_policy, _get_response_type(type(request))
+        )
+
+
+@inject
+class CommandPipelineBehavior(PipelineBehavior[Command, Any]):
+    def __init__(self, query_cache: QueryCache = Provide[Container.query_cache]) -> None:
+        self._query_cache = query_cache
+
+    async def handle(self, request: Command, next_behavior: Callable[..., Awaitable[Any]]) -> Any:
+        try:
+            return await next_behavior()
+        finally:
+            # Also on failure, the command may have written part of its changes
+            for namespace in request.invalidates:
+                await self._query_cache.invalidate(namespace)
+
+
+# Registered without the decorator, it returns None and the classes would not be importable
+# The metrics behavior goes first, so cache hits are measured too.
+mediator.register_pipeline_behavior(MetricsPipelineBehavior)
+mediator.register_pipeline_behavior(QueryPipelineBehavior)
+mediator.register_pipeline_behavior(CachedQueryPipelineBehavior)
+mediator.register_pipeline_behavior(CommandPipelineBehavior)
+
+
+@dataclass
+class GetTableVersionRequest(Query[int]):
+    table_name: str
+
+
 @mediator.request_handler
 @inject
-class GetSubscriptionsRequestHandler(RequestHandler[GetSubscriptionsRequest, list[schemas.Subscription]]):
+class GetTableVersionRequestHandler(RequestHandler[GetTableVersionRequest, int]):
     def __init__(self, session_provider=Provide[Container.session_provider]) -> None:
         self._session_provider = session_provider
 
-    async def handle(self, request: GetSubscriptionsRequest) -> list[schemas.Subscription]:
+    async def handle(self, request: GetTableVersionRequest) -> int:
         session: AsyncSession
         async with self._session_provider() as session:
-            subscriptions: list[models.Subscription] = (
-                (await session.execute(select(models.Subscription))).scalars().all()
+            version = (
+                await session.execute(
+                    select(models.TableVersion.version).where(models.TableVersion.table_name == request.table_name)
+                )
+            ).scalar()
+            return version or 0
+
+
+def _get_subscription_sort_keys(sort: schemas.SubscriptionSort) -> list:
+    # subscription_id is always the last key, so the order is total and the cursor unambiguous.
+    # Keys match the indexes created by the subscriptions_keyset_indexes migration.
+    if sort == schemas.SubscriptionSort.DISPLAY_NAME:
+        return [func.coalesce(models.Subscription.display_name, ""), models.Subscription.subscription_id]
+    return [models.Subscription.subscription_id]
+
+
+@dataclass
+class GetSubscriptionsRequest(CachedQuery[schemas.SubscriptionPage]):
+    cache_namespace = models.Subscription.__tablename__
+
+    enabled: bool | None = None
+    sort: schemas.SubscriptionSort = schemas.SubscriptionSort.SUBSCRIPTION_ID
+    order: schemas.SortOrder = schemas.SortOrder.ASC
+    limit: int | None = None
+    cursor: str | None = None
+    # Part of the cache key, so a cached page is never older than the ETag it is sent with
+    table_version: int | None = None
+
+
+@mediator.request_handler
+@inject
+class GetSubscriptionsRequestHandler(RequestHandler[GetSubscriptionsRequest, schemas.SubscriptionPage]):
+    def __init__(self, session_provider=Provide[Container.session_provider]) -> None:
+        self._session_provider = session_provider
+
+    @staticmethod
+    def _get_cursor_values(subscription: schemas.Subscription, sort: schemas.SubscriptionSort) -> list:
+        if sort == schemas.SubscriptionSort.DISPLAY_NAME:
+            return [subscription.display_name or "", subscription.subscription_id]
+        return [subscription.subscription_id]
+
+    async def handle(self, request: GetSubscriptionsRequest) -> schemas.SubscriptionPage:
+        sort_keys = _get_subscription_sort_keys(request.sort)
+        descending = request.order == schemas.SortOrder.DESC
+        statement = select(models.Subscription)
+        if request.enabled is not None:
+            statement = statement.where(models.Subscription.enabled == request.enabled)
+        if request.cursor is not None:
+            values = decode_cursor(request.cursor, len(sort_keys))
+            try:
+                values[-1] = uuid.UUID(values[-1])
+            except (TypeError, ValueError):
+                raise InvalidCursorError()
+            keys = sort_keys[0] if len(sort_keys) == 1 else tuple_(*sort_keys)
+            cursor = values[0] if len(values) == 1 else tuple_(*values)
+            statement = statement.where(keys < cursor if descending else keys > cursor)
+        statement = statement.order_by(*[key.desc() if descending else key for key in sort_keys])
+        if request.limit is not None:
+            statement = statement.limit(request.limit)
+        session: AsyncSession
+        async with self._session_provider() as session:
+            subscriptions: list[models.Subscription] = (await session.execute(statement)).scalars().all()
+            items = [schemas.Subscription.from_row(subscription) for subscription in subscriptions]
+        return schemas.SubscriptionPage.construct(
+            items=items,
+            next_cursor=encode_cursor(self._get_cursor_values(items[-1], request.sort))
+            if request.limit is not None and len(items) == request.limit
+            else None,
+        )
+
+
+@dataclass
+class StreamSubscriptionsRequest(Query[AsyncIterator[schemas.Subscription]]):
+    # The filter and order of GetSubscriptionsRequest, every matching row is streamed so there is no page.
+    enabled: bool | None = None
+    sort: schemas.SubscriptionSort = schemas.SubscriptionSort.SUBSCRIPTION_ID
+    order: schemas.SortOrder = schemas.SortOrder.ASC
+    yield_per: int = 1000
+
+
+@mediator.request_handler
+@inject
+class StreamSubscriptionsRequestHandler(
+    RequestHandler[StreamSubscriptionsRequest, AsyncIterator[schemas.Subscription]]
+):
+    def __init__(self, session_provider=Provide[Container.session_provider]) -> None:
+        self._session_provider = session_provider
+
+    async def handle(self, request: StreamSubscriptionsRequest) -> AsyncIterator[schemas.Subscription]:
+        # The session is opened when the caller starts iterating and closed when it finishes,
+        # so the iterator must be fully consumed (or closed).
+        # The provider is called here, inside the pipeline, so the session comes from the read replica.
+        return self._stream(request, self._session_provider())
+
+    @staticmethod
+    async def _stream(
+        request: StreamSubscriptionsRequest, session_context: AsyncContextManager[AsyncSession]
+    ) -> AsyncIterator[schemas.Subscription]:
+        # https://docs.sqlalchemy.org/en/14/orm/extensions/asyncio.html#using-streaming-results
+        session: AsyncSession
+        async with session_context as session:
+            # Server side cursors need a transaction, read sessions are in autocommit otherwise.
+            # https://docs.sqlalchemy.org/en/14/orm/session_transaction.html#setting-isolation-for-individual-transactions
+            await session.connection(
+                execution_options={"isolation_level": "READ COMMITTED", "postgresql_readonly": True}
+            )
+            statement = select(models.Subscription)
+            if request.enabled is not None:
+                statement = statement.where(models.Subscription.enabled == request.enabled)
+            descending = request.order == schemas.SortOrder.DESC
+            statement = statement.order_by(
+                *[key.desc() if descending else key for key in _get_subscription_sort_keys(request.sort)]
             )
-            return [schemas.Subscription.from_orm(subscription) for subscription in subscriptions]
+            result = await session.stream(statement.execution_options(yield_per=request.yield_per))
+            subscription: models.Subscription
+            async for subscription in result.scalars():
+                yield schemas.Subscription.from_row(subscription)
+
+
+@dataclass
+class ImportSubscriptionsRequest(Command[schemas.SubscriptionImportResult]):
+    invalidates = (models.Subscription.__tablename__,)
+
+    subscriptions: AsyncIterable[SubscriptionRecord]
+
+
+@mediator.request_handler
+@inject
+class ImportSubscriptionsRequestHandler(RequestHandler[ImportSubscriptionsRequest, schemas.SubscriptionImportResult]):
+    # Rows are copied into a temporary table and merged into Subscriptions with a single upsert.
+    # When a subscription is repeated, its last row wins.
+    _staging_table_name = "SubscriptionsImport"
+
+    def __init__(self, session_provider=Provide[Container.session_provider]) -> None:
+        self._session_provider = session_provider
+
+    async def handle(self, request: ImportSubscriptionsRequest) -> schemas.SubscriptionImportResult:
+        received = 0
+
+        async def count(subscriptions: AsyncIterable[SubscriptionRecord]) -> AsyncIterator[SubscriptionRecord]:
+            nonlocal received
+            async for subscription in subscriptions:
+                received += 1
+                yield subscription
+
+        staging = table(self._staging_table_name, column("ordinal"), *[column(name) for name in SUBSCRIPTION_COLUMNS])
+        latest = (
+            select(*[staging.c[name] for name in SUBSCRIPTION_COLUMNS])
+            .distinct(staging.c.subscription_id)
+            .order_by(staging.c.subscription_id, staging.c.ordinal.desc())
+        )
+        # https://docs.sqlalchemy.org/en/14/dialects/postgresql.html#insert-on-conflict-upsert
+        statement = insert(models.Subscription).from_select(list(SUBSCRIPTION_COLUMNS), latest)
+        statement = statement.on_conflict_do_update(
+            index_elements=[models.Subscription.subscription_id],
+            set_={"display_name": statement.excluded.display_name, "enabled": statement.excluded.enabled},
+            where=or_(
+                models.Subscription.display_name.is_distinct_from(statement.excluded.display_name),
+                models.Subscription.enabled.is_distinct_from(statement.excluded.enabled),
+            ),
+        )
+        session: AsyncSession
+        async with self._session_provider() as session:
+            # Only visible to this connection and dropped with the transaction. The ordinal keeps the order of the rows.
+            await session.execute(
+                text(
+                    f'CREATE TEMPORARY TABLE "{self._staging_table_name}" '
+                    f'(ordinal bigserial, LIKE "{models.Subscription.__tablename__}") ON COMMIT DROP'
+                )
+            )
+            # https://magicstack.github.io/asyncpg/current/api/index.html#asyncpg.connection.Connection.copy_records_to_table
+            # https://docs.sqlalchemy.org/en/14/orm/extensions/asyncio.html#using-awaitable-only-driver-methods-in-connection-pool-and-other-events
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                self._staging_table_name, records=count(request.subscriptions), columns=SUBSCRIPTION_COLUMNS
+            )
+            # typing.cast, the cast imported from sqlalchemy builds SQL CAST expressions
+            written = typing.cast(CursorResult, await session.execute(statement)).rowcount
+        return schemas.SubscriptionImportResult(received=received, written=written)
+
+
+@dataclass
+class GetServersRequest(CachedQuery[list[schemas.Server]]):
+    cache_namespace = models.Server.__tablename__
+
+    subscription_id: uuid.UUID | None = None
+
+
+@mediator.request_handler
+@inject
+class GetServersRequestHandler(RequestHandler[GetServersRequest, list[schemas.Server]]):
+    def __init__(self, session_provider=Provide[Container.session_provider]) -> None:
+        self._session_provider = session_provider
+
+    async def handle(self, request: GetServersRequest) -> list[schemas.Server]:
+        statement = select(models.Server)
+        if request.subscription_id is not None:
+            statement = statement.where(models.Server.subscription_id == request.subscription_id)
+        session: AsyncSession
+        async with self._session_provider() as session:
+            servers: list[models.Server] = (await session.execute(statement)).scalars().all()
+            return [schemas.Server.from_row(server) for server in servers]
+
+
+@dataclass
+class GetDatabasesRequest(CachedQuery[list[schemas.Database]]):
+    cache_namespace = models.Database.__tablename__
+
+    subscription_id: uuid.UUID | None = None
+    resource_group_name: str | None = None
+    server_name: str | None = None
+
+
+@mediator.request_handler
+@inject
+class GetDatabasesRequestHandler(RequestHandler[GetDatabasesRequest, list[schemas.Database]]):
+    def __init__(self, session_provider=Provide[Container.session_provider]) -> None:
+        self._session_provider = session_provider
+
+    async def handle(self, request: GetDatabasesRequest) -> list[schemas.Database]:
+        statement = select(models.Database)
+        if request.subscription_id is not None:
+            statement = statement.where(models.Database.subscription_id == request.subscription_id)
+        if request.resource_group_name is not None:
+            statement = statement.where(models.Database.resource_group_name == request.resource_group_name)
+        if request.server_name is not None:
+            statement = statement.where(models.Database.server_name == request.server_name)
+        session: AsyncSession
+        async with self._session_provider() as session:
+            databases: list[models.Database] = (await session.execute(statement)).scalars().all()
+            return [schemas.Database.from_row(database) for database in databases]
+
+
+@dataclass
+class GetDatabaseUsageHistoryRequest(Query[schemas.DatabaseUsageHistory]):
+    subscription_id: uuid.UUID
+    resource_group_name: str
+    server_name: str
+    database_name: str
+    start: datetime
+    end: datetime
+    granularity: schemas.UsageGranularity
+
+
+@mediator.request_handler
+@inject
+class GetDatabaseUsageHistoryRequestHandler(
+    RequestHandler[GetDatabaseUsageHistoryRequest, schemas.DatabaseUsageHistory]
+):
+    def __init__(self, session_provider=Provide[Container.session_provider]) -> None:
+        self._session_provider = session_provider
+
+    @staticmethod
+    def _select_samples(request: GetDatabaseUsageHistoryRequest):
+        sample = models.DatabaseUsageSample
+        return (
+            select(
+                sample.sampled_at.label("timestamp"),
+                sample.space_used_bytes.label("space_used_bytes"),
+                sample.space_used_bytes.label("space_used_bytes_max"),
+                sample.space_allocated_bytes.label("space_allocated_bytes"),
+                sample.space_allocated_bytes.label("space_allocated_bytes_max"),
+            )
+            .where(
+                sample.subscription_id == request.subscription_id,
+                sample.resource_group_name == request.resource_group_name,
+                sample.server_name == request.server_name,
+                sample.database_name == request.database_name,
+                sample.sampled_at >= request.start,
+                sample.sampled_at < request.end,
+            )
+            .order_by(sample.sampled_at)
+        )
+
+    @staticmethod
+    def _select_rollups(request: GetDatabaseUsageHistoryRequest):
+        rollup: type[models.DatabaseUsageRollupMixin] = (
+            models.DatabaseUsageHourly
+            if request.granularity == schemas.UsageGranularity.HOUR
+            else models.DatabaseUsageDaily
+        )
+        return (
+            select(
+                rollup.bucket.label("timestamp"),
+                (cast(rollup.space_used_bytes_sum, Float) / rollup.samples).label("space_used_bytes"),
+                rollup.space_used_bytes_max,
+                (cast(rollup.space_allocated_bytes_sum, Float) / rollup.samples).label("space_allocated_bytes"),
+                rollup.space_allocated_bytes_max,
+            )
+            .where(
+                rollup.subscription_id == request.subscription_id,
+                rollup.resource_group_name == request.resource_group_name,
+                rollup.server_name == request.server_name,
+                rollup.database_name == request.database_name,
+                rollup.bucket >= request.start,
+                rollup.bucket < request.end,
+            )
+            .order_by(rollup.bucket)
+        )
+
+    async def handle(self, request: GetDatabaseUsageHistoryRequest) -> schemas.DatabaseUsageHistory:
+        statement = (
+            self._select_samples(request)
+            if request.granularity == schemas.UsageGranularity.RAW
+            else self._select_rollups(request)
+        )
+        session: AsyncSession
+        async with self._session_provider() as session:
+            points = [schemas.DatabaseUsagePoint.from_orm(row) for row in (await session.execute(statement)).all()]
+        return schemas.DatabaseUsageHistory(
+            granularity=request.granularity,
+            points=points,
+            space_used_growth_bytes=points[-1].space_used_bytes - points[0].space_used_bytes if points else None,
+        )
@@ -0,0 +1,275 @@
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, cast
+
+from dependency_injector.wiring import Provide, inject
+from sqlalchemy import Table, delete, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from azure_sql import models
+from azure_sql.azure_sql_manager import (
+    AzureSqlDatabase,
+    AzureSqlDatabaseUsage,
+    AzureSqlElasticPool,
+    AzureSqlInventoryRecord,
+    AzureSqlServer,
+    AzureSubscription,
+)
+from azure_sql.containers import Container
+from azure_sql.query_cache import QueryCache
+
+
+@dataclass
+class IngestResult:
+    started_at: datetime
+    subscriptions: int = 0
+    servers: int = 0
+    elastic_pools: int = 0
+    databases: int = 0
+    usage_samples: int = 0
+    pruned: int = 0
+    # Records of a SweepState that did not change since the previous sweep, not written
+    unchanged: int = 0
+
+
+def _usage_columns(usage: AzureSqlDatabaseUsage | None) -> dict[str, int | None]:
+    return {
+        "space_used_bytes": int(usage.space_used_bytes) if usage is not None else None,
+        "space_allocated_bytes": int(usage.space_allocated_bytes) if usage is not None else None,
+        "space_allocated_unused_bytes": int(usage.space_allocated_unused_bytes) if usage is not None else None,
+    }
+
+
+def _record_key(record: AzureSqlInventoryRecord) -> tuple[type, tuple]:
+    # Model and primary key of the row of the record
+    subscription_id = uuid.UUID(record.subscription_id)
+    resource = record.resource
+    if isinstance(resource, AzureSubscription):
+        return models.Subscription, (subscription_id,)
+    if isinstance(resource, AzureSqlServer):
+        return models.Server, (subscription_id, resource.resource_group_name, resource.name)
+    key = (subscription_id, resource.resource_group_name, resource.server_name, resource.name)
+    if isinstance(resource, AzureSqlElasticPool):
+        return models.ElasticPool, key
+    if isinstance(resource, AzureSqlDatabase):
+        return models.Database, key
+    raise ValueError(f"unexpected resource {resource!r}.")
+
+
+class InventoryBatch:
+    # Rows are keyed by primary key, a single INSERT ... ON CONFLICT statement cannot affect the same row twice.
+    def __init__(self) -> None:
+        self.subscriptions: dict[tuple, dict[str, Any]] = {}
+        self.servers: dict[tuple, dict[str, Any]] = {}
+        self.elastic_pools: dict[tuple, dict[str, Any]] = {}
+        self.databases: dict[tuple, dict[str, Any]] = {}
+        self.usage_samples: dict[tuple, dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return (
+            len(self.subscriptions)
+            + len(self.servers)
+            + len(self.elastic_pools)
+            + len(self.databases)
+            + len(self.usage_samples)
+        )
+
+    def tables(self) -> list[tuple[Table, dict[tuple, dict[str, Any]]]]:
+        # Parents first
+        return [
+            (models.Subscription.__table__, self.subscriptions),
+            (models.Server.__table__, self.servers),
+            (models.ElasticPool.__table__, self.elastic_pools),
+            (models.Database.__table__, self.databases),
+            (models.DatabaseUsageSample.__table__, self.usage_samples),
+        ]
+
+    def clear(self) -> None:
+        self.subscriptions.clear()
+        self.servers.clear()
+        self.elastic_pools.clear()
+        self.databases.clear()
+        self.usage_samples.clear()
+
+    def add(self, record: AzureSqlInventoryRecord, sampled_at: datetime) -> None:
+        subscription_id = uuid.UUID(record.subscription_id)
+        resource = record.resource
+        if isinstance(resource, AzureSubscription):
+            self.subscriptions[(subscription_id,)] = {
+                "subscription_id": subscription_id,
+                "display_name": resource.display_name,
+                "enabled": resource.enabled,
+            }
+        elif isinstance(resource, AzureSqlServer):
+            self.servers[(subscription_id, resource.resource_group_name, resource.name)] = {
+                "subscription_id": subscription_id,
+                "resource_group_name": resource.resource_group_name,
+                "name": resource.name,
+                "fully_qualified_domain_name": resource.fully_qualified_domain_name,
+                "state": resource.state,
+                "updated_at": sampled_at,
+            }
+        elif isinstance(resource, AzureSqlElasticPool):
+            key = (subscription_id, resource.resource_group_name, resource.server_name, resource.name)
+            self.elastic_pools[key] = {
+                "subscription_id": subscription_id,
+                "resource_group_name": resource.resource_group_name,
+                "server_name": resource.server_name,
+                "name": resource.name,
+                "max_size_bytes": int(resource.max_size_bytes),
+                **_usage_columns(resource.usage),
+                "updated_at": sampled_at,
+            }
+        elif isinstance(resource, AzureSqlDatabase):
+            key = (subscription_id, resource.resource_group_name, resource.server_name, resource.name)
+            self.databases[key] = {
+                "subscription_id": subscription_id,
+                "resource_group_name": resource.resource_group_name,
+                "server_name": resource.server_name,
+                "name": resource.name,
+                "status": resource.status,
+                "current_service_objective_name": resource.current_service_objective_name,
+                "max_size_bytes": int(resource.max_size_bytes),
+                "elastic_pool_name": resource.elastic_pool_name,
+                **_usage_columns(resource.usage),
+                "updated_at": sampled_at,
+            }
+            self.usage_samples[key] = {
+                "subscription_id": subscription_id,
+                "resource_group_name": resource.resource_group_name,
+                "server_name": resource.server_name,
+                "database_name": resource.name,
+                "sampled_at": sampled_at,
+                "space_used_bytes": int(resource.usage.space_used_bytes),
+                "space_allocated_bytes": int(resource.usage.space_allocated_bytes),
+            }
+        else:
+            raise ValueError(f"unexpected resource {resource!r}.")
+
+
+def _upsert(model, rows: list[dict[str, Any]]):
+    # https://docs.sqlalchemy.org/en/14/dialects/postgresql.html#insert-on-conflict-upsert
+    # Rows whose values did not change are left untouched, so updated_at is the last time the resource changed.
+    index_elements = [column.name for column in model.__table__.primary_key]
+    statement = insert(model).values(rows)
+    updated_columns = [name for name in rows[0] if name not in index_elements]
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={name: statement.excluded[name] for name in updated_columns},
+        where=or_(
+            *[
+                model.__table__.c[name].is_distinct_from(statement.excluded[name])
+                for name in updated_columns
+                if name != "updated_at"
+            ]
+        ),
+    )
+
+
+async def _execute(session: AsyncSession, statement) -> int:
+    # Rows affected by an INSERT or DELETE, AsyncSession.execute is only typed to return a Result.
+    return cast(CursorResult, await session.execute(statement)).rowcount
+
+
+class InventoryIngestor:
+    # Writes sweep records into the inventory tables with one multi-row upsert per table and batch.
+    @inject
+    def __init__(
+        self,
+        batch_size: int = 1000,
+        prune_batch_size: int = 1000,
+        session_provider=Provide[Container.session_provider],
+        query_cache: QueryCache = Provide[Container.query_cache],
+    ) -> None:
+        self._batch_size = batch_size
+        self._prune_batch_size = prune_batch_size
+        self._session_provider = session_provider
+        self._query_cache = query_cache
+
+    async def ingest(self, records: AsyncIterable[AzureSqlInventoryRecord], prune: bool = False) -> IngestResult:
+        # prune removes the resources of the ingested subscriptions that were not seen by this ingest,
+        # so it must only be used with a complete sweep of those subscriptions.
+        result = IngestResult(datetime.now(timezone.utc))
+        batch = InventoryBatch()
+        seen_keys: defaultdict[type, set[tuple]] = defaultdict(set)
+        session: AsyncSession
+        async with self._session_provider() as session:
+            async for record in records:
+                if not record.changed:
+                    # Still seen, so it is not pruned
+                    model, key = _record_key(record)
+                    seen_keys[model].add(key)
+                    result.unchanged += 1
+                    continue
+                batch.add(record, result.started_at)
+                if len(batch) >= self._batch_size:
+                    await self._flush(session, batch, result, seen_keys)
+            await self._flush(session, batch, result, seen_keys)
+            if prune:
+                await self._prune(session, seen_keys, result)
+        for table_name, written in (
+            (models.Subscription.__tablename__, result.subscriptions),
+            (models.Server.__tablename__, result.servers),
+            (models.ElasticPool.__tablename__, result.elastic_pools),
+            (models.Database.__tablename__, result.databases),
+        ):
+            if written or result.pruned:
+                await self._query_cache.invalidate(table_name)
+        return result
+
+    @staticmethod
+    async def _flush(
+        session: AsyncSession, batch: InventoryBatch, result: IngestResult, seen_keys: defaultdict[type, set[tuple]]
+    ) -> None:
+        # Parents first, so readers never see a database whose server is not there yet.
+        if batch.subscriptions:
+            result.subscriptions += await _execute(
+                session, _upsert(models.Subscription, list(batch.subscriptions.values()))
+            )
+            seen_keys[models.Subscription].update(batch.subscriptions)
+        if batch.servers:
+            result.servers += await _execute(session, _upsert(models.Server, list(batch.servers.values())))
+            seen_keys[models.Server].update(batch.servers)
+        if batch.elastic_pools:
+            result.elastic_pools += await _execute(
+                session, _upsert(models.ElasticPool, list(batch.elastic_pools.values()))
+            )
+            seen_keys[models.ElasticPool].update(batch.elastic_pools)
+        if batch.databases:
+            result.databases += await _execute(session, _upsert(models.Database, list(batch.databases.values())))
+            seen_keys[models.Database].update(batch.databases)
+        if batch.usage_samples:
+            result.usage_samples += await _execute(
+                session,
+                insert(models.DatabaseUsageSample).values(list(batch.usage_samples.values())).on_conflict_do_nothing(),
+            )
+        await session.commit()
+        batch.clear()
+
+    async def _prune(
+        self, session: AsyncSession, seen_keys: defaultdict[type, set[tuple]], result: IngestResult
+    ) -> None:
+        subscription_ids = [subscription_id for subscription_id, in seen_keys[models.Subscription]]
+        for model in (models.Database, models.ElasticPool, models.Server):
+            result.pruned += await self._prune_model(session, model, seen_keys[model], subscription_ids)
+        await session.commit()
+
+    async def _prune_model(
+        self, session: AsyncSession, model, seen_keys: set[tuple], subscription_ids: list[uuid.UUID]
+    ) -> int:
+        primary_key = list(model.__table__.primary_key)
+        existing_keys = {
+            tuple(row)
+            for row in (
+                await session.execute(select(*primary_key).where(model.subscription_id.in_(subscription_ids)))
+            ).all()
+        }
+        missing_keys = list(existing_keys - seen_keys)
+        for start in range(0, len(missing_keys), self._prune_batch_size):
+            end = start + self._prune_batch_size
+            await session.execute(delete(model.__table__).where(tuple_(*primary_key).in_(missing_keys[start:end])))
+        return len(missing_keys)
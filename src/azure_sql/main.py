@@ -1,7 +1,11 @@
 import uvicorn
 
 from azure_sql.application import create_app
-from azure_sql.database import engine
+from azure_sql.azure_sql_manager import AzureSqlManager
+from azure_sql.credentials import ARM_SCOPE, create_credential
+from azure_sql.database import engine, read_engine
+from azure_sql.refresh import InventoryRefreshSettings, InventoryRefreshWorker
+from azure_sql.throttling import ThrottlingPolicy
 
 app = create_app()
 
@@ -11,9 +15,31 @@ async def root():
     return "Hello World!"
 
 
+@app.on_event("startup")
+async def startup_event():
+    settings = InventoryRefreshSettings.from_environ()
+    if settings.enabled:
+        # Shared by the managers of the worker, the ARM token is requested now and renewed before it expires.
+        app.state.credential = create_credential()
+        app.state.credential.warm(ARM_SCOPE)
+        app.state.inventory_refresh_worker = InventoryRefreshWorker(
+            settings, lambda: AzureSqlManager(throttling=ThrottlingPolicy(), credential=app.state.credential)
+        )
+        app.state.inventory_refresh_worker.start()
+
+
 @app.on_event("shutdown")
 async def shutdown_event():
+    worker = getattr(app.state, "inventory_refresh_worker", None)
+    if worker is not None:
+        await worker.stop()
+    credential = getattr(app.state, "credential", None)
+    if credential is not None:
+        await credential.close()
+    await app.container.query_cache().close()  # type: ignore[attr-defined]
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,266 @@
+import bisect
+import math
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+from azure.core.pipeline import PipelineRequest, PipelineResponse
+from azure.core.pipeline.policies import AsyncHTTPPolicy
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# https://prometheus.io/docs/instrumenting/exposition_formats/#text-based-format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LabelValues = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+
+
+@dataclass
+class _HistogramValue:
+    bucket_counts: list[int]
+    count: int = 0
+    sum: float = 0
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: dict[LabelValues, _HistogramValue] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        histogram_value = self._values.get(label_values)
+        if histogram_value is None:
+            histogram_value = self._values[label_values] = _HistogramValue([0] * len(self.buckets))
+        # Counts are stored per bucket and accumulated when collected, an observation only increments one.
+        histogram_value.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        histogram_value.count += 1
+        histogram_value.sum += value
+
+    def get_count(self, *label_values: str) -> int:
+        histogram_value = self._values.get(label_values)
+        return histogram_value.count if histogram_value is not None else 0
+
+    def get_sum(self, *label_values: str) -> float:
+        histogram_value = self._values.get(label_values)
+        return histogram_value.sum if histogram_value is not None else 0
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        label_names = self.label_names + ("le",)
+        for label_values, histogram_value in self._values.items():
+            cumulative = 0
+            for bucket, bucket_count in zip(self.buckets, histogram_value.bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(label_names, label_values + (_format_value(bucket),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(histogram_value.sum)}"
+            yield f"{self.name}_count{labels} {histogram_value.count}"
+
+
+class MetricsRegistry:
+    # In process, every worker process exposes its own metrics.
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Histogram] = []
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Counter:
+        counter = Counter(name, documentation, label_names)
+        self._metrics.append(counter)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(histogram)
+        return histogram
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.collect()) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests.", ("method", "route", "status")
+)
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries",
+    "Database queries executed per HTTP request.",
+    ("route",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds", "Time spent in database queries per HTTP request.", ("route",)
+)
+mediator_request_duration = registry.histogram(
+    "mediator_request_duration_seconds", "Duration of mediator requests, pipeline behaviors included.", ("request",)
+)
+db_query_duration = registry.histogram("db_query_duration_seconds", "Duration of database queries.", ("engine",))
+db_pool_checkout_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time waiting for a connection from the pool, connecting included when the pool grows.",
+    ("engine",),
+)
+arm_request_duration = registry.histogram(
+    "arm_request_duration_seconds", "Duration of Azure Resource Manager requests, per attempt.", ("status",)
+)
+arm_throttled = registry.counter("arm_throttled_total", "Azure Resource Manager requests throttled (429).")
+arm_retries = registry.counter("arm_retries_total", "Azure Resource Manager requests retried.")
+
+
+@dataclass
+class RequestStats:
+    db_queries: int = 0
+    db_duration: float = 0
+
+
+# Set by the middleware and updated by the engine events, which run in the context of the request task.
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    # https://docs.sqlalchemy.org/en/14/core/pooling.html#switching-pool-implementations
+    # There is no event before a checkout, the wait is measured around getting the connection from the queue.
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            # _do_get is the hook every pool implementation overrides, the sqlalchemy stubs only declare public methods.
+            return super()._do_get()  # type: ignore[misc]
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started_at, self.logging_name or "default")
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    # https://docs.sqlalchemy.org/en/14/core/events.html#sqlalchemy.events.ConnectionEvents.before_cursor_execute
+    # https://docs.sqlalchemy.org/en/14/faq/performance.html#query-profiling
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+        db_query_duration.observe(elapsed, name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_duration += elapsed
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        # after_cursor_execute is not called when the statement fails
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started_at"):
+            conn.info["query_started_at"].pop()
+
+
+def _get_route(scope: Scope) -> str:
+    # The path template, not the path, so the number of series is bounded. Few routes, matching them again is cheap.
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            _request_stats.reset(token)
+            route = _get_route(scope)
+            http_request_duration.observe(elapsed, scope["method"], route, status)
+            http_request_db_queries.observe(stats.db_queries, route)
+            http_request_db_duration.observe(stats.db_duration, route)
+
+
+class AsyncArmMetricsPolicy(AsyncHTTPPolicy):
+    # https://learn.microsoft.com/en-us/azure/developer/python/sdk/azure-sdk-library-usage-patterns#pipeline-policies
+    # A per retry policy, so every attempt is measured.
+    async def send(self, request: PipelineRequest) -> PipelineResponse:
+        started_at = time.perf_counter()
+        status = "error"
+        try:
+            response = await self.next.send(request)
+            status = str(response.http_response.status_code)
+            return response
+        finally:
+            arm_request_duration.observe(time.perf_counter() - started_at, status)
+            if status == "429":
+                arm_throttled.inc()
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, String
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Index, Integer, String, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base
 
@@ -10,3 +10,93 @@ class Subscription(Base):
     subscription_id = Column(UUID(as_uuid=True), primary_key=True)
     display_name = Column(String)
     enabled = Column(Boolean)
+    __table_args__ = (
+        Index("ix_Subscriptions_display_name_subscription_id", func.coalesce(display_name, ""), subscription_id),
+        Index("ix_Subscriptions_enabled_subscription_id", enabled, subscription_id),
+        Index(
+            "ix_Subscriptions_enabled_display_name_subscription_id",
+            enabled,
+            func.coalesce(display_name, ""),
+            subscription_id,
+        ),
+    )
+
+
+class Server(Base):
+    __tablename__ = "Servers"
+    subscription_id = Column(UUID(as_uuid=True), primary_key=True)
+    resource_group_name = Column(String, primary_key=True)
+    name = Column(String, primary_key=True)
+    fully_qualified_domain_name = Column(String)
+    state = Column(String)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class ElasticPool(Base):
+    __tablename__ = "ElasticPools"
+    subscription_id = Column(UUID(as_uuid=True), primary_key=True)
+    resource_group_name = Column(String, primary_key=True)
+    server_name = Column(String, primary_key=True)
+    name = Column(String, primary_key=True)
+    max_size_bytes = Column(BigInteger)
+    space_used_bytes = Column(BigInteger)
+    space_allocated_bytes = Column(BigInteger)
+    space_allocated_unused_bytes = Column(BigInteger)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class Database(Base):
+    __tablename__ = "Databases"
+    subscription_id = Column(UUID(as_uuid=True), primary_key=True)
+    resource_group_name = Column(String, primary_key=True)
+    server_name = Column(String, primary_key=True)
+    name = Column(String, primary_key=True)
+    status = Column(String)
+    current_service_objective_name = Column(String)
+    max_size_bytes = Column(BigInteger)
+    elastic_pool_name = Column(String)
+    space_used_bytes = Column(BigInteger)
+    space_allocated_bytes = Column(BigInteger)
+    space_allocated_unused_bytes = Column(BigInteger)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class DatabaseUsageSample(Base):
+    __tablename__ = "DatabaseUsageSamples"
+    # Monthly partitions are created and dropped by azure_sql.usage_history
+    __table_args__ = {"postgresql_partition_by": "RANGE (sampled_at)"}
+    subscription_id = Column(UUID(as_uuid=True), primary_key=True)
+    resource_group_name = Column(String, primary_key=True)
+    server_name = Column(String, primary_key=True)
+    database_name = Column(String, primary_key=True)
+    sampled_at = Column(DateTime(timezone=True), primary_key=True)
+    space_used_bytes = Column(BigInteger, nullable=False)
+    space_allocated_bytes = Column(BigInteger, nullable=False)
+
+
+class DatabaseUsageRollupMixin:
+    subscription_id = Column(UUID(as_uuid=True), primary_key=True)
+    resource_group_name = Column(String, primary_key=True)
+    server_name = Column(String, primary_key=True)
+    database_name = Column(String, primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    space_used_bytes_max = Column(BigInteger, nullable=False)
+    space_used_bytes_sum = Column(BigInteger, nullable=False)
+    space_allocated_bytes_max = Column(BigInteger, nullable=False)
+    space_allocated_bytes_sum = Column(BigInteger, nullable=False)
+    samples = Column(Integer, nullable=False)
+
+
+class DatabaseUsageHourly(DatabaseUsageRollupMixin, Base):
+    __tablename__ = "DatabaseUsageHourly"
+
+
+class DatabaseUsageDaily(DatabaseUsageRollupMixin, Base):
+    __tablename__ = "DatabaseUsageDaily"
+
+
+class TableVersion(Base):
+    # Incremented by a statement level trigger on every write to the table, see the table_versions migration
+    __tablename__ = "TableVersions"
+    table_name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False)
@@ -0,0 +1,25 @@
+import base64
+import json
+from typing import Any, Sequence
+
+# Keyset pagination: the cursor holds the sort key values of the last row of the previous page.
+# https://use-the-index-luke.com/no-offset
+
+
+class InvalidCursorError(ValueError):
+    def __init__(self) -> None:
+        super().__init__("invalid cursor.")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values), default=str).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise InvalidCursorError()
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursorError()
+    return values
@@ -0,0 +1,91 @@
+import json
+import time
+from typing import Any, Awaitable, Callable, Hashable, Protocol, TypeVar
+
+from pydantic import parse_raw_as
+from pydantic.json import pydantic_encoder
+
+from azure_sql.cache import AsyncTTLCache, CachePolicy
+
+T = TypeVar("T")
+
+
+class CacheBackend(Protocol):
+    # Cache shared by every process (e.g. Redis), values are JSON documents.
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    async def delete_prefix(self, prefix: str) -> None:
+        ...
+
+
+class InMemoryCacheBackend:
+    # Local stand-in for a shared backend, for development and tests.
+    def __init__(self) -> None:
+        self._values: dict[str, tuple[bytes, float]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if time.monotonic() >= expires_at:
+            del self._values[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._values[key] = (value, time.monotonic() + ttl)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._values if key.startswith(prefix)]:
+            del self._values[key]
+
+
+def _to_backend_key(key: tuple[Hashable, ...]) -> str:
+    return ":".join(str(part) for part in key)
+
+
+class QueryCache:
+    # Query results cached in process (LRU), backed by an optional shared backend.
+    # Keys are tuples whose first item is a namespace, the name of the table the result was read from.
+    # Cached values are shared between callers and must not be mutated.
+    def __init__(self, max_size: int = 1024, backend: CacheBackend | None = None) -> None:
+        self._cache = AsyncTTLCache(max_size)
+        self._backend = backend
+
+    async def get_or_load(
+        self,
+        key: tuple[Hashable, ...],
+        loader: Callable[[], Awaitable[T]],
+        policy: CachePolicy,
+        response_type: Any,
+    ) -> T:
+        if self._backend is None:
+            return await self._cache.get_or_load(key, loader, policy)
+        backend: CacheBackend = self._backend
+
+        async def load() -> T:
+            backend_key = _to_backend_key(key)
+            raw = await backend.get(backend_key)
+            if raw is not None:
+                return parse_raw_as(response_type, raw)
+            value = await loader()
+            await backend.set(backend_key, json.dumps(value, default=pydantic_encoder).encode(), policy.ttl)
+            return value
+
+        return await self._cache.get_or_load(key, load, policy)
+
+    async def invalidate(self, namespace: str) -> None:
+        self._cache.invalidate_where(lambda key: isinstance(key, tuple) and key[0] == namespace)
+        if self._backend is not None:
+            await self._backend.delete_prefix(f"{namespace}:")
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    async def close(self) -> None:
+        await self._cache.close()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from azure_sql import schemas
+from azure_sql.azure_sql_manager import AzureSqlManager, AzureSubscription, SweepState
+from azure_sql.concurrency import ConcurrencyBudget
+from azure_sql.ingest import InventoryIngestor
+from azure_sql.usage_history import UsageHistory
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class InventoryRefreshSettings:
+    enabled: bool = False
+    interval: float = 900
+    jitter: float = 60
+    # Delay between the start of consecutive subscriptions, so ARM does not see every subscription at once.
+    subscription_stagger: float = 5
+    max_concurrency: int = 32
+    max_concurrency_per_subscription: int = 8
+    # Usages of databases that did not change are reused for this long, 0 requests them on every cycle.
+    max_usage_age: float = 3600
+
+    @classmethod
+    def from_environ(cls) -> "InventoryRefreshSettings":
+        return cls(
+            enabled=(os.environ.get("INVENTORY_REFRESH_ENABLED") or "false").lower() == "true",
+            interval=float(os.environ.get("INVENTORY_REFRESH_INTERVAL_SECONDS") or cls.interval),
+            jitter=float(os.environ.get("INVENTORY_REFRESH_JITTER_SECONDS") or cls.jitter),
+            subscription_stagger=float(
+                os.environ.get("INVENTORY_REFRESH_SUBSCRIPTION_STAGGER_SECONDS") or cls.subscription_stagger
+            ),
+            max_concurrency=int(os.environ.get("INVENTORY_REFRESH_MAX_CONCURRENCY") or cls.max_concurrency),
+            max_concurrency_per_subscription=int(
+                os.environ.get("INVENTORY_REFRESH_MAX_CONCURRENCY_PER_SUBSCRIPTION")
+                or cls.max_concurrency_per_subscription
+            ),
+            max_usage_age=float(os.environ.get("INVENTORY_REFRESH_MAX_USAGE_AGE_SECONDS") or cls.max_usage_age),
+        )
+
+
+class InventoryRefreshWorker:
+    # Periodically sweeps Azure and ingests the result, so request handlers can read from the local store.
+    def __init__(
+        self,
+        settings: InventoryRefreshSettings,
+        azure_sql_manager_factory: Callable[[], AzureSqlManager] = AzureSqlManager,
+        ingestor: InventoryIngestor | None = None,
+        usage_history: UsageHistory | None = None,
+    ) -> None:
+        self._settings = settings
+        self._azure_sql_manager_factory = azure_sql_manager_factory
+        self._azure_sql_manager: AzureSqlManager | None = None
+        # Resources of the previous cycle, so only the ones that changed are written
+        self._sweep_state = SweepState(settings.max_usage_age)
+        self._ingestor = ingestor or InventoryIngestor()
+        self._usage_history = usage_history or UsageHistory()
+        self._task: asyncio.Task[None] | None = None
+        self._status = schemas.InventoryRefreshStatus(enabled=settings.enabled)
+        self._subscriptions: dict[str, schemas.SubscriptionRefreshStatus] = {}
+
+    @property
+    def status(self) -> schemas.InventoryRefreshStatus:
+        return self._status.copy(
+            update={
+                "running": self._task is not None and not self._task.done(),
+                "subscriptions": [subscription.copy() for subscription in self._subscriptions.values()],
+            }
+        )
+
+    def start(self) -> None:
+        if self._task is None:
+            self._azure_sql_manager = self._azure_sql_manager_factory()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._azure_sql_manager is not None:
+            await self._azure_sql_manager.close()
+            self._azure_sql_manager = None
+
+    async def _run(self) -> None:
+        while True:
+            started_at = datetime.now(timezone.utc)
+            self._status.last_cycle_started_at = started_at
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Inventory refresh cycle failed.")
+            finished_at = datetime.now(timezone.utc)
+            self._status.last_cycle_finished_at = finished_at
+            delay = max(
+                0.0,
+                self._settings.interval
+                + random.uniform(-self._settings.jitter, self._settings.jitter)
+                - (finished_at - started_at).total_seconds(),
+            )
+            self._status.next_cycle_at = finished_at + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+
+    async def refresh(self) -> None:
+        if self._azure_sql_manager is None:
+            raise RuntimeError("worker not started.")
+        started_at = datetime.now(timezone.utc)
+        await self._usage_history.ensure_partitions(started_at)
+        azure_sql_manager = self._azure_sql_manager
+        subscriptions = [subscription async for subscription in azure_sql_manager.get_subscriptions()]
+        # One budget for the whole cycle, so max_concurrency bounds the ARM calls of every subscription together.
+        budget = ConcurrencyBudget(self._settings.max_concurrency, self._settings.max_concurrency_per_subscription)
+        await asyncio.gather(
+            *[
+                self._refresh_subscription(
+                    azure_sql_manager,
+                    subscription,
+                    index * self._settings.subscription_stagger + random.uniform(0, self._settings.jitter),
+                    budget,
+                )
+                for index, subscription in enumerate(subscriptions)
+            ]
+        )
+        await self._usage_history.rollup(started_at)
+        await self._usage_history.apply_retention(started_at)
+
+    async def _refresh_subscription(
+        self,
+        azure_sql_manager: AzureSqlManager,
+        subscription: AzureSubscription,
+        delay: float,
+        budget: ConcurrencyBudget,
+    ) -> None:
+        # Each subscription is refreshed and pruned independently, a failure in one does not affect the others.
+        await asyncio.sleep(delay)
+        status = self._subscriptions.setdefault(
+            subscription.subscription_id,
+            schemas.SubscriptionRefreshStatus(
+                subscription_id=subscription.subscription_id, display_name=subscription.display_name
+            ),
+        )
+        status.display_name = subscription.display_name
+        status.last_started_at = datetime.now(timezone.utc)
+        try:
+            result = await self._ingestor.ingest(
+                azure_sql_manager.sweep(
+                    self._settings.max_concurrency,
+                    self._settings.max_concurrency_per_subscription,
+                    subscription_ids=[subscription.subscription_id],
+                    state=self._sweep_state,
+                    budget=budget,
+                ),
+                prune=True,
+            )
+        except Exception as e:
+            logger.exception("Inventory refresh of subscription %s failed.", subscription.subscription_id)
+            # What was swept may not have been written, the next cycle writes every resource again.
+            self._sweep_state.forget(subscription.subscription_id)
+            status.last_error = repr(e)
+        else:
+            status.last_error = None
+            status.last_succeeded_at = datetime.now(timezone.utc)
+            status.rows_written = (
+                result.subscriptions
+                + result.servers
+                + result.elastic_pools
+                + result.databases
+                + result.usage_samples
+                + result.pruned
+            )
+            status.rows_unchanged = result.unchanged
+        finally:
+            status.last_finished_at = datetime.now(timezone.utc)
@@ -0,0 +1,61 @@
+import uuid
+from typing import Any, AsyncIterator
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+# https://github.com/ndjson/ndjson-spec
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def accepts_ndjson(accept: str | None) -> bool:
+    return accept is not None and NDJSON_MEDIA_TYPE in accept
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, uuid.UUID):
+        # Subclasses of UUID, such as the ones asyncpg returns
+        return str(obj)
+    raise TypeError
+
+
+def dumps(content: Any) -> bytes:
+    # orjson serializes uuid.UUID, datetime and enums itself. Models and UUID subclasses go through _default.
+    # https://github.com/ijl/orjson#default
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ModelJSONResponse(ORJSONResponse):
+    # Also accepts pydantic models. Returned from a path operation it skips the validation of the response model
+    # and jsonable_encoder, use it for items that already are the response model (e.g. schemas built from rows).
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def to_ndjson(items: AsyncIterator[BaseModel], chunk_size: int = 100) -> AsyncIterator[bytes]:
+    # Lines are grouped in chunks, writing every row on its own costs more than serializing it.
+    lines: list[bytes] = []
+    async for item in items:
+        lines.append(dumps(item))
+        if len(lines) >= chunk_size:
+            yield b"\n".join(lines) + b"\n"
+            lines.clear()
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def make_etag(*parts: object) -> str:
+    # Weak, the same data may be sent with different encodings (e.g. compressed).
+    # https://www.rfc-editor.org/rfc/rfc9110#name-etag
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def matches_etag(if_none_match: str | None, etag: str) -> bool:
+    # https://www.rfc-editor.org/rfc/rfc9110#name-if-none-match (weak comparison)
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in tags]
@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+from uuid import UUID
+
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends
+from mediatpy import Mediator
+
+from azure_sql import schemas
+from azure_sql.containers import Container
+from azure_sql.handlers import GetDatabasesRequest, GetDatabaseUsageHistoryRequest
+from azure_sql.responses import ModelJSONResponse
+
+ROUTER_NAME = "databases"
+router = APIRouter(prefix=f"/{ROUTER_NAME}", tags=[ROUTER_NAME])
+
+
+@router.get("/", response_model=list[schemas.Database])
+@inject
+async def get_databases(
+    subscription_id: UUID | None = None,
+    resource_group_name: str | None = None,
+    server_name: str | None = None,
+    mediator: Mediator = Depends(Provide[Container.mediator]),
+):
+    databases = await mediator.send(GetDatabasesRequest(subscription_id, resource_group_name, server_name))
+    return ModelJSONResponse(databases)
+
+
+@router.get(
+    "/{subscription_id}/{resource_group_name}/{server_name}/{database_name}/usage",
+    response_model=schemas.DatabaseUsageHistory,
+)
+@inject
+async def get_database_usage_history(
+    subscription_id: UUID,
+    resource_group_name: str,
+    server_name: str,
+    database_name: str,
+    start: datetime,
+    end: datetime | None = None,
+    granularity: schemas.UsageGranularity = schemas.UsageGranularity.DAY,
+    mediator: Mediator = Depends(Provide[Container.mediator]),
+):
+    return await mediator.send(
+        GetDatabaseUsageHistoryRequest(
+            subscription_id,
+            resource_group_name,
+            server_name,
+            database_name,
+            start,
+            end or datetime.now(timezone.utc),
+            granularity,
+        )
+    )
@@ -7,6 +7,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from azure_sql import models
+from azure_sql.database import engine, get_pool_status, read_engine
 from azure_sql.dependencies import get_session
 
 ROUTER_NAME = "debug"
@@ -21,3 +22,8 @@ async def get_debug(session: AsyncSession = Depends(get_session)):
     )
     session.add(db_subscription)
     return {"session_id": id(session), "session_new": session.new, "thread_id": threading.get_ident()}
+
+
+@router.get("/pool")
+async def get_pool():
+    return {"primary": get_pool_status(engine), "read": get_pool_status(read_engine)}
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Request
+
+from azure_sql import schemas
+
+ROUTER_NAME = "inventory"
+router = APIRouter(prefix=f"/{ROUTER_NAME}", tags=[ROUTER_NAME])
+
+
+@router.get("/refresh/status", response_model=schemas.InventoryRefreshStatus)
+async def get_refresh_status(request: Request):
+    worker = getattr(request.app.state, "inventory_refresh_worker", None)
+    if worker is None:
+        return schemas.InventoryRefreshStatus(enabled=False)
+    return worker.status
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from azure_sql.metrics import CONTENT_TYPE, registry
+
+ROUTER_NAME = "metrics"
+router = APIRouter(prefix=f"/{ROUTER_NAME}", tags=[ROUTER_NAME])
+
+
+# Without a trailing slash, the path scrapers ask for by default
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics():
+    # https://prometheus.io/docs/instrumenting/exposition_formats/#text-based-format
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
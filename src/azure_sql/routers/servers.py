@@ -0,0 +1,19 @@
+from uuid import UUID
+
+from dependency_injector.wiring import Provide, inject
+from fastapi import APIRouter, Depends
+from mediatpy import Mediator
+
+from azure_sql import schemas
+from azure_sql.containers import Container
+from azure_sql.handlers import GetServersRequest
+from azure_sql.responses import ModelJSONResponse
+
+ROUTER_NAME = "servers"
+router = APIRouter(prefix=f"/{ROUTER_NAME}", tags=[ROUTER_NAME])
+
+
+@router.get("/", response_model=list[schemas.Server])
+@inject
+async def get_servers(subscription_id: UUID | None = None, mediator: Mediator = Depends(Provide[Container.mediator])):
+    return ModelJSONResponse(await mediator.send(GetServersRequest(subscription_id)))
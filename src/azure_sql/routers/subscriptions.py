@@ -1,26 +1,115 @@
+from http import HTTPStatus
 from uuid import UUID
 
 from dependency_injector.wiring import Provide, inject
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from mediatpy import Mediator
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from azure_sql import models, schemas
+from azure_sql.bulk_import import CSV_MEDIA_TYPE, SUPPORTED_MEDIA_TYPES, get_media_type, parse_subscriptions
 from azure_sql.containers import Container
-from azure_sql.dependencies import get_session
-from azure_sql.handlers import GetSubscriptionsRequest
+from azure_sql.dependencies import get_read_session
+from azure_sql.handlers import (
+    GetSubscriptionsRequest,
+    GetTableVersionRequest,
+    ImportSubscriptionsRequest,
+    StreamSubscriptionsRequest,
+)
+from azure_sql.pagination import InvalidCursorError
+from azure_sql.responses import NDJSON_MEDIA_TYPE, ModelJSONResponse, accepts_ndjson, make_etag, matches_etag, to_ndjson
 
 ROUTER_NAME = "subscriptions"
 router = APIRouter(prefix=f"/{ROUTER_NAME}", tags=[ROUTER_NAME])
 
+MAX_PAGE_SIZE = 1000
 
-@router.get("/", response_model=list[schemas.Subscription])
+
+@router.get(
+    "/",
+    response_model=list[schemas.Subscription],
+    responses={HTTPStatus.OK.value: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
 @inject
-async def get_subscriptions(mediator: Mediator = Depends(Provide[Container.mediator])):
-    return await mediator.send(GetSubscriptionsRequest())
+async def get_subscriptions(
+    request: Request,
+    enabled: bool | None = None,
+    sort: schemas.SubscriptionSort = schemas.SubscriptionSort.SUBSCRIPTION_ID,
+    order: schemas.SortOrder = schemas.SortOrder.ASC,
+    limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    accept: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+    mediator: Mediator = Depends(Provide[Container.mediator]),
+):
+    # The version is read before the data, a concurrent write can only make the ETag older than the data.
+    version: int = await mediator.send(GetTableVersionRequest(models.Subscription.__tablename__))
+    ndjson = accepts_ndjson(accept)
+    etag = make_etag(models.Subscription.__tablename__, version, "ndjson" if ndjson else "json")
+    if matches_etag(if_none_match, etag):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": etag})
+    if ndjson:
+        # The whole result is streamed, a page of it would need the cursor of the last row of the previous one.
+        if limit is not None or cursor is not None:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail=f"limit and cursor are not supported with {NDJSON_MEDIA_TYPE}.",
+            )
+        # Rows are fetched with a server-side cursor and written as they arrive
+        subscriptions = await mediator.send(StreamSubscriptionsRequest(enabled, sort, order))
+        return StreamingResponse(to_ndjson(subscriptions), media_type=NDJSON_MEDIA_TYPE, headers={"ETag": etag})
+    try:
+        page: schemas.SubscriptionPage = await mediator.send(
+            GetSubscriptionsRequest(enabled, sort, order, limit, cursor, version)
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(e))
+    headers = {"ETag": etag}
+    if page.next_cursor is not None:
+        # https://datatracker.ietf.org/doc/html/rfc8288
+        headers["X-Next-Cursor"] = page.next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=page.next_cursor)}>; rel="next"'
+    # Items are built from rows, the response model would validate them again
+    return ModelJSONResponse(page.items, headers=headers)
 
 
 @router.get("/{subscription_id}", response_model=schemas.Subscription)
 @inject
-async def get_subscription(subscription_id: UUID, session: AsyncSession = Depends(get_session)):
+async def get_subscription(
+    subscription_id: UUID,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    session: AsyncSession = Depends(get_read_session),
+    mediator: Mediator = Depends(Provide[Container.mediator]),
+):
+    version: int = await mediator.send(GetTableVersionRequest(models.Subscription.__tablename__))
+    etag = make_etag(models.Subscription.__tablename__, version)
+    if matches_etag(if_none_match, etag):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return await session.get(models.Subscription, subscription_id)
+
+
+@router.post(
+    "/import",
+    response_model=schemas.SubscriptionImportResult,
+    # https://fastapi.tiangolo.com/advanced/path-operation-advanced-configuration/#custom-openapi-content-type
+    openapi_extra={"requestBody": {"content": {NDJSON_MEDIA_TYPE: {}, CSV_MEDIA_TYPE: {}}, "required": True}},
+)
+@inject
+async def import_subscriptions(
+    request: Request,
+    content_type: str | None = Header(default=None),
+    mediator: Mediator = Depends(Provide[Container.mediator]),
+):
+    # The body is parsed while it is received and copied into the database, it is never held in memory.
+    media_type = get_media_type(content_type)
+    if media_type not in SUPPORTED_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=HTTPStatus.UNSUPPORTED_MEDIA_TYPE, detail=f"expected {' or '.join(SUPPORTED_MEDIA_TYPES)}."
+        )
+    try:
+        return await mediator.send(ImportSubscriptionsRequest(parse_subscriptions(media_type, request.stream())))
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(e))
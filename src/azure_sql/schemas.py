@@ -1,12 +1,110 @@
 import uuid
+from datetime import datetime
+from enum import Enum
+from typing import Any, Type, TypeVar
 
 from pydantic import BaseModel
 
+TOrmModel = TypeVar("TOrmModel", bound="OrmModel")
 
-class Subscription(BaseModel):
+
+class OrmModel(BaseModel):
+    class Config:
+        orm_mode = True
+
+    @classmethod
+    def from_row(cls: Type[TOrmModel], row: Any) -> TOrmModel:
+        # Rows read from the database already have the column types, from_orm would validate them again.
+        # https://docs.pydantic.dev/1.10/usage/models/#creating-models-without-validation
+        return cls.construct(**{name: getattr(row, name) for name in cls.__fields__})
+
+
+class Subscription(OrmModel):
     subscription_id: uuid.UUID
     display_name: str
     enabled: bool
 
-    class Config:
-        orm_mode = True
+
+class SubscriptionImportResult(BaseModel):
+    received: int
+    # Inserted or changed, rows equal to the stored ones are not written
+    written: int
+
+
+class SubscriptionSort(str, Enum):
+    SUBSCRIPTION_ID = "subscription_id"
+    DISPLAY_NAME = "display_name"
+
+
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+
+class SubscriptionPage(BaseModel):
+    items: list[Subscription]
+    next_cursor: str | None
+
+
+class UsageGranularity(str, Enum):
+    RAW = "raw"
+    HOUR = "hour"
+    DAY = "day"
+
+
+class DatabaseUsagePoint(OrmModel):
+    timestamp: datetime
+    space_used_bytes: float
+    space_used_bytes_max: int
+    space_allocated_bytes: float
+    space_allocated_bytes_max: int
+
+
+class DatabaseUsageHistory(BaseModel):
+    granularity: UsageGranularity
+    points: list[DatabaseUsagePoint]
+    space_used_growth_bytes: float | None
+
+
+class Server(OrmModel):
+    subscription_id: uuid.UUID
+    resource_group_name: str
+    name: str
+    fully_qualified_domain_name: str | None
+    state: str | None
+    updated_at: datetime
+
+
+class Database(OrmModel):
+    subscription_id: uuid.UUID
+    resource_group_name: str
+    server_name: str
+    name: str
+    status: str | None
+    current_service_objective_name: str | None
+    max_size_bytes: int | None
+    elastic_pool_name: str | None
+    space_used_bytes: int | None
+    space_allocated_bytes: int | None
+    space_allocated_unused_bytes: int | None
+    updated_at: datetime
+
+
+class SubscriptionRefreshStatus(BaseModel):
+    subscription_id: str
+    display_name: str
+    last_started_at: datetime | None = None
+    last_finished_at: datetime | None = None
+    last_succeeded_at: datetime | None = None
+    last_error: str | None = None
+    rows_written: int = 0
+    rows_unchanged: int = 0
+
+
+class InventoryRefreshStatus(BaseModel):
+    enabled: bool
+    running: bool = False
+    last_cycle_started_at: datetime | None = None
+    last_cycle_finished_at: datetime | None = None
+    next_cycle_at: datetime | None = None
+    subscriptions: list[SubscriptionRefreshStatus] = []
@@ -0,0 +1,146 @@
+import asyncio
+import email.utils
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Mapping
+
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from azure.core.pipeline import PipelineRequest, PipelineResponse
+from azure.core.pipeline.policies import AsyncHTTPPolicy
+
+from azure_sql import metrics
+
+_SUBSCRIPTION_ID_PATTERN = re.compile(r"/subscriptions/([^/?]+)", re.IGNORECASE)
+# https://learn.microsoft.com/en-us/azure/azure-resource-manager/management/request-limits-and-throttling
+_REMAINING_READS_HEADERS = (
+    "x-ms-ratelimit-remaining-subscription-reads",
+    "x-ms-ratelimit-remaining-tenant-reads",
+)
+
+
+@dataclass(frozen=True)
+class ThrottlingPolicy:
+    # Token bucket per subscription (tenant level calls share one bucket)
+    requests_per_second: float = 10
+    burst: int = 20
+    # Below this number of remaining reads reported by ARM, the rate is reduced proportionally
+    remaining_reads_threshold: int = 1000
+    min_rate_factor: float = 0.1
+    max_retries: int = 5
+    backoff_base: float = 0.5
+    backoff_max: float = 60
+    retry_status_codes: frozenset[int] = frozenset({408, 429, 500, 502, 503, 504})
+
+    def backoff(self, attempt: int) -> float:
+        # https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/ (full jitter)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        # The lock makes waiters take tokens in arrival order.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _get_retry_after(headers: Mapping[str, str]) -> float | None:
+    for name, scale in (("retry-after-ms", 1000), ("x-ms-retry-after-ms", 1000)):
+        if name in headers:
+            try:
+                return float(headers[name]) / scale
+            except ValueError:
+                pass
+    if "retry-after" not in headers:
+        return None
+    retry_after = headers["retry-after"]
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncArmThrottlingPolicy(AsyncHTTPPolicy):
+    # https://learn.microsoft.com/en-us/azure/developer/python/sdk/azure-sdk-library-usage-patterns#pipeline-policies
+    # It replaces the SDK retry policy, clients using it must be created with retry_total=0.
+    def __init__(self, policy: ThrottlingPolicy = ThrottlingPolicy()) -> None:
+        super().__init__()
+        self._policy = policy
+        self._buckets: dict[str, TokenBucket] = {}
+        self.throttled = 0
+        self.retries = 0
+
+    def _get_bucket(self, url: str) -> TokenBucket:
+        match = _SUBSCRIPTION_ID_PATTERN.search(url)
+        key = match.group(1).lower() if match is not None else ""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self._policy.requests_per_second, self._policy.burst)
+        return bucket
+
+    def _adapt_rate(self, bucket: TokenBucket, headers: Mapping[str, str]) -> None:
+        for name in _REMAINING_READS_HEADERS:
+            if name in headers:
+                try:
+                    remaining = int(headers[name])
+                except ValueError:
+                    return
+                factor = min(1.0, max(self._policy.min_rate_factor, remaining / self._policy.remaining_reads_threshold))
+                bucket.rate = self._policy.requests_per_second * factor
+                return
+
+    async def send(self, request: PipelineRequest) -> PipelineResponse:
+        bucket = self._get_bucket(request.http_request.url)
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                response = await self.next.send(request)
+            except (ServiceRequestError, ServiceResponseError):
+                if attempt >= self._policy.max_retries:
+                    raise
+                await asyncio.sleep(self._policy.backoff(attempt))
+                attempt += 1
+                self.retries += 1
+                metrics.arm_retries.inc()
+                continue
+            http_response = response.http_response
+            self._adapt_rate(bucket, http_response.headers)
+            if http_response.status_code not in self._policy.retry_status_codes or attempt >= self._policy.max_retries:
+                return response
+            retry_after = _get_retry_after(http_response.headers)
+            delay = retry_after if retry_after is not None else self._policy.backoff(attempt)
+            if http_response.status_code == 429:
+                self.throttled += 1
+                # Every request of the subscription waits, not only the one that has been throttled.
+                bucket.pause(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+            self.retries += 1
+            metrics.arm_retries.inc()
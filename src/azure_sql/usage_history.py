@@ -0,0 +1,154 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from dependency_injector.wiring import Provide, inject
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from azure_sql import models
+from azure_sql.containers import Container
+
+_SAMPLES_TABLE = models.DatabaseUsageSample.__tablename__
+_DEFAULT_PARTITION = f"{_SAMPLES_TABLE}_default"
+_PARTITION_NAME_PATTERN = re.compile(rf"^{_SAMPLES_TABLE}_(\d{{4}})_(\d{{2}})$")
+
+# Buckets touched since the last rollup are fully recomputed, so rollups are idempotent.
+_ROLLUP_COLUMNS = """
+    subscription_id, resource_group_name, server_name, database_name, bucket,
+    space_used_bytes_max, space_used_bytes_sum, space_allocated_bytes_max, space_allocated_bytes_sum, samples
+"""
+_ON_CONFLICT_UPDATE_ROLLUP = """
+    ON CONFLICT (subscription_id, resource_group_name, server_name, database_name, bucket) DO UPDATE SET
+        space_used_bytes_max = EXCLUDED.space_used_bytes_max,
+        space_used_bytes_sum = EXCLUDED.space_used_bytes_sum,
+        space_allocated_bytes_max = EXCLUDED.space_allocated_bytes_max,
+        space_allocated_bytes_sum = EXCLUDED.space_allocated_bytes_sum,
+        samples = EXCLUDED.samples
+"""
+_HOURLY_ROLLUP = text(
+    f"""
+    INSERT INTO "{models.DatabaseUsageHourly.__tablename__}" ({_ROLLUP_COLUMNS})
+    SELECT subscription_id, resource_group_name, server_name, database_name, date_trunc('hour', sampled_at, 'UTC'),
+        max(space_used_bytes), sum(space_used_bytes), max(space_allocated_bytes), sum(space_allocated_bytes), count(*)
+    FROM "{_SAMPLES_TABLE}"
+    WHERE sampled_at >= date_trunc('hour', CAST(:since AS timestamptz), 'UTC')
+    GROUP BY subscription_id, resource_group_name, server_name, database_name, date_trunc('hour', sampled_at, 'UTC')
+    {_ON_CONFLICT_UPDATE_ROLLUP}
+    """
+)
+_DAILY_ROLLUP = text(
+    f"""
+    INSERT INTO "{models.DatabaseUsageDaily.__tablename__}" ({_ROLLUP_COLUMNS})
+    SELECT subscription_id, resource_group_name, server_name, database_name, date_trunc('day', bucket, 'UTC'),
+        max(space_used_bytes_max), sum(space_used_bytes_sum), max(space_allocated_bytes_max),
+        sum(space_allocated_bytes_sum), sum(samples)
+    FROM "{models.DatabaseUsageHourly.__tablename__}"
+    WHERE bucket >= date_trunc('day', CAST(:since AS timestamptz), 'UTC')
+    GROUP BY subscription_id, resource_group_name, server_name, database_name, date_trunc('day', bucket, 'UTC')
+    {_ON_CONFLICT_UPDATE_ROLLUP}
+    """
+)
+_PARTITIONS = text(
+    """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class AS parent ON pg_inherits.inhparent = parent.oid
+    JOIN pg_class AS child ON pg_inherits.inhrelid = child.oid
+    WHERE parent.relname = :table_name
+    """
+)
+
+
+@dataclass(frozen=True)
+class UsageRetentionPolicy:
+    samples: timedelta = timedelta(days=90)
+    hourly: timedelta = timedelta(days=365)
+    daily: timedelta = timedelta(days=5 * 365)
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + year, month=month_index + 1)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"{_SAMPLES_TABLE}_{month:%Y_%m}"
+
+
+class UsageHistory:
+    @inject
+    def __init__(
+        self,
+        retention: UsageRetentionPolicy = UsageRetentionPolicy(),
+        session_provider=Provide[Container.session_provider],
+    ) -> None:
+        self._retention = retention
+        self._session_provider = session_provider
+
+    async def rollup(self, since: datetime) -> None:
+        session: AsyncSession
+        async with self._session_provider() as session:
+            await session.execute(_HOURLY_ROLLUP, {"since": since})
+            await session.execute(_DAILY_ROLLUP, {"since": since})
+
+    async def ensure_partitions(self, now: datetime, months_ahead: int = 2) -> None:
+        # https://www.postgresql.org/docs/current/ddl-partitioning.html#DDL-PARTITIONING-DECLARATIVE-MAINTENANCE
+        # Samples of a month without a partition are stored in the default partition, and a partition cannot be
+        # created while the default partition has rows in its range. Those rows are moved to the new partition
+        # before it is attached.
+        session: AsyncSession
+        async with self._session_provider() as session:
+            # Serializes the workers maintaining the partitions, until the end of the transaction.
+            await session.execute(
+                text("SELECT pg_advisory_xact_lock(hashtext(:table_name))"), {"table_name": _SAMPLES_TABLE}
+            )
+            partitions = set((await session.execute(_PARTITIONS, {"table_name": _SAMPLES_TABLE})).scalars().all())
+            current_month = _month_start(now)
+            for months in range(months_ahead + 1):
+                month = _add_months(current_month, months)
+                partition = _partition_name(month)
+                if partition in partitions:
+                    continue
+                next_month = _add_months(month, 1)
+                await session.execute(text(f'CREATE TABLE "{partition}" (LIKE "{_SAMPLES_TABLE}")'))
+                await session.execute(
+                    text(
+                        f'WITH moved AS (DELETE FROM "{_DEFAULT_PARTITION}" '
+                        "WHERE sampled_at >= :month AND sampled_at < :next_month RETURNING *) "
+                        f'INSERT INTO "{partition}" SELECT * FROM moved'
+                    ),
+                    {"month": month, "next_month": next_month},
+                )
+                await session.execute(
+                    text(
+                        f'ALTER TABLE "{_SAMPLES_TABLE}" ATTACH PARTITION "{partition}" '
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+                    )
+                )
+
+    async def apply_retention(self, now: datetime) -> None:
+        # Raw samples are dropped a whole partition at a time, rollups are small enough to be deleted by row.
+        session: AsyncSession
+        async with self._session_provider() as session:
+            samples_cutoff = now - self._retention.samples
+            partitions = (await session.execute(_PARTITIONS, {"table_name": _SAMPLES_TABLE})).scalars().all()
+            for partition in partitions:
+                match = _PARTITION_NAME_PATTERN.match(partition)
+                if match is None:
+                    continue
+                month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+                if _add_months(month, 1) <= samples_cutoff:
+                    await session.execute(text(f'DROP TABLE "{partition}"'))
+            await session.execute(
+                delete(models.DatabaseUsageHourly).where(
+                    models.DatabaseUsageHourly.bucket < now - self._retention.hourly
+                )
+            )
+            await session.execute(
+                delete(models.DatabaseUsageDaily).where(models.DatabaseUsageDaily.bucket < now - self._retention.daily)
+            )
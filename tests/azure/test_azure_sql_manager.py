@@ -28,6 +28,12 @@ async def test_get_databases():
                     print(database)
 
 
+async def test_sweep():
+    async with AzureSqlManager() as azure_sql_manager:
+        async for record in azure_sql_manager.sweep(max_concurrency=32, max_concurrency_per_subscription=8):
+            print(record)
+
+
 async def test_get_database():
     async with AzureSqlManager() as azure_sql_manager:
         database = await azure_sql_manager.get_database(
@@ -0,0 +1,118 @@
+import pytest
+from assertpy import assert_that
+
+from azure_sql.azure_sql_manager import (
+    AzureSqlDatabase,
+    AzureSqlElasticPool,
+    AzureSqlManager,
+    AzureSqlServer,
+    AzureSubscription,
+    SweepState,
+)
+from azure_sql.fake_arm import FakeArmInventory, FakeArmServer, FakeArmSettings
+from azure_sql.throttling import ThrottlingPolicy
+
+
+@pytest.fixture
+async def fake_arm_server():
+    # Pages of 3 items, so listings follow nextLink
+    inventory = FakeArmInventory.generate(subscriptions=2, servers_per_subscription=2, databases_per_server=5)
+    async with FakeArmServer(inventory, FakeArmSettings(page_size=3)) as server:
+        yield server
+
+
+async def test_get_databases(fake_arm_server: FakeArmServer):
+    subscription = next(iter(fake_arm_server.inventory.subscriptions.values()))
+    fake_server = next(iter(subscription.servers.values()))
+
+    async with AzureSqlManager(**fake_arm_server.manager_kwargs()) as azure_sql_manager:
+        databases = [
+            database
+            async for database in azure_sql_manager.get_databases(
+                subscription.subscription_id, fake_server.resource_group_name, fake_server.name, max_concurrency=4
+            )
+        ]
+
+    assert_that([database.name for database in databases]).is_equal_to(list(fake_server.databases))
+    fake_database = fake_server.databases["db-0"]
+    assert_that(databases[0].usage.space_used.bytes).is_equal_to(fake_database.space_used_bytes)
+    assert_that(databases[0].elastic_pool_name).is_equal_to(fake_database.elastic_pool_name)
+
+
+async def test_get_elastic_pool_calculates_usage(fake_arm_server: FakeArmServer):
+    subscription = next(iter(fake_arm_server.inventory.subscriptions.values()))
+    fake_server = next(iter(subscription.servers.values()))
+
+    async with AzureSqlManager(**fake_arm_server.manager_kwargs()) as azure_sql_manager:
+        elastic_pool = await azure_sql_manager.get_elastic_pool(
+            subscription.subscription_id, fake_server.resource_group_name, fake_server.name, "pool-0", True
+        )
+
+    assert_that(elastic_pool.usage).is_not_none()
+    assert_that(elastic_pool.usage.space_used.bytes).is_equal_to(
+        sum(
+            database.space_used_bytes
+            for database in fake_server.databases.values()
+            if database.elastic_pool_name == "pool-0"
+        )
+    )
+
+
+async def test_sweep(fake_arm_server: FakeArmServer):
+    async with AzureSqlManager(**fake_arm_server.manager_kwargs()) as azure_sql_manager:
+        records = [record async for record in azure_sql_manager.sweep(max_concurrency=8)]
+
+    def count(type_: type) -> int:
+        return len([record for record in records if isinstance(record.resource, type_)])
+
+    assert_that(count(AzureSubscription)).is_equal_to(2)
+    assert_that(count(AzureSqlServer)).is_equal_to(4)
+    assert_that(count(AzureSqlDatabase)).is_equal_to(20)
+    assert_that(count(AzureSqlElasticPool)).is_equal_to(4)
+
+
+async def test_sweep_with_state_skips_unchanged_resources(fake_arm_server: FakeArmServer):
+    subscription = next(iter(fake_arm_server.inventory.subscriptions.values()))
+    fake_database = next(iter(subscription.servers.values())).databases["db-1"]
+    state = SweepState(max_usage_age=3600)
+
+    async with AzureSqlManager(**fake_arm_server.manager_kwargs()) as azure_sql_manager:
+        first_records = [record async for record in azure_sql_manager.sweep(max_concurrency=8, state=state)]
+        requests = fake_arm_server.requests
+        fake_database.status = "Paused"
+        records = [record async for record in azure_sql_manager.sweep(max_concurrency=8, state=state)]
+
+    assert_that([record for record in first_records if not record.changed]).is_empty()
+    changed = [record.resource for record in records if record.changed]
+    assert_that(changed).is_length(1)
+    assert_that(changed[0]).has_name("db-1").has_status("Paused")
+    assert_that(records).is_length(len(first_records))
+    # The same listings, and the usages of the database that changed instead of the usages of the 20 databases
+    assert_that(fake_arm_server.requests - requests).is_equal_to(requests - 19)
+
+
+async def test_sweep_with_state_requests_usages_older_than_max_usage_age(fake_arm_server: FakeArmServer):
+    state = SweepState(max_usage_age=0)
+
+    async with AzureSqlManager(**fake_arm_server.manager_kwargs()) as azure_sql_manager:
+        [record async for record in azure_sql_manager.sweep(max_concurrency=8, state=state)]
+        records = [record async for record in azure_sql_manager.sweep(max_concurrency=8, state=state)]
+
+    assert_that([record.resource for record in records if record.changed]).is_length(20).extracting(
+        "usage"
+    ).does_not_contain(None)
+
+
+async def test_throttled_requests_are_retried():
+    inventory = FakeArmInventory.generate(subscriptions=1, servers_per_subscription=1, databases_per_server=5)
+    settings = FakeArmSettings(throttle_probability=0.3, retry_after=0.01)
+
+    async with FakeArmServer(inventory, settings) as fake_arm_server:
+        async with AzureSqlManager(
+            throttling=ThrottlingPolicy(max_retries=20), **fake_arm_server.manager_kwargs()
+        ) as azure_sql_manager:
+            records = [record async for record in azure_sql_manager.sweep()]
+
+    assert_that(records).is_length(1 + 1 + 5 + 1)
+    assert_that(fake_arm_server.throttled).is_greater_than(0)
+    assert_that(azure_sql_manager.throttling_policy.throttled).is_equal_to(fake_arm_server.throttled)
@@ -1,10 +1,16 @@
 # flake8: noqa
 import asyncio
+import contextlib
+import os
+import subprocess
+from pathlib import Path
 from typing import Generator
 
+import psycopg2
 import pytest
 from _pytest.fixtures import SubRequest
 from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 @pytest.fixture(scope="session")
@@ -47,3 +53,46 @@ def event_loop(request: SubRequest):
 @pytest.fixture(scope="session", autouse=True)
 def load_env():
     load_dotenv(override=True)
+
+
+@pytest.fixture(scope="session")
+def migrate_db(load_env):
+    conn = psycopg2.connect(
+        database="postgres",
+        user=os.environ["SQLALCHEMY_URL_USER"],
+        password=os.environ["SQLALCHEMY_URL_PASSWORD"],
+        host=os.environ["SQLALCHEMY_URL_HOST"],
+        port=int(os.environ["SQLALCHEMY_URL_PORT"]),
+    )
+    # https://stackoverflow.com/a/68112827
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        query = f"DROP DATABASE IF EXISTS \"{os.environ['SQLALCHEMY_URL_DBNAME']}\" WITH (FORCE);"
+        cur.execute(query)
+        query = f"CREATE DATABASE \"{os.environ['SQLALCHEMY_URL_DBNAME']}\";"
+        cur.execute(query)
+
+    os.chdir(Path(__file__).parent.parent)
+    subprocess.run(["alembic", "upgrade", "head"], check=True)
+
+
+@pytest.fixture
+async def session(migrate_db):
+    from azure_sql.database import scoped_session
+
+    session: AsyncSession
+    async with scoped_session() as session:
+        await session.begin()
+        yield session
+        await session.rollback()
+    await scoped_session.remove()
+
+
+@pytest.fixture
+async def session_provider(session):
+    # Every call yields the same session and leaves it open, so the test can keep using it after a request.
+    @contextlib.asynccontextmanager
+    async def session_provider():
+        yield session
+
+    yield session_provider
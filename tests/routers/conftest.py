@@ -1,50 +1,7 @@
-import os
-import subprocess
-from pathlib import Path
-
-import psycopg2
 import pytest
 from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from azure_sql.database import scoped_session
-from azure_sql.dependencies import get_session
-
-
-@pytest.fixture(scope="session", autouse=True)
-def migrate_db():
-    conn = psycopg2.connect(
-        database="postgres",
-        user=os.environ["SQLALCHEMY_URL_USER"],
-        password=os.environ["SQLALCHEMY_URL_PASSWORD"],
-        host=os.environ["SQLALCHEMY_URL_HOST"],
-        port=int(os.environ["SQLALCHEMY_URL_PORT"]),
-    )
-    # https://stackoverflow.com/a/68112827
-    conn.autocommit = True
-    with conn.cursor() as cur:
-        query = f"DROP DATABASE IF EXISTS \"{os.environ['SQLALCHEMY_URL_DBNAME']}\" WITH (FORCE);"
-        cur.execute(query)
-        query = f"CREATE DATABASE \"{os.environ['SQLALCHEMY_URL_DBNAME']}\";"
-        cur.execute(query)
-
-    os.chdir(Path(__file__).parent.parent.parent)
-    subprocess.run(["alembic", "upgrade", "head"], check=True)
 
-
-@pytest.fixture
-async def session():
-    session: AsyncSession
-    async with scoped_session() as session:
-        await session.begin()
-        yield session
-        await session.rollback()
-    await scoped_session.remove()
-
-
-@pytest.fixture
-async def session_provider(session):
-    yield lambda: session
+from azure_sql.dependencies import get_read_session, get_session
 
 
 @pytest.fixture
@@ -61,8 +18,11 @@ async def _app(session):
 
     # https://fastapi.tiangolo.com/advanced/testing-dependencies/#use-the-appdependency_overrides-attribute
     app.dependency_overrides[get_session] = lambda: session
+    app.dependency_overrides[get_read_session] = lambda: session
+    app.container.query_cache().clear()  # type: ignore[attr-defined]
     yield app
     app.dependency_overrides.clear()
+    app.container.query_cache().clear()  # type: ignore[attr-defined]
 
 
 @pytest.fixture
@@ -0,0 +1,54 @@
+import contextlib
+import uuid
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from assertpy import assert_that
+from httpx import AsyncClient
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from azure_sql import models
+from azure_sql.containers import Container
+from azure_sql.usage_history import UsageHistory
+
+
+async def test_get_database_usage_history_by_hour(
+    session: AsyncSession, container: Container, http_client: AsyncClient
+):
+    # The session is kept open by the provider, so the rollup is visible to the request in the same transaction.
+    @contextlib.asynccontextmanager
+    async def session_provider():
+        yield session
+
+    for model in (models.DatabaseUsageSample, models.DatabaseUsageHourly, models.DatabaseUsageDaily):
+        await session.execute(delete(model))
+    subscription_id = uuid.UUID("0fdff486-1af4-412b-8933-7a5c7884729f")
+    session.add_all(
+        [
+            models.DatabaseUsageSample(
+                subscription_id=subscription_id,
+                resource_group_name="rg",
+                server_name="server",
+                database_name="database",
+                sampled_at=datetime(2022, 1, 1, hour, minute, tzinfo=timezone.utc),
+                space_used_bytes=space_used_bytes,
+                space_allocated_bytes=space_used_bytes * 2,
+            )
+            for hour, minute, space_used_bytes in [(10, 0, 100), (10, 30, 300), (11, 0, 500)]
+        ]
+    )
+    await session.flush()
+    await UsageHistory(session_provider=session_provider).rollup(datetime(2022, 1, 1, tzinfo=timezone.utc))
+
+    with container.session_provider.override(session_provider):
+        response = await http_client.get(
+            f"/databases/{subscription_id}/rg/server/database/usage",
+            params={"start": "2022-01-01T00:00:00+00:00", "end": "2022-01-02T00:00:00+00:00", "granularity": "hour"},
+        )
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    json = response.json()
+    assert_that([point["space_used_bytes"] for point in json["points"]]).is_equal_to([200, 500])
+    assert_that([point["space_used_bytes_max"] for point in json["points"]]).is_equal_to([300, 500])
+    assert_that(json["space_used_growth_bytes"]).is_equal_to(300)
@@ -0,0 +1,13 @@
+from http import HTTPStatus
+
+from assertpy import assert_that
+from httpx import AsyncClient
+
+
+async def test_get_pool(http_client: AsyncClient):
+    response = await http_client.get("/debug/pool")
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    json = response.json()
+    assert_that(json).contains_key("primary", "read")
+    assert_that(json["primary"]).contains_key("size", "checked_in", "checked_out", "overflow")
@@ -0,0 +1,38 @@
+from http import HTTPStatus
+
+from assertpy import assert_that
+from httpx import AsyncClient
+
+from azure_sql import schemas
+
+
+async def test_get_refresh_status_without_worker(http_client: AsyncClient):
+    response = await http_client.get("/inventory/refresh/status")
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    assert_that(response.json()).is_equal_to(schemas.InventoryRefreshStatus(enabled=False).dict())
+
+
+async def test_get_refresh_status(http_client: AsyncClient, _app, monkeypatch):
+    class _Worker:
+        status = schemas.InventoryRefreshStatus(
+            enabled=True,
+            running=True,
+            subscriptions=[
+                schemas.SubscriptionRefreshStatus(
+                    subscription_id="subscription", display_name="Subscription", last_error="RuntimeError()"
+                )
+            ],
+        )
+
+    monkeypatch.setattr(_app.state, "inventory_refresh_worker", _Worker(), raising=False)
+
+    response = await http_client.get("/inventory/refresh/status")
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    json = response.json()
+    assert_that(json).contains_entry({"enabled": True}, {"running": True})
+    assert_that(json["subscriptions"]).is_length(1)
+    assert_that(json["subscriptions"][0]).contains_entry(
+        {"subscription_id": "subscription"}, {"last_error": "RuntimeError()"}
+    )
@@ -0,0 +1,17 @@
+from http import HTTPStatus
+
+from assertpy import assert_that
+from httpx import AsyncClient
+
+
+async def test_get_metrics(http_client: AsyncClient):
+    await http_client.get("/subscriptions/")
+
+    response = await http_client.get("/metrics")
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    assert_that(response.headers["Content-Type"]).starts_with("text/plain")
+    assert_that(response.text).contains(
+        'http_request_duration_seconds_count{method="GET",route="/subscriptions/",status="200"}',
+        "# TYPE db_query_duration_seconds histogram",
+    )
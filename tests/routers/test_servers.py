@@ -0,0 +1,42 @@
+import uuid
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from assertpy import assert_that
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from azure_sql import models
+from azure_sql.containers import Container
+
+
+async def test_get_servers_filtered_by_subscription(session_provider, container: Container, http_client: AsyncClient):
+    subscription_id = uuid.UUID("0fdff486-1af4-412b-8933-7a5c7884729f")
+    async with session_provider() as session:
+        await session.execute(delete(models.Server))
+        session.add_all(
+            [
+                models.Server(
+                    subscription_id=server_subscription_id,
+                    resource_group_name="rg",
+                    name=name,
+                    fully_qualified_domain_name=f"{name}.database.windows.net",
+                    state="Ready",
+                    updated_at=datetime(2022, 1, 1, tzinfo=timezone.utc),
+                )
+                for server_subscription_id, name in [(subscription_id, "server-1"), (uuid.uuid4(), "server-2")]
+            ]
+        )
+
+        with container.session_provider.override(session_provider):
+            response = await http_client.get("/servers/", params={"subscription_id": str(subscription_id)})
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    assert_that([server["name"] for server in response.json()]).is_equal_to(["server-1"])
+
+
+async def test_get_refresh_status_when_worker_is_not_running(http_client: AsyncClient):
+    response = await http_client.get("/inventory/refresh/status")
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    assert_that(response.json()["enabled"]).is_false()
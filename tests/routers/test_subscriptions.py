@@ -3,7 +3,7 @@ from http import HTTPStatus
 
 from assertpy import assert_that
 from httpx import AsyncClient
-from sqlalchemy import delete
+from sqlalchemy import delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from azure_sql import models, schemas
@@ -51,3 +51,192 @@ async def test_get_subscriptions(session_provider, container: Container, http_cl
             enabled=db_subscription.enabled,
         )
     )
+
+
+async def test_get_subscriptions_as_ndjson(session_provider, container: Container, http_client: AsyncClient):
+    async with session_provider() as session:
+        await session.execute(delete(models.Subscription))
+        session.add_all(
+            [
+                models.Subscription(subscription_id=uuid.uuid4(), display_name=f"Subscription_{i}", enabled=True)
+                for i in range(3)
+            ]
+        )
+
+        with container.session_provider.override(session_provider):
+            response = await http_client.get("/subscriptions/", headers={"Accept": "application/x-ndjson"})
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    assert_that(response.headers["content-type"]).starts_with("application/x-ndjson")
+    subscriptions = [schemas.Subscription.parse_raw(line) for line in response.text.splitlines()]
+    assert_that(sorted(subscription.display_name for subscription in subscriptions)).is_equal_to(
+        ["Subscription_0", "Subscription_1", "Subscription_2"]
+    )
+
+
+async def test_get_subscriptions_as_ndjson_filtered_and_sorted(
+    session_provider, container: Container, http_client: AsyncClient
+):
+    async with session_provider() as session:
+        await session.execute(delete(models.Subscription))
+        session.add_all(
+            [
+                models.Subscription(subscription_id=uuid.uuid4(), display_name=display_name, enabled=enabled)
+                for display_name, enabled in [("c", True), ("a", True), ("d", False), ("b", True)]
+            ]
+        )
+
+        with container.session_provider.override(session_provider):
+            response = await http_client.get(
+                "/subscriptions/",
+                params={"enabled": "true", "sort": "display_name", "order": "desc"},
+                headers={"Accept": "application/x-ndjson"},
+            )
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    subscriptions = [schemas.Subscription.parse_raw(line) for line in response.text.splitlines()]
+    assert_that([subscription.display_name for subscription in subscriptions]).is_equal_to(["c", "b", "a"])
+
+
+async def test_get_subscriptions_as_ndjson_with_limit(http_client: AsyncClient):
+    response = await http_client.get(
+        "/subscriptions/", params={"limit": "2"}, headers={"Accept": "application/x-ndjson"}
+    )
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.BAD_REQUEST)
+
+
+async def test_get_subscriptions_paginated_by_display_name(
+    session_provider, container: Container, http_client: AsyncClient
+):
+    async with session_provider() as session:
+        await session.execute(delete(models.Subscription))
+        session.add_all(
+            [
+                models.Subscription(subscription_id=uuid.uuid4(), display_name=display_name, enabled=enabled)
+                for display_name, enabled in [("c", True), ("a", True), ("d", False), ("b", True)]
+            ]
+        )
+
+        with container.session_provider.override(session_provider):
+            params = {"enabled": "true", "sort": "display_name", "order": "desc", "limit": "2"}
+            first_page = await http_client.get("/subscriptions/", params=params)
+            second_page = await http_client.get(
+                "/subscriptions/", params={**params, "cursor": first_page.headers["X-Next-Cursor"]}
+            )
+
+    assert_that(first_page.status_code).is_equal_to(HTTPStatus.OK)
+    assert_that([subscription["display_name"] for subscription in first_page.json()]).is_equal_to(["c", "b"])
+    assert_that(second_page.status_code).is_equal_to(HTTPStatus.OK)
+    assert_that([subscription["display_name"] for subscription in second_page.json()]).is_equal_to(["a"])
+    assert_that("X-Next-Cursor" in second_page.headers).is_false()
+
+
+async def test_get_subscriptions_with_invalid_cursor(http_client: AsyncClient):
+    response = await http_client.get("/subscriptions/", params={"cursor": "invalid"})
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.BAD_REQUEST)
+
+
+async def test_get_subscriptions_not_modified(session_provider, container: Container, http_client: AsyncClient):
+    async with session_provider() as session:
+        await session.execute(delete(models.Subscription))
+
+        with container.session_provider.override(session_provider):
+            response = await http_client.get("/subscriptions/")
+            not_modified = await http_client.get("/subscriptions/", headers={"If-None-Match": response.headers["ETag"]})
+            session.add(models.Subscription(subscription_id=uuid.uuid4(), display_name="Subscription_1", enabled=True))
+            await session.flush()
+            modified = await http_client.get("/subscriptions/", headers={"If-None-Match": response.headers["ETag"]})
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+    assert_that(not_modified.status_code).is_equal_to(HTTPStatus.NOT_MODIFIED)
+    assert_that(not_modified.content).is_empty()
+    assert_that(modified.status_code).is_equal_to(HTTPStatus.OK)
+    assert_that(modified.headers["ETag"]).is_not_equal_to(response.headers["ETag"])
+    assert_that(modified.json()).is_length(1)
+
+
+async def test_get_subscriptions_not_modified_by_writes_that_change_nothing(
+    session_provider, container: Container, http_client: AsyncClient
+):
+    subscription_id = uuid.UUID("0fdff486-1af4-412b-8933-7a5c7884729f")
+    async with session_provider() as session:
+        await session.execute(delete(models.Subscription))
+        session.add(models.Subscription(subscription_id=subscription_id, display_name="Subscription_1", enabled=True))
+        await session.flush()
+
+        with container.session_provider.override(session_provider):
+            etag = (await http_client.get("/subscriptions/")).headers["ETag"]
+            await http_client.post(
+                "/subscriptions/import",
+                content=f"subscription_id,display_name,enabled\n{subscription_id},Subscription_1,true\n".encode(),
+                headers={"Content-Type": "text/csv"},
+            )
+            await session.execute(update(models.Subscription).values(enabled=models.Subscription.enabled))
+            not_modified = await http_client.get("/subscriptions/", headers={"If-None-Match": etag})
+            await session.execute(update(models.Subscription).values(enabled=False))
+            modified = await http_client.get("/subscriptions/", headers={"If-None-Match": etag})
+
+    assert_that(not_modified.status_code).is_equal_to(HTTPStatus.NOT_MODIFIED)
+    assert_that(modified.status_code).is_equal_to(HTTPStatus.OK)
+
+
+async def test_import_subscriptions(session_provider, container: Container, http_client: AsyncClient):
+    subscription_id = uuid.UUID("0fdff486-1af4-412b-8933-7a5c7884729f")
+    async with session_provider() as session:
+        await session.execute(delete(models.Subscription))
+        session.add(models.Subscription(subscription_id=subscription_id, display_name="Subscription_0", enabled=True))
+        await session.flush()
+        new_subscription_id = uuid.uuid4()
+        body = (
+            f"subscription_id,display_name,enabled\n"
+            f"{subscription_id},Subscription_1,true\n"
+            f"{new_subscription_id},Subscription_2,false\n"
+            f"{subscription_id},Subscription_3,false\n"
+        )
+
+        with container.session_provider.override(session_provider):
+            response = await http_client.post(
+                "/subscriptions/import", content=body.encode(), headers={"Content-Type": "text/csv"}
+            )
+
+        assert_that(response.status_code).is_equal_to(HTTPStatus.OK)
+        assert_that(response.json()).is_equal_to({"received": 3, "written": 2})
+        subscription = await session.get(models.Subscription, subscription_id, populate_existing=True)
+        assert_that(subscription.display_name).is_equal_to("Subscription_3")
+        assert_that(subscription.enabled).is_false()
+        assert_that(await session.get(models.Subscription, new_subscription_id)).is_not_none()
+
+
+async def test_import_subscriptions_rejects_missing_column(
+    session_provider, container: Container, http_client: AsyncClient
+):
+    subscription_id = uuid.UUID("0fdff486-1af4-412b-8933-7a5c7884729f")
+    async with session_provider() as session:
+        await session.execute(delete(models.Subscription))
+        session.add(models.Subscription(subscription_id=subscription_id, display_name="Subscription_0", enabled=True))
+        await session.flush()
+
+        # The error aborts the transaction of the request, it is rolled back to here to read the subscription
+        savepoint = await session.begin_nested()
+        with container.session_provider.override(session_provider):
+            response = await http_client.post(
+                "/subscriptions/import",
+                content=f"subscription_id,enabled\n{subscription_id},false\n".encode(),
+                headers={"Content-Type": "text/csv"},
+            )
+        await savepoint.rollback()
+
+        assert_that(response.status_code).is_equal_to(HTTPStatus.BAD_REQUEST)
+        assert_that(response.json()["detail"]).contains("display_name")
+        subscription = await session.get(models.Subscription, subscription_id, populate_existing=True)
+        assert_that(subscription.display_name).is_equal_to("Subscription_0")
+
+
+async def test_import_subscriptions_rejects_unsupported_media_type(http_client: AsyncClient):
+    response = await http_client.post(
+        "/subscriptions/import", content=b"[]", headers={"Content-Type": "application/json"}
+    )
+
+    assert_that(response.status_code).is_equal_to(HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
@@ -0,0 +1,38 @@
+import asyncio
+
+from assertpy import assert_that
+
+from benchmarks.harness import BenchmarkResult, compare_results, percentile, run_concurrently, save_results
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+
+    assert_that(percentile(values, 50)).is_equal_to(50)
+    assert_that(percentile(values, 99)).is_equal_to(99)
+    assert_that(percentile([], 99)).is_equal_to(0)
+
+
+async def test_run_concurrently_counts_errors():
+    async def operation(i: int) -> None:
+        await asyncio.sleep(0)
+        if i % 10 == 0:
+            raise RuntimeError()
+
+    result = await run_concurrently("operation", operation, 100, concurrency=8)
+
+    assert_that(result.operations).is_equal_to(100)
+    assert_that(result.errors).is_equal_to(10)
+    assert_that(result.parameters).is_equal_to({"concurrency": 8})
+
+
+def _result(throughput: float, p99_ms: float) -> BenchmarkResult:
+    return BenchmarkResult("operation", 100, 0, 1, throughput, 1, p99_ms, p99_ms, 100, {"concurrency": 8})
+
+
+def test_compare_results_reports_regressions_beyond_tolerance(tmp_path):
+    baseline_path = tmp_path / "baseline.json"
+    save_results(baseline_path, [_result(throughput=1000, p99_ms=10)])
+
+    assert_that(compare_results(baseline_path, [_result(throughput=950, p99_ms=10.5)], 0.1)).is_empty()
+    assert_that(compare_results(baseline_path, [_result(throughput=800, p99_ms=20)], 0.1)).is_length(2)
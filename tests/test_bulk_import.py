@@ -0,0 +1,59 @@
+import uuid
+
+import pytest
+from assertpy import assert_that
+
+from azure_sql.bulk_import import iterate_lines, parse_subscriptions
+
+SUBSCRIPTION_ID = uuid.UUID("0fdff486-1af4-412b-8933-7a5c7884729f")
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def test_iterate_lines_joins_lines_split_between_chunks():
+    lines = [line async for line in iterate_lines(_chunks(b"a\r\nb", b"c\n", b"d"))]
+
+    assert_that(lines).is_equal_to(["a", "bc", "d"])
+
+
+async def test_parse_ndjson_subscriptions():
+    body = f'{{"subscription_id": "{SUBSCRIPTION_ID}", "display_name": "Subscription_1", "enabled": true}}\n\n'
+
+    subscriptions = [
+        subscription async for subscription in parse_subscriptions("application/x-ndjson", _chunks(body.encode()))
+    ]
+
+    assert_that(subscriptions).is_equal_to([(SUBSCRIPTION_ID, "Subscription_1", True)])
+
+
+async def test_parse_csv_subscriptions():
+    body = f'enabled,subscription_id,display_name\nfalse,{SUBSCRIPTION_ID},"Subscription, 1"\n'
+
+    subscriptions = [subscription async for subscription in parse_subscriptions("text/csv", _chunks(body.encode()))]
+
+    assert_that(subscriptions).is_equal_to([(SUBSCRIPTION_ID, "Subscription, 1", False)])
+
+
+async def test_parse_subscriptions_reports_invalid_line():
+    body = f"subscription_id,display_name,enabled\n{SUBSCRIPTION_ID},,true\nnot-a-uuid,,true\n"
+
+    with pytest.raises(ValueError, match="line 3"):
+        [subscription async for subscription in parse_subscriptions("text/csv", _chunks(body.encode()))]
+
+
+async def test_parse_csv_subscriptions_rejects_missing_column():
+    body = f"subscription_id,enabled\n{SUBSCRIPTION_ID},true\n"
+
+    # A missing column would be written as null, the import is rejected
+    with pytest.raises(ValueError, match="display_name"):
+        [subscription async for subscription in parse_subscriptions("text/csv", _chunks(body.encode()))]
+
+
+async def test_parse_ndjson_subscriptions_rejects_missing_column():
+    body = f'{{"subscription_id": "{SUBSCRIPTION_ID}", "display_name": null}}\n'
+
+    with pytest.raises(ValueError, match="enabled at line 1"):
+        [subscription async for subscription in parse_subscriptions("application/x-ndjson", _chunks(body.encode()))]
@@ -0,0 +1,102 @@
+import asyncio
+
+from assertpy import assert_that
+
+from azure_sql.cache import AsyncTTLCache, CachePolicy
+
+
+class Loader:
+    def __init__(self, delay: float = 0) -> None:
+        self.calls = 0
+        self._delay = delay
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        await asyncio.sleep(self._delay)
+        return self.calls
+
+
+async def test_get_or_load_returns_cached_value_within_ttl():
+    cache = AsyncTTLCache()
+    loader = Loader()
+
+    first = await cache.get_or_load("key", loader, CachePolicy(ttl=60))
+    second = await cache.get_or_load("key", loader, CachePolicy(ttl=60))
+
+    assert_that(first).is_equal_to(1)
+    assert_that(second).is_equal_to(1)
+    assert_that(loader.calls).is_equal_to(1)
+
+
+async def test_get_or_load_coalesces_concurrent_loads():
+    cache = AsyncTTLCache()
+    loader = Loader(delay=0.01)
+
+    results = await asyncio.gather(*[cache.get_or_load("key", loader, CachePolicy(ttl=60)) for _ in range(10)])
+
+    assert_that(results).is_equal_to([1] * 10)
+    assert_that(loader.calls).is_equal_to(1)
+
+
+async def test_get_or_load_cancelling_the_first_caller_does_not_cancel_the_others():
+    cache = AsyncTTLCache()
+    loader = Loader(delay=0.01)
+    first = asyncio.create_task(cache.get_or_load("key", loader, CachePolicy(ttl=60)))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(cache.get_or_load("key", loader, CachePolicy(ttl=60)))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    results = await asyncio.gather(first, second, return_exceptions=True)
+
+    assert_that(results[0]).is_instance_of(asyncio.CancelledError)
+    assert_that(results[1]).is_equal_to(1)
+    assert_that(loader.calls).is_equal_to(1)
+    # The load was not cancelled with its caller, its value is cached
+    assert_that("key" in cache).is_true()
+
+
+async def test_get_or_load_serves_stale_value_while_revalidating():
+    cache = AsyncTTLCache()
+    loader = Loader()
+    policy = CachePolicy(ttl=0.01, stale_while_revalidate=60)
+    await cache.get_or_load("key", loader, policy)
+    await asyncio.sleep(0.02)
+
+    stale = await cache.get_or_load("key", loader, policy)
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    fresh = await cache.get_or_load("key", loader, policy)
+
+    assert_that(stale).is_equal_to(1)
+    assert_that(fresh).is_equal_to(2)
+    await cache.close()
+
+
+async def test_set_evicts_least_recently_used_entry():
+    cache = AsyncTTLCache(max_size=2)
+    policy = CachePolicy(ttl=60)
+    cache.set("a", 1, policy)
+    cache.set("b", 2, policy)
+    await cache.get_or_load("a", Loader(), policy)
+
+    cache.set("c", 3, policy)
+
+    assert_that("a" in cache).is_true()
+    assert_that("b" in cache).is_false()
+    assert_that("c" in cache).is_true()
+
+
+async def test_invalidate_where_discards_matching_and_in_flight_entries():
+    cache = AsyncTTLCache()
+    cache.set(("subscriptions", 1), 1, CachePolicy(ttl=60))
+    cache.set(("servers", 1), 1, CachePolicy(ttl=60))
+    load = asyncio.create_task(cache.get_or_load(("subscriptions", 2), Loader(delay=0.01), CachePolicy(ttl=60)))
+    await asyncio.sleep(0)
+
+    cache.invalidate_where(lambda key: isinstance(key, tuple) and key[0] == "subscriptions")
+    await load
+
+    assert_that(("subscriptions", 1) in cache).is_false()
+    assert_that(("subscriptions", 2) in cache).is_false()
+    assert_that(("servers", 1) in cache).is_true()
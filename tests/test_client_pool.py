@@ -0,0 +1,60 @@
+import asyncio
+
+from assertpy import assert_that
+
+from azure_sql.client_pool import ClientPool
+
+
+class FakeClient:
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.opened = False
+        self.closed = False
+
+    async def __aenter__(self) -> "FakeClient":
+        self.opened = True
+        return self
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+async def test_acquire_reuses_client_per_key():
+    pool: ClientPool[str, FakeClient] = ClientPool(FakeClient)
+
+    async with pool.acquire("a") as first:
+        pass
+    async with pool.acquire("a") as second:
+        pass
+    async with pool.acquire("b") as other:
+        pass
+
+    assert_that(first).is_same_as(second)
+    assert_that(first).is_not_same_as(other)
+    assert_that(first.opened).is_true()
+    assert_that(len(pool)).is_equal_to(2)
+
+
+async def test_acquire_evicts_idle_clients_not_in_use():
+    pool: ClientPool[str, FakeClient] = ClientPool(FakeClient, idle_timeout=0.01)
+
+    async with pool.acquire("idle") as idle:
+        pass
+    async with pool.acquire("busy") as busy:
+        await asyncio.sleep(0.02)
+        async with pool.acquire("other"):
+            pass
+
+        assert_that(idle.closed).is_true()
+        assert_that(busy.closed).is_false()
+
+
+async def test_close_closes_all_clients():
+    pool: ClientPool[str, FakeClient] = ClientPool(FakeClient)
+    async with pool.acquire("a") as client:
+        pass
+
+    await pool.close()
+
+    assert_that(client.closed).is_true()
+    assert_that(len(pool)).is_equal_to(0)
@@ -0,0 +1,60 @@
+import gzip
+
+from assertpy import assert_that
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from azure_sql.compression import CompressionMiddleware
+
+
+async def _large(request: Request) -> PlainTextResponse:
+    return PlainTextResponse("x" * 2048)
+
+
+async def _small(request: Request) -> PlainTextResponse:
+    return PlainTextResponse("x")
+
+
+async def _stream(request: Request) -> StreamingResponse:
+    async def lines():
+        for i in range(3):
+            yield f"{i}\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _create_client() -> AsyncClient:
+    app = Starlette(routes=[Route("/large", _large), Route("/small", _small), Route("/stream", _stream)])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return AsyncClient(app=app, base_url="http://test")
+
+
+async def test_compresses_negotiated_responses_above_minimum_size():
+    async with _create_client() as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert_that(response.headers["Content-Encoding"]).is_equal_to("gzip")
+    assert_that(response.headers["Vary"]).is_equal_to("Accept-Encoding")
+    assert_that(response.text).is_equal_to("x" * 2048)
+
+
+async def test_does_not_compress_small_or_not_negotiated_responses():
+    async with _create_client() as client:
+        small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        refused = await client.get("/large", headers={"Accept-Encoding": "gzip;q=0"})
+
+    assert_that(small.headers).does_not_contain_key("Content-Encoding")
+    assert_that(refused.headers).does_not_contain_key("Content-Encoding")
+    assert_that(refused.text).is_equal_to("x" * 2048)
+
+
+async def test_compresses_streaming_responses():
+    async with _create_client() as client:
+        async with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    assert_that(response.headers["Content-Encoding"]).is_equal_to("gzip")
+    assert_that(gzip.decompress(body)).is_equal_to(b"0\n1\n2\n")
@@ -0,0 +1,126 @@
+import asyncio
+from typing import AsyncIterator
+
+from assertpy import assert_that
+
+from azure_sql.concurrency import ConcurrencyBudget, SingleFlight, gather_or_cancel, map_concurrently
+
+
+async def _numbers(count: int) -> AsyncIterator[int]:
+    for number in range(count):
+        yield number
+
+
+async def test_map_concurrently_keeps_source_order():
+    async def slow_double(number: int) -> int:
+        await asyncio.sleep(0.01 * (5 - number))
+        return number * 2
+
+    results = [result async for result in map_concurrently(slow_double, _numbers(5), max_concurrency=5)]
+
+    assert_that(results).is_equal_to([0, 2, 4, 6, 8])
+
+
+async def test_map_concurrently_yields_in_completion_order():
+    # Calls complete in reverse order, each one only after the previous result was received,
+    # so two calls never complete together.
+    turns = {number: asyncio.Event() for number in range(5)}
+
+    async def identity_in_turn(number: int) -> int:
+        await turns[number].wait()
+        return number
+
+    async def collect() -> list[int]:
+        results = []
+        async for result in map_concurrently(identity_in_turn, _numbers(5), max_concurrency=5, ordered=False):
+            results.append(result)
+            if result > 0:
+                turns[result - 1].set()
+        return results
+
+    turns[4].set()
+    # Yielding in source order would wait for the first call forever
+    results = await asyncio.wait_for(collect(), timeout=1)
+
+    assert_that(results).is_equal_to([4, 3, 2, 1, 0])
+
+
+async def test_map_concurrently_bounds_in_flight_calls():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def track(number: int) -> int:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return number
+
+    results = [result async for result in map_concurrently(track, _numbers(20), max_concurrency=3)]
+
+    assert_that(results).is_length(20)
+    assert_that(max_in_flight).is_equal_to(3)
+
+
+async def test_concurrency_budget_limits_globally_and_per_key():
+    budget = ConcurrencyBudget(max_concurrency=3, max_concurrency_per_key=2)
+    in_flight: dict[str, int] = {"a": 0, "b": 0}
+    max_in_flight: dict[str, int] = {"a": 0, "b": 0, "total": 0}
+
+    async def call(key: str) -> None:
+        async with budget.acquire(key):
+            in_flight[key] += 1
+            max_in_flight[key] = max(max_in_flight[key], in_flight[key])
+            max_in_flight["total"] = max(max_in_flight["total"], sum(in_flight.values()))
+            await asyncio.sleep(0.001)
+            in_flight[key] -= 1
+
+    await asyncio.gather(*[call(key) for key in ["a", "b"] * 10])
+
+    assert_that(max_in_flight).is_equal_to({"a": 2, "b": 2, "total": 3})
+
+
+async def test_gather_or_cancel_cancels_pending_awaitables_on_failure():
+    cancelled = False
+
+    async def fail() -> None:
+        raise ValueError()
+
+    async def wait_forever() -> None:
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    try:
+        await gather_or_cancel(wait_forever(), fail())
+    except ValueError:
+        pass
+
+    assert_that(cancelled).is_true()
+
+
+async def test_single_flight_shares_a_call_and_survives_cancelled_callers():
+    single_flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def call() -> int:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return calls
+
+    callers = [asyncio.create_task(single_flight.run("key", call)) for _ in range(3)]
+    await asyncio.sleep(0)
+    callers[0].cancel()
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*callers, return_exceptions=True)
+
+    assert_that(results[0]).is_instance_of(asyncio.CancelledError)
+    assert_that(results[1:]).is_equal_to([1, 1])
+    assert_that("key" in single_flight).is_false()
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from pathlib import Path
+
+from assertpy import assert_that
+from azure.core.credentials import AccessToken
+from azure.core.credentials_async import AsyncTokenCredential
+from cryptography.fernet import Fernet
+
+from azure_sql.credentials import ARM_SCOPE, CachedTokenCredential, TokenFileCache
+
+
+class _CountingCredential(AsyncTokenCredential):
+    def __init__(self, lifetime: float = 3600, delay: float = 0) -> None:
+        self.lifetime = lifetime
+        self.delay = delay
+        self.calls = 0
+        self.closed = False
+
+    async def get_token(self, *scopes: str, **kwargs) -> AccessToken:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return AccessToken(f"token-{self.calls}", int(time.time() + self.lifetime))
+
+    async def close(self) -> None:
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+async def test_get_token_is_cached_and_concurrent_requests_share_a_call():
+    inner = _CountingCredential(delay=0.01)
+    credential = CachedTokenCredential(inner)
+
+    tokens = await asyncio.gather(*[credential.get_token(ARM_SCOPE) for _ in range(10)])
+    token = await credential.get_token(ARM_SCOPE)
+
+    assert_that(inner.calls).is_equal_to(1)
+    assert_that({token.token for token in tokens}).is_equal_to({"token-1"})
+    assert_that(token.token).is_equal_to("token-1")
+    await credential.close()
+    assert_that(inner.closed).is_true()
+
+
+async def test_get_token_renews_tokens_about_to_expire():
+    inner = _CountingCredential(lifetime=60)
+    credential = CachedTokenCredential(inner, refresh_before=300)
+
+    await credential.get_token(ARM_SCOPE)
+    token = await credential.get_token(ARM_SCOPE)
+
+    assert_that(inner.calls).is_equal_to(2)
+    assert_that(token.token).is_equal_to("token-2")
+
+
+async def test_get_token_with_claims_is_not_cached():
+    inner = _CountingCredential()
+    credential = CachedTokenCredential(inner)
+
+    await credential.get_token(ARM_SCOPE)
+    await credential.get_token(ARM_SCOPE, claims='{"access_token": {}}')
+
+    assert_that(inner.calls).is_equal_to(2)
+
+
+async def test_warm_requests_the_token_in_background():
+    inner = _CountingCredential()
+    credential = CachedTokenCredential(inner)
+
+    credential.warm(ARM_SCOPE)
+    await asyncio.sleep(0.01)
+    calls = inner.calls
+    await credential.get_token(ARM_SCOPE)
+    await credential.close()
+
+    assert_that(calls).is_equal_to(1)
+    assert_that(inner.calls).is_equal_to(1)
+
+
+async def test_warm_renews_the_token_before_it_expires():
+    # Tokens are renewed 3599 seconds before they expire, less than a second after they are requested
+    inner = _CountingCredential(lifetime=3600)
+    credential = CachedTokenCredential(inner, refresh_before=3599, retry_interval=0.05)
+
+    credential.warm(ARM_SCOPE)
+    await asyncio.sleep(1.5)
+    await credential.close()
+
+    assert_that(inner.calls).is_greater_than(1)
+
+
+async def test_get_token_cancelling_the_first_caller_does_not_cancel_the_refresher():
+    inner = _CountingCredential(delay=0.05)
+    credential = CachedTokenCredential(inner)
+    first = asyncio.create_task(credential.get_token(ARM_SCOPE))
+    await asyncio.sleep(0)
+    credential.warm(ARM_SCOPE)
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0.1)
+    token = await credential.get_token(ARM_SCOPE)
+
+    assert_that(first.cancelled()).is_true()
+    assert_that(inner.calls).is_equal_to(1)
+    assert_that(token.token).is_equal_to("token-1")
+    assert_that(credential._refreshers).is_not_empty()
+    await credential.close()
+    assert_that(credential._refreshers).is_empty()
+
+
+async def test_warm_retries_when_the_token_request_is_cancelled():
+    class CancelledCredential(_CountingCredential):
+        async def get_token(self, *scopes: str, **kwargs) -> AccessToken:
+            token = await super().get_token(*scopes, **kwargs)
+            if self.calls == 1:
+                # E.g. a timeout of the credential, not a cancellation of the refresher
+                raise asyncio.CancelledError()
+            return token
+
+    inner = CancelledCredential()
+    credential = CachedTokenCredential(inner, retry_interval=0.01)
+
+    credential.warm(ARM_SCOPE)
+    await asyncio.sleep(0.1)
+    refreshers = list(credential._refreshers.values())
+    await credential.close()
+
+    assert_that(inner.calls).is_equal_to(2)
+    assert_that(refreshers).is_length(1)
+    assert_that(refreshers[0].cancelled()).is_true()
+
+
+async def test_token_file_cache_is_shared_between_credentials(tmp_path: Path):
+    key = Fernet.generate_key()
+    path = tmp_path / "tokens"
+    inner = _CountingCredential()
+
+    first_token = await CachedTokenCredential(inner, token_cache=TokenFileCache(path, key)).get_token(ARM_SCOPE)
+    token = await CachedTokenCredential(_CountingCredential(), token_cache=TokenFileCache(path, key)).get_token(
+        ARM_SCOPE
+    )
+
+    assert_that(token).is_equal_to(first_token)
+    assert_that(path.read_bytes()).does_not_contain(first_token.token.encode())
+
+
+async def test_token_file_cache_written_with_another_key_is_ignored(tmp_path: Path):
+    path = tmp_path / "tokens"
+    await TokenFileCache(path, Fernet.generate_key()).set((None, (ARM_SCOPE,)), AccessToken("token", 2**31 - 1))
+
+    assert_that(await TokenFileCache(path, Fernet.generate_key()).get((None, (ARM_SCOPE,)))).is_none()
@@ -0,0 +1,15 @@
+import uuid
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from azure_sql import models
+from azure_sql.database import read_session_provider
+
+
+async def test_read_session_cannot_be_flushed():
+    async with read_session_provider() as session:
+        session.add(models.Subscription(subscription_id=uuid.uuid4(), display_name="Subscription_1", enabled=True))
+
+        with pytest.raises(InvalidRequestError):
+            await session.flush()
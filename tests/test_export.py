@@ -0,0 +1,64 @@
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from assertpy import assert_that
+
+from azure_sql import models
+from azure_sql.azure_sql_manager import AzureSqlManager
+from azure_sql.export import ParquetExporter, ParquetTableWriter
+from azure_sql.fake_arm import FakeArmInventory, FakeArmServer
+
+pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+
+
+def test_writer_writes_a_row_group_every_row_group_size_rows(tmp_path: Path):
+    path = tmp_path / "Servers.parquet"
+    updated_at = datetime(2022, 11, 1, tzinfo=timezone.utc)
+    rows = [(uuid.UUID(int=i), "rg", f"server-{i}", None, "Ready", updated_at) for i in range(5)]
+
+    with ParquetTableWriter(path, models.Server.__table__, row_group_size=2) as writer:
+        writer.write(rows)
+
+    parquet_file = pyarrow_parquet.ParquetFile(path)
+    assert_that(writer.rows_written).is_equal_to(5)
+    assert_that(parquet_file.metadata.num_row_groups).is_equal_to(3)
+    table = parquet_file.read()
+    assert_that(table.column("subscription_id").to_pylist()).is_equal_to([str(row[0]) for row in rows])
+    assert_that(table.column("updated_at").to_pylist()).is_equal_to([updated_at] * 5)
+
+
+def test_writer_writes_mappings_in_the_order_of_the_columns(tmp_path: Path):
+    path = tmp_path / "Subscriptions.parquet"
+    subscription_id = uuid.uuid4()
+
+    with ParquetTableWriter(path, models.Subscription.__table__) as writer:
+        writer.write_mappings([{"enabled": True, "subscription_id": subscription_id}])
+
+    assert_that(pyarrow_parquet.read_table(path).to_pylist()).is_equal_to(
+        [{"subscription_id": str(subscription_id), "display_name": None, "enabled": True}]
+    )
+
+
+async def test_export_sweep(tmp_path: Path):
+    inventory = FakeArmInventory.generate(subscriptions=2, servers_per_subscription=2, databases_per_server=5)
+
+    async with FakeArmServer(inventory) as fake_arm_server:
+        async with AzureSqlManager(**fake_arm_server.manager_kwargs()) as azure_sql_manager:
+            rows_written = await ParquetExporter(row_group_size=4).export_sweep(
+                azure_sql_manager.sweep(max_concurrency=4), tmp_path, batch_size=3
+            )
+
+    assert_that(rows_written).is_equal_to(
+        {
+            "Subscriptions": 2,
+            "Servers": 4,
+            "ElasticPools": 4,
+            "Databases": 20,
+            "DatabaseUsageSamples": 20,
+        }
+    )
+    databases = pyarrow_parquet.read_table(tmp_path / "Databases.parquet")
+    assert_that(databases.column_names).is_equal_to([column.name for column in models.Database.__table__.columns])
+    assert_that(pyarrow_parquet.ParquetFile(tmp_path / "Databases.parquet").metadata.num_row_groups).is_equal_to(5)
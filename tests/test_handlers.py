@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from typing import Type
+
+from assertpy import assert_that
+from mediatpy import PipelineBehavior, RequestHandler
+
+from azure_sql import database
+from azure_sql.handlers import (
+    CachedQuery,
+    CachedQueryPipelineBehavior,
+    Command,
+    CommandPipelineBehavior,
+    Query,
+    QueryPipelineBehavior,
+    _Mediator,
+)
+from azure_sql.query_cache import QueryCache
+
+
+@dataclass
+class _Query(Query[object]):
+    name: str
+
+
+@dataclass
+class _Command(Command[object]):
+    invalidates = ("names",)
+
+    name: str
+
+
+@dataclass
+class _CachedQuery(CachedQuery[str]):
+    cache_namespace = "names"
+
+    name: str
+
+
+@dataclass
+class _OtherCachedQuery(CachedQuery[str]):
+    cache_namespace = "names"
+
+    name: str
+
+
+def _cached_query_mediator(query_cache: QueryCache) -> _Mediator:
+    async def pipeline_behavior_factory(pipeline_behavior: Type[PipelineBehavior]) -> PipelineBehavior:
+        return pipeline_behavior(query_cache=query_cache)  # type: ignore[call-arg]
+
+    mediator = _Mediator(pipeline_behavior_factory=pipeline_behavior_factory)
+    mediator.register_pipeline_behavior(CachedQueryPipelineBehavior)
+    mediator.register_pipeline_behavior(CommandPipelineBehavior)
+    return mediator
+
+
+async def test_query_requests_are_routed_to_read_session(monkeypatch):
+    monkeypatch.setattr(database, "session_provider", lambda: "primary")
+    monkeypatch.setattr(database, "read_session_provider", lambda: "read")
+    mediator = _Mediator()
+    mediator.register_pipeline_behavior(QueryPipelineBehavior)
+
+    class QueryHandler(RequestHandler[_Query, object]):
+        async def handle(self, request: _Query) -> object:
+            return database.routed_session_provider()
+
+    class CommandHandler(RequestHandler[_Command, object]):
+        async def handle(self, request: _Command) -> object:
+            return database.routed_session_provider()
+
+    mediator.register_request_handler(QueryHandler)
+    mediator.register_request_handler(CommandHandler)
+
+    # Requests are not hashable dataclasses
+    assert_that(await mediator.send(_Query("query"))).is_equal_to("read")
+    assert_that(await mediator.send(_Command("command"))).is_equal_to("primary")
+    assert_that(database.routed_session_provider()).is_equal_to("primary")
+
+
+async def test_cached_queries_are_invalidated_by_commands():
+    mediator = _cached_query_mediator(QueryCache())
+    calls: list[str] = []
+
+    class CachedQueryHandler(RequestHandler[_CachedQuery, str]):
+        async def handle(self, request: _CachedQuery) -> str:
+            calls.append(request.name)
+            return request.name
+
+    class CommandHandler(RequestHandler[_Command, str]):
+        async def handle(self, request: _Command) -> str:
+            return request.name
+
+    mediator.register_request_handler(CachedQueryHandler)
+    mediator.register_request_handler(CommandHandler)
+
+    await mediator.send(_CachedQuery("a"))
+    await mediator.send(_CachedQuery("a"))
+    await mediator.send(_CachedQuery("b"))
+    await mediator.send(_Command("command"))
+    await mediator.send(_CachedQuery("a"))
+
+    assert_that(calls).is_equal_to(["a", "b", "a"])
+
+
+async def test_cached_queries_of_different_types_do_not_share_results():
+    mediator = _cached_query_mediator(QueryCache())
+
+    class CachedQueryHandler(RequestHandler[_CachedQuery, str]):
+        async def handle(self, request: _CachedQuery) -> str:
+            return f"query {request.name}"
+
+    class OtherCachedQueryHandler(RequestHandler[_OtherCachedQuery, str]):
+        async def handle(self, request: _OtherCachedQuery) -> str:
+            return f"other query {request.name}"
+
+    mediator.register_request_handler(CachedQueryHandler)
+    mediator.register_request_handler(OtherCachedQueryHandler)
+
+    # Same namespace and same fields
+    assert_that(await mediator.send(_CachedQuery("a"))).is_equal_to("query a")
+    assert_that(await mediator.send(_OtherCachedQuery("a"))).is_equal_to("other query a")
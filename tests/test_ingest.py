@@ -0,0 +1,99 @@
+import contextlib
+import uuid
+from typing import AsyncIterator
+
+import pytest
+from assertpy import assert_that
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from azure_sql import models
+from azure_sql.azure_sql_manager import (
+    AzureSqlDatabase,
+    AzureSqlDatabaseUsage,
+    AzureSqlElasticPool,
+    AzureSqlInventoryRecord,
+    AzureSqlServer,
+    AzureSubscription,
+)
+from azure_sql.ingest import InventoryIngestor
+from azure_sql.query_cache import QueryCache
+
+SUBSCRIPTION_ID = "0fdff486-1af4-412b-8933-7a5c7884729f"
+
+
+@pytest.fixture
+async def session_provider(session: AsyncSession, monkeypatch):
+    # The ingestor commits every batch, commits only flush here so the session fixture rolls everything back.
+    monkeypatch.setattr(session, "commit", session.flush)
+    for model in (models.DatabaseUsageSample, models.Database, models.ElasticPool, models.Server):
+        await session.execute(delete(model))
+
+    @contextlib.asynccontextmanager
+    async def session_provider():
+        yield session
+
+    yield session_provider
+
+
+async def _records(
+    databases: dict[str, str], subscription_id: str = SUBSCRIPTION_ID
+) -> AsyncIterator[AzureSqlInventoryRecord]:
+    # databases maps their names to their status
+    usage = AzureSqlDatabaseUsage(100, 200)
+    yield AzureSqlInventoryRecord(subscription_id, AzureSubscription(subscription_id, "Subscription_1", True))
+    yield AzureSqlInventoryRecord(
+        subscription_id, AzureSqlServer("rg", "server", "server.database.windows.net", "Ready")
+    )
+    yield AzureSqlInventoryRecord(subscription_id, AzureSqlElasticPool("rg", "pool", "server", 1000, usage))
+    for name, status in databases.items():
+        yield AzureSqlInventoryRecord(
+            subscription_id, AzureSqlDatabase("rg", "server", name, status, "S0", 1000, usage)
+        )
+
+
+async def _count(session: AsyncSession, model) -> int:
+    return (await session.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+async def test_ingest_upserts_records_in_batches(session_provider, session: AsyncSession):
+    ingestor = InventoryIngestor(batch_size=2, session_provider=session_provider, query_cache=QueryCache())
+
+    result = await ingestor.ingest(_records({"db1": "Online", "db2": "Online", "db3": "Online"}))
+
+    assert_that(result.subscriptions).is_equal_to(1)
+    assert_that(result.servers).is_equal_to(1)
+    assert_that(result.elastic_pools).is_equal_to(1)
+    assert_that(result.databases).is_equal_to(3)
+    assert_that(result.usage_samples).is_equal_to(3)
+    assert_that(await _count(session, models.Database)).is_equal_to(3)
+
+
+async def test_ingest_counts_only_the_rows_that_changed(session_provider, session: AsyncSession):
+    ingestor = InventoryIngestor(session_provider=session_provider, query_cache=QueryCache())
+
+    await ingestor.ingest(_records({"db1": "Online", "db2": "Online"}))
+    result = await ingestor.ingest(_records({"db1": "Online", "db2": "Paused"}))
+
+    assert_that(result.subscriptions).is_zero()
+    assert_that(result.servers).is_zero()
+    assert_that(result.databases).is_equal_to(1)
+    # Usage samples are appended, one per database and ingest
+    assert_that(result.usage_samples).is_equal_to(2)
+    assert_that(await _count(session, models.DatabaseUsageSample)).is_equal_to(4)
+
+
+async def test_ingest_with_prune_deletes_resources_not_seen(session_provider, session: AsyncSession):
+    other_subscription_id = str(uuid.uuid4())
+    ingestor = InventoryIngestor(prune_batch_size=1, session_provider=session_provider, query_cache=QueryCache())
+
+    await ingestor.ingest(_records({"db1": "Online", "db2": "Online", "db3": "Online"}))
+    await ingestor.ingest(_records({"db1": "Online"}, other_subscription_id))
+    result = await ingestor.ingest(_records({"db1": "Online"}), prune=True)
+
+    databases = (await session.execute(select(models.Database.subscription_id, models.Database.name))).all()
+    assert_that(result.pruned).is_equal_to(2)
+    # Resources of the subscriptions that were not ingested are kept
+    assert_that(sorted((str(subscription_id), name) for subscription_id, name in databases)).is_equal_to(
+        sorted([(SUBSCRIPTION_ID, "db1"), (other_subscription_id, "db1")])
+    )
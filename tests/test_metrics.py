@@ -0,0 +1,51 @@
+from assertpy import assert_that
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from azure_sql import metrics
+from azure_sql.metrics import MetricsMiddleware, MetricsRegistry
+
+
+def test_render_histogram_and_counter():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("duration_seconds", "Duration.", ("route",), buckets=(0.1, 1))
+    counter = registry.counter("calls_total", "Calls.")
+
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    counter.inc()
+
+    assert_that(registry.render()).is_equal_to(
+        "# HELP duration_seconds Duration.\n"
+        "# TYPE duration_seconds histogram\n"
+        'duration_seconds_bucket{route="/a",le="0.1"} 1\n'
+        'duration_seconds_bucket{route="/a",le="1.0"} 2\n'
+        'duration_seconds_bucket{route="/a",le="+Inf"} 3\n'
+        'duration_seconds_sum{route="/a"} 5.55\n'
+        'duration_seconds_count{route="/a"} 3\n'
+        "# HELP calls_total Calls.\n"
+        "# TYPE calls_total counter\n"
+        "calls_total 1.0\n"
+    )
+
+
+async def _get_item(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(request.path_params["item_id"])
+
+
+async def test_middleware_records_latency_by_route_template():
+    app = Starlette(routes=[Route("/items/{item_id}", _get_item)])
+    app.add_middleware(MetricsMiddleware)
+    count = metrics.http_request_duration.get_count("GET", "/items/{item_id}", "200")
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/items/1")
+        await client.get("/items/2")
+        await client.get("/unknown")
+
+    assert_that(metrics.http_request_duration.get_count("GET", "/items/{item_id}", "200")).is_equal_to(count + 2)
+    assert_that(metrics.http_request_duration.get_count("GET", "unmatched", "404")).is_greater_than_or_equal_to(1)
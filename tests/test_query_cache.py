@@ -0,0 +1,52 @@
+import uuid
+from datetime import datetime, timezone
+
+from assertpy import assert_that
+
+from azure_sql import schemas
+from azure_sql.cache import CachePolicy
+from azure_sql.query_cache import InMemoryCacheBackend, QueryCache
+
+
+class Loader:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def __call__(self) -> list[schemas.Server]:
+        self.calls += 1
+        return [
+            schemas.Server(
+                subscription_id=uuid.UUID("0fdff486-1af4-412b-8933-7a5c7884729f"),
+                resource_group_name="rg",
+                name="server",
+                fully_qualified_domain_name="server.database.windows.net",
+                state="Ready",
+                updated_at=datetime(2022, 1, 1, tzinfo=timezone.utc),
+            )
+        ]
+
+
+async def test_get_or_load_reads_from_shared_backend():
+    backend = InMemoryCacheBackend()
+    loader = Loader()
+    key = ("Servers", None)
+
+    first = await QueryCache(backend=backend).get_or_load(key, loader, CachePolicy(ttl=60), list[schemas.Server])
+    # Another process, its in process cache is empty
+    second = await QueryCache(backend=backend).get_or_load(key, loader, CachePolicy(ttl=60), list[schemas.Server])
+
+    assert_that(second).is_equal_to(first)
+    assert_that(loader.calls).is_equal_to(1)
+
+
+async def test_invalidate_removes_namespace():
+    backend = InMemoryCacheBackend()
+    query_cache = QueryCache(backend=backend)
+    loader = Loader()
+    key = ("Servers", None)
+    await query_cache.get_or_load(key, loader, CachePolicy(ttl=60), list[schemas.Server])
+
+    await query_cache.invalidate("Servers")
+    await query_cache.get_or_load(key, loader, CachePolicy(ttl=60), list[schemas.Server])
+
+    assert_that(loader.calls).is_equal_to(2)
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Collection, cast
+
+from assertpy import assert_that
+
+from azure_sql import refresh
+from azure_sql.azure_sql_manager import AzureSqlInventoryRecord, AzureSubscription, SweepState
+from azure_sql.concurrency import ConcurrencyBudget
+from azure_sql.ingest import IngestResult
+from azure_sql.refresh import InventoryRefreshSettings, InventoryRefreshWorker
+
+SUBSCRIPTIONS = [AzureSubscription(f"subscription-{index}", f"Subscription {index}", True) for index in range(3)]
+
+
+class _FakeAzureSqlManager:
+    def __init__(self) -> None:
+        self.budgets: list[ConcurrencyBudget | None] = []
+        self.closed = False
+
+    async def get_subscriptions(self) -> AsyncIterator[AzureSubscription]:
+        for subscription in SUBSCRIPTIONS:
+            yield subscription
+
+    async def sweep(
+        self,
+        max_concurrency: int = 32,
+        max_concurrency_per_subscription: int = 8,
+        subscription_ids: Collection[str] | None = None,
+        state: SweepState | None = None,
+        budget: ConcurrencyBudget | None = None,
+    ) -> AsyncIterator[AzureSqlInventoryRecord]:
+        self.budgets.append(budget)
+        for subscription in SUBSCRIPTIONS:
+            if subscription_ids is None or subscription.subscription_id in subscription_ids:
+                yield AzureSqlInventoryRecord(subscription.subscription_id, subscription)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class _FakeIngestor:
+    def __init__(self, failing: Collection[str] = ()) -> None:
+        self.failing = failing
+
+    async def ingest(self, records: AsyncIterator[AzureSqlInventoryRecord], prune: bool = False) -> IngestResult:
+        subscriptions = [record async for record in records]
+        if any(record.subscription_id in self.failing for record in subscriptions):
+            raise RuntimeError("ingest failed")
+        return IngestResult(started_at=datetime.now(timezone.utc), subscriptions=len(subscriptions))
+
+
+class _FakeUsageHistory:
+    async def ensure_partitions(self, now: datetime) -> None:
+        pass
+
+    async def rollup(self, now: datetime) -> None:
+        pass
+
+    async def apply_retention(self, now: datetime) -> None:
+        pass
+
+
+def _worker(
+    settings: InventoryRefreshSettings | None = None, ingestor: _FakeIngestor | None = None
+) -> tuple[InventoryRefreshWorker, _FakeAzureSqlManager]:
+    azure_sql_manager = _FakeAzureSqlManager()
+    worker = InventoryRefreshWorker(
+        settings or InventoryRefreshSettings(enabled=True, subscription_stagger=0, jitter=0),
+        lambda: cast(Any, azure_sql_manager),
+        cast(Any, ingestor or _FakeIngestor()),
+        cast(Any, _FakeUsageHistory()),
+    )
+    # refresh() is called directly, start() sets the manager and runs the cycles in background
+    worker._azure_sql_manager = cast(Any, azure_sql_manager)
+    return worker, azure_sql_manager
+
+
+async def test_refresh_staggers_the_subscriptions(monkeypatch):
+    delays: list[float] = []
+    sleep = asyncio.sleep
+
+    async def record_sleep(delay: float) -> None:
+        delays.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(refresh.asyncio, "sleep", record_sleep)
+    monkeypatch.setattr(refresh.random, "uniform", lambda a, b: b)
+    worker, azure_sql_manager = _worker(InventoryRefreshSettings(enabled=True, subscription_stagger=5, jitter=2))
+    await worker.refresh()
+
+    assert_that(delays).is_equal_to([2.0, 7.0, 12.0])
+    # Every subscription of the cycle shares the same budget
+    assert_that(azure_sql_manager.budgets).is_length(3)
+    assert_that(set(map(id, azure_sql_manager.budgets))).is_length(1)
+
+
+async def test_refresh_isolates_the_failure_of_a_subscription():
+    worker, _ = _worker(ingestor=_FakeIngestor(failing={"subscription-1"}))
+
+    await worker.refresh()
+
+    statuses = {status.subscription_id: status for status in worker.status.subscriptions}
+    assert_that(statuses["subscription-1"].last_error).contains("ingest failed")
+    assert_that(statuses["subscription-1"].last_succeeded_at).is_none()
+    for subscription_id in ("subscription-0", "subscription-2"):
+        assert_that(statuses[subscription_id].last_error).is_none()
+        assert_that(statuses[subscription_id].last_succeeded_at).is_not_none()
+        assert_that(statuses[subscription_id].rows_written).is_equal_to(1)
+
+
+async def test_refresh_clears_the_error_of_a_subscription_once_it_succeeds():
+    ingestor = _FakeIngestor(failing={"subscription-1"})
+    worker, _ = _worker(ingestor=ingestor)
+    await worker.refresh()
+
+    ingestor.failing = ()
+    await worker.refresh()
+
+    statuses = {status.subscription_id: status for status in worker.status.subscriptions}
+    assert_that(statuses["subscription-1"].last_error).is_none()
+    assert_that(statuses["subscription-1"].last_succeeded_at).is_not_none()
+
+
+async def test_stop_cancels_the_cycle_and_closes_the_manager():
+    worker, azure_sql_manager = _worker(InventoryRefreshSettings(enabled=True, interval=3600, jitter=0))
+    worker.start()
+    # The first cycle runs immediately, then the worker waits for the next one
+    while worker.status.last_cycle_finished_at is None:
+        await asyncio.sleep(0)
+    assert_that(worker.status.running).is_true()
+    assert_that(worker.status.next_cycle_at).is_not_none()
+
+    await worker.stop()
+
+    assert_that(worker.status.running).is_false()
+    assert_that(azure_sql_manager.closed).is_true()
+    assert_that(worker.status.subscriptions).is_length(3)
@@ -0,0 +1,63 @@
+import uuid
+from types import SimpleNamespace
+
+from assertpy import assert_that
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from azure_sql import models, schemas
+from azure_sql.responses import ModelJSONResponse, make_etag, matches_etag, to_ndjson
+
+
+def test_matches_etag():
+    etag = make_etag("Subscriptions", 1)
+
+    assert_that(etag).is_equal_to('W/"Subscriptions-1"')
+    assert_that(matches_etag(None, etag)).is_false()
+    assert_that(matches_etag('W/"Subscriptions-0"', etag)).is_false()
+    assert_that(matches_etag('W/"Subscriptions-0", "Subscriptions-1"', etag)).is_true()
+    assert_that(matches_etag("*", etag)).is_true()
+
+
+def test_model_json_response_renders_models_built_from_rows():
+    row = SimpleNamespace(
+        subscription_id=uuid.UUID("0fdff486-1af4-412b-8933-7a5c7884729f"), display_name="Subscription_1", enabled=True
+    )
+
+    response = ModelJSONResponse([schemas.Subscription.from_row(row)])
+
+    assert_that(response.body).is_equal_to(
+        b'[{"subscription_id":"0fdff486-1af4-412b-8933-7a5c7884729f","display_name":"Subscription_1","enabled":true}]'
+    )
+
+
+async def test_model_json_response_renders_rows_read_from_the_database(session: AsyncSession):
+    subscription_id = uuid.uuid4()
+    session.add(models.Subscription(subscription_id=subscription_id, display_name="Subscription_1", enabled=True))
+    await session.flush()
+    row = (
+        await session.execute(select(models.Subscription).where(models.Subscription.subscription_id == subscription_id))
+    ).scalar_one()
+
+    response = ModelJSONResponse([schemas.Subscription.from_row(row)])
+
+    # asyncpg returns its own UUID subclass, which orjson does not serialize natively
+    assert_that(type(row.subscription_id)).is_not_equal_to(uuid.UUID)
+    assert_that(response.body).is_equal_to(
+        b'[{"subscription_id":"%s","display_name":"Subscription_1","enabled":true}]' % str(subscription_id).encode()
+    )
+
+
+async def test_to_ndjson():
+    async def items():
+        for enabled in (True, False):
+            yield schemas.Subscription(
+                subscription_id=uuid.UUID(int=int(enabled)), display_name="Subscription", enabled=enabled
+            )
+
+    chunks = [chunk async for chunk in to_ndjson(items(), chunk_size=1)]
+
+    assert_that(chunks).is_length(2)
+    assert_that(chunks[1]).is_equal_to(
+        b'{"subscription_id":"00000000-0000-0000-0000-000000000000","display_name":"Subscription","enabled":false}\n'
+    )
@@ -0,0 +1,180 @@
+import asyncio
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Iterable, cast
+
+from assertpy import assert_that
+from azure.mgmt.subscription.models import SubscriptionState
+
+from azure_sql.azure_sql_manager import (
+    AzureSqlDatabase,
+    AzureSqlElasticPool,
+    AzureSqlManager,
+    AzureSqlServer,
+    AzureSubscription,
+)
+from azure_sql.client_pool import ClientPool
+from azure_sql.concurrency import ConcurrencyBudget
+
+_GB = 1024**3
+
+
+async def _pages(items: Iterable[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+class _FakeClient:
+    # Stands in for the management clients, operations are plain namespaces of methods.
+    def __init__(self, **operations: Any) -> None:
+        self.calls: list[str] = []
+        for name, methods in operations.items():
+            tracked = {method: self._track(f"{name}.{method}", f) for method, f in methods.items()}
+            setattr(self, name, SimpleNamespace(**tracked))
+
+    def _track(self, name: str, f):
+        def tracked(*args):
+            self.calls.append(name)
+            return f(*args)
+
+        return tracked
+
+    async def __aenter__(self):
+        return self
+
+    async def close(self) -> None:
+        pass
+
+
+def _database(name: str, elastic_pool_name: str | None = None) -> SimpleNamespace:
+    return SimpleNamespace(
+        name=name,
+        status="Online",
+        current_service_objective_name="S0",
+        max_size_bytes=10 * _GB,
+        elastic_pool_id=f"/elasticPools/{elastic_pool_name}" if elastic_pool_name is not None else None,
+    )
+
+
+def _usages(space_used: float, space_allocated: float) -> list[SimpleNamespace]:
+    return [
+        SimpleNamespace(name="database_size", current_value=space_used),
+        SimpleNamespace(name="database_allocated_size", current_value=space_allocated),
+    ]
+
+
+def _sql_client(subscription_id: str, list_usages: Callable[..., AsyncIterator[Any]] | None = None) -> _FakeClient:
+    server = SimpleNamespace(
+        id=f"/subscriptions/{subscription_id}/resourceGroups/rg/providers/Microsoft.Sql/servers/server",
+        name="server",
+        fully_qualified_domain_name="server.database.windows.net",
+        state="Ready",
+    )
+    databases = [_database("master"), _database("db1", "pool"), _database("db2", "pool"), _database("db3")]
+    return _FakeClient(
+        servers={"list": lambda: _pages([server])},
+        databases={"list_by_server": lambda resource_group_name, server_name: _pages(databases)},
+        database_usages={
+            "list_by_database": list_usages
+            or (lambda resource_group_name, server_name, database_name: _pages(_usages(_GB, 2 * _GB)))
+        },
+        elastic_pools={
+            "list_by_server": lambda resource_group_name, server_name: _pages(
+                [SimpleNamespace(name="pool", max_size_bytes=50 * _GB)]
+            )
+        },
+    )
+
+
+def _subscription(subscription_id: str, state: SubscriptionState | str) -> SimpleNamespace:
+    return SimpleNamespace(subscription_id=subscription_id, display_name=subscription_id, state=state)
+
+
+def _manager(
+    subscriptions: list[SimpleNamespace] | None = None, list_usages: Callable[..., AsyncIterator[Any]] | None = None
+) -> tuple[AzureSqlManager, dict[str, _FakeClient]]:
+    sql_clients: dict[str, _FakeClient] = {}
+
+    def create_sql_client(subscription_id: str) -> _FakeClient:
+        sql_clients[subscription_id] = _sql_client(subscription_id, list_usages)
+        return sql_clients[subscription_id]
+
+    if subscriptions is None:
+        subscriptions = [_subscription("enabled", SubscriptionState.ENABLED), _subscription("disabled", "Disabled")]
+    azure_sql_manager = AzureSqlManager()
+    azure_sql_manager._sql_clients = cast(Any, ClientPool(create_sql_client))
+    subscriptions_by_id = {subscription.subscription_id: subscription for subscription in subscriptions}
+
+    async def get_subscription(subscription_id: str) -> SimpleNamespace:
+        return subscriptions_by_id[subscription_id]
+
+    azure_sql_manager._subscription_clients = cast(
+        Any,
+        ClientPool(
+            lambda _: _FakeClient(
+                subscriptions={"list": lambda: _pages(subscriptions_by_id.values()), "get": get_subscription}
+            )
+        ),
+    )
+    return azure_sql_manager, sql_clients
+
+
+async def test_sweep():
+    azure_sql_manager, sql_clients = _manager()
+
+    async with azure_sql_manager:
+        records = [record async for record in azure_sql_manager.sweep(max_concurrency=4)]
+
+    resources: defaultdict[type, list[Any]] = defaultdict(list)
+    for record in records:
+        resources[type(record.resource)].append(record.resource)
+    assert_that([subscription.subscription_id for subscription in resources[AzureSubscription]]).is_equal_to(
+        ["enabled", "disabled"]
+    )
+    # Resources of disabled subscriptions are not requested
+    assert_that(sql_clients).contains_only("enabled")
+    assert_that(resources[AzureSqlServer]).is_length(1)
+    assert_that(sorted(database.name for database in resources[AzureSqlDatabase])).is_equal_to(["db1", "db2", "db3"])
+    (elastic_pool,) = resources[AzureSqlElasticPool]
+    assert_that(elastic_pool.usage.space_used.bytes).is_equal_to(2 * _GB)
+    assert_that(elastic_pool.usage.space_allocated.bytes).is_equal_to(4 * _GB)
+    # Elastic pool usages are built from the database usages, databases are listed once
+    assert_that(sql_clients["enabled"].calls.count("databases.list_by_server")).is_equal_to(1)
+    assert_that(sql_clients["enabled"].calls.count("database_usages.list_by_database")).is_equal_to(3)
+
+
+async def test_sweep_without_elastic_pools():
+    azure_sql_manager, sql_clients = _manager()
+
+    async with azure_sql_manager:
+        records = [record async for record in azure_sql_manager.sweep(include_elastic_pools=False)]
+
+    assert_that([record for record in records if isinstance(record.resource, AzureSqlElasticPool)]).is_empty()
+    assert_that(sql_clients["enabled"].calls).does_not_contain("elastic_pools.list_by_server")
+
+
+async def test_sweeps_sharing_a_budget_are_bounded_together():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def list_usages(resource_group_name: str, server_name: str, database_name: str) -> AsyncIterator[Any]:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        for usage in _usages(_GB, 2 * _GB):
+            yield usage
+
+    subscriptions = [_subscription(f"subscription-{index}", SubscriptionState.ENABLED) for index in range(2)]
+    azure_sql_manager, _ = _manager(subscriptions, list_usages)
+    budget = ConcurrencyBudget(max_concurrency=2, max_concurrency_per_key=2)
+
+    async def sweep(subscription_id: str) -> list[Any]:
+        return [record async for record in azure_sql_manager.sweep(subscription_ids=[subscription_id], budget=budget)]
+
+    async with azure_sql_manager:
+        await asyncio.gather(*[sweep(subscription.subscription_id) for subscription in subscriptions])
+
+    # With a budget each, both sweeps would run 2 usage calls at once
+    assert_that(max_in_flight).is_equal_to(2)
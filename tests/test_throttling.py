@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+
+from assertpy import assert_that
+from azure.core.pipeline.policies import AsyncHTTPPolicy
+
+from azure_sql.throttling import AsyncArmThrottlingPolicy, ThrottlingPolicy, TokenBucket
+
+SUBSCRIPTION_URL = "https://management.azure.com/subscriptions/0fdff486-1af4-412b-8933-7a5c7884729f/providers"
+
+
+class FakeNextPolicy(AsyncHTTPPolicy):
+    def __init__(self, *responses: tuple[int, dict[str, str]]) -> None:
+        super().__init__()
+        self._responses = list(responses)
+        self.calls = 0
+
+    async def send(self, request):
+        self.calls += 1
+        status_code, headers = self._responses.pop(0)
+        return SimpleNamespace(http_response=SimpleNamespace(status_code=status_code, headers=headers))
+
+
+def _create_policy(next_policy: FakeNextPolicy, **kwargs) -> AsyncArmThrottlingPolicy:
+    policy = AsyncArmThrottlingPolicy(ThrottlingPolicy(**kwargs))
+    policy.next = next_policy
+    return policy
+
+
+def _request(url: str = SUBSCRIPTION_URL):
+    return SimpleNamespace(http_request=SimpleNamespace(url=url))
+
+
+async def test_token_bucket_limits_rate_after_burst():
+    bucket = TokenBucket(rate=100, capacity=2)
+    started_at = time.monotonic()
+
+    for _ in range(4):
+        await bucket.acquire()
+
+    assert_that(time.monotonic() - started_at).is_greater_than(0.015)
+
+
+async def test_send_retries_throttled_request_honoring_retry_after():
+    next_policy = FakeNextPolicy((429, {"retry-after": "0.05"}), (200, {}))
+    policy = _create_policy(next_policy)
+    started_at = time.monotonic()
+
+    response = await policy.send(_request())
+
+    assert_that(response.http_response.status_code).is_equal_to(200)
+    assert_that(next_policy.calls).is_equal_to(2)
+    assert_that(policy.throttled).is_equal_to(1)
+    assert_that(time.monotonic() - started_at).is_greater_than(0.04)
+
+
+async def test_send_gives_up_after_max_retries():
+    next_policy = FakeNextPolicy((503, {}), (503, {}), (503, {}))
+    policy = _create_policy(next_policy, max_retries=2, backoff_base=0.001)
+
+    response = await policy.send(_request())
+
+    assert_that(response.http_response.status_code).is_equal_to(503)
+    assert_that(next_policy.calls).is_equal_to(3)
+
+
+async def test_send_slows_down_when_remaining_reads_are_low():
+    next_policy = FakeNextPolicy((200, {"x-ms-ratelimit-remaining-subscription-reads": "100"}))
+    policy = _create_policy(next_policy, requests_per_second=10, remaining_reads_threshold=1000)
+
+    await policy.send(_request())
+
+    assert_that(policy._get_bucket(SUBSCRIPTION_URL).rate).is_equal_to(1)
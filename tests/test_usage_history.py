@@ -0,0 +1,99 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from assertpy import assert_that
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from azure_sql import models
+from azure_sql.usage_history import UsageHistory, UsageRetentionPolicy
+
+SUBSCRIPTION_ID = uuid.UUID("0fdff486-1af4-412b-8933-7a5c7884729f")
+
+
+def _sample(sampled_at: datetime) -> models.DatabaseUsageSample:
+    return models.DatabaseUsageSample(
+        subscription_id=SUBSCRIPTION_ID,
+        resource_group_name="rg",
+        server_name="server",
+        database_name="database",
+        sampled_at=sampled_at,
+        space_used_bytes=100,
+        space_allocated_bytes=200,
+    )
+
+
+async def _partitions(session: AsyncSession) -> list[str]:
+    # The partitions of 2000 and 2001, the ones created by the migration are ignored
+    result = await session.execute(
+        text(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class AS parent ON pg_inherits.inhparent = parent.oid
+            JOIN pg_class AS child ON pg_inherits.inhrelid = child.oid
+            WHERE parent.relname = 'DatabaseUsageSamples' AND child.relname ~ '^DatabaseUsageSamples_200[01]_'
+            ORDER BY child.relname
+            """
+        )
+    )
+    return list(result.scalars().all())
+
+
+async def _sample_partitions(session: AsyncSession) -> list[tuple[str, datetime]]:
+    result = await session.execute(
+        text(
+            'SELECT tableoid::regclass::text, sampled_at FROM "DatabaseUsageSamples" '
+            "WHERE sampled_at < '2001-01-01' ORDER BY sampled_at"
+        )
+    )
+    return [(partition.strip('"'), sampled_at) for partition, sampled_at in result.all()]
+
+
+async def test_ensure_partitions_creates_the_current_and_next_months(session_provider, session: AsyncSession):
+    usage_history = UsageHistory(session_provider=session_provider)
+
+    await usage_history.ensure_partitions(datetime(2000, 11, 15, tzinfo=timezone.utc), months_ahead=1)
+    await usage_history.ensure_partitions(datetime(2000, 12, 1, tzinfo=timezone.utc), months_ahead=1)
+
+    # The second call only creates the partition of January
+    assert_that(await _partitions(session)).is_equal_to(
+        ["DatabaseUsageSamples_2000_11", "DatabaseUsageSamples_2000_12", "DatabaseUsageSamples_2001_01"]
+    )
+    session.add(_sample(datetime(2000, 12, 31, 23, 59, tzinfo=timezone.utc)))
+    await session.flush()
+    assert_that(await _sample_partitions(session)).is_equal_to(
+        [("DatabaseUsageSamples_2000_12", datetime(2000, 12, 31, 23, 59, tzinfo=timezone.utc))]
+    )
+
+
+async def test_ensure_partitions_moves_the_samples_of_the_month_out_of_the_default_partition(
+    session_provider, session: AsyncSession
+):
+    # Samples written before their partition exists are stored in the default partition
+    sampled_at = [datetime(2000, 3, 31, tzinfo=timezone.utc), datetime(2000, 4, 1, tzinfo=timezone.utc)]
+    session.add_all([_sample(moment) for moment in sampled_at])
+    await session.flush()
+
+    await UsageHistory(session_provider=session_provider).ensure_partitions(
+        datetime(2000, 3, 1, tzinfo=timezone.utc), months_ahead=0
+    )
+
+    assert_that(await _sample_partitions(session)).is_equal_to(
+        [("DatabaseUsageSamples_2000_03", sampled_at[0]), ("DatabaseUsageSamples_default", sampled_at[1])]
+    )
+
+
+async def test_apply_retention_drops_only_the_expired_months(session_provider, session: AsyncSession):
+    usage_history = UsageHistory(UsageRetentionPolicy(samples=timedelta(days=45)), session_provider=session_provider)
+    await usage_history.ensure_partitions(datetime(2000, 1, 1, tzinfo=timezone.utc), months_ahead=3)
+    session.add_all([_sample(datetime(2000, month, 15, tzinfo=timezone.utc)) for month in (1, 2, 3, 4)])
+    await session.flush()
+
+    # The cutoff is 2000-02-16, February still has samples to keep
+    await usage_history.apply_retention(datetime(2000, 4, 1, tzinfo=timezone.utc))
+
+    assert_that(await _partitions(session)).is_equal_to(
+        ["DatabaseUsageSamples_2000_02", "DatabaseUsageSamples_2000_03", "DatabaseUsageSamples_2000_04"]
+    )
+    assert_that([sampled_at.month for _, sampled_at in await _sample_partitions(session)]).is_equal_to([2, 3, 4])